@@ -10,6 +10,12 @@ INPUTS_DIR = os.path.join(DATA_DIR, "inputs")
 
 OUTPUTS_DIR = os.path.join(DATA_DIR, "outputs")
 
+RESULTS_STORE_DIR = os.path.join(OUTPUTS_DIR, "results_store")
+
+SUMMARY_CACHE_DIR = os.path.join(OUTPUTS_DIR, "summary_cache")
+
+SUBTREE_STORE_DIR = os.path.join(OUTPUTS_DIR, "subtree_store")
+
 CONFIG_DIR = os.path.join(SRC_DIR, "config")
 
 CONFIG_FPATH = os.path.join(CONFIG_DIR, "config.json")
@@ -29,3 +35,5 @@ STRUCTURE_CRITERIA_FPATH = os.path.join(SCORING_DIR, "structure_criteria.yaml")
 DOCUMENTATION_CRITERIA_FPATH = os.path.join(SCORING_DIR, "documentation_criteria.yaml")
 
 TRACKED_FILES_FPATH = os.path.join(CONFIG_DIR, "tracked_files.yaml")
+
+MODEL_PRICING_FPATH = os.path.join(CONFIG_DIR, "model_pricing.yaml")
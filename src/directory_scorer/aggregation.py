@@ -0,0 +1,197 @@
+import os
+import threading
+from typing import Any, Dict, FrozenSet, List, Optional, Set
+
+NOT_SATISFIED_EXPLANATION = "Not satisfied by any files in the project."
+CONSISTENTLY_SATISFIED_EXPLANATION = (
+    "This criterion is consistently satisfied throughout the project."
+)
+
+
+class CriterionState:
+    """
+    The running aggregate of one criterion over the files seen so far.
+
+    Attributes:
+        logic (str): The aggregation logic, "OR" or "AND".
+        satisfied_explanation (Optional[str]): For "OR", the explanation of the
+            first file that satisfied the criterion.
+        failure_count (int): For "AND", the number of files that failed the criterion.
+        failure_explanations (List[str]): For "AND", the first failure explanations.
+    """
+
+    __slots__ = ("logic", "satisfied_explanation", "failure_count", "failure_explanations")
+
+    def __init__(self, logic: str):
+        self.logic = logic
+        self.satisfied_explanation: Optional[str] = None
+        self.failure_count = 0
+        self.failure_explanations: List[str] = []
+
+    @property
+    def decided(self) -> bool:
+        """Whether more files can no longer change the aggregate score."""
+        if self.logic == "OR":
+            return self.satisfied_explanation is not None
+        if self.logic == "AND":
+            return self.failure_count > 0
+        return False
+
+
+class StreamingAggregator:
+    """
+    Combines file scores into directory scores in a single pass, as they arrive.
+
+    Each file score is visited once and only per-criterion counters and the
+    first few failure explanations are kept, so aggregation is O(files) and its
+    memory does not grow with the number of files.
+
+    The aggregator also tells which criteria are already decided for the whole
+    directory: an "OR" criterion once one file satisfies it, and an "AND"
+    criterion once one file fails it. Files scored after that no longer need
+    to be asked about the criterion.
+
+    Attributes:
+        aggregation_logic (Dict[str, str]): Dictionary mapping criteria to aggregation logic.
+        max_failure_explanations (int): The number of failure explanations kept per
+            "AND" criterion.
+    """
+
+    def __init__(
+        self, aggregation_logic: Dict[str, str], max_failure_explanations: int = 3
+    ):
+        self.aggregation_logic = aggregation_logic
+        self.max_failure_explanations = max_failure_explanations
+        self._criteria: Dict[str, CriterionState] = {}
+        self._decided: Set[str] = set()
+        self._decided_snapshot: FrozenSet[str] = frozenset()
+        self._lock = threading.Lock()
+
+    def add(self, file_score: Dict[str, Any]) -> None:
+        """
+        Add the scores of one file to the aggregate.
+
+        Args:
+            file_score (Dict[str, Any]): The scores of one file.
+        """
+        file_name = os.path.basename(file_score.get("file_path", ""))
+        with self._lock:
+            for criterion, score in file_score["scores"].items():
+                state = self._criteria.get(criterion)
+                if state is None:
+                    state = CriterionState(self.aggregation_logic.get(criterion, "OR"))
+                    self._criteria[criterion] = state
+
+                if state.logic == "OR":
+                    if state.satisfied_explanation is None and score["score"] == 1:
+                        state.satisfied_explanation = f"This criterion is satisfied in the project by file '{file_name}'. {score['explanation']}"
+                        self._decided.add(criterion)
+                elif state.logic == "AND" and score["score"] == 0:
+                    state.failure_count += 1
+                    if len(state.failure_explanations) < self.max_failure_explanations:
+                        state.failure_explanations.append(
+                            f"{file_name}: {score['explanation']}"
+                        )
+                    self._decided.add(criterion)
+
+            if len(self._decided) != len(self._decided_snapshot):
+                self._decided_snapshot = frozenset(self._decided)
+
+    def get_state(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the running aggregate of the files added so far.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: A JSON-serializable state per criterion, which
+            can be merged into another aggregator with `merge_state`.
+        """
+        with self._lock:
+            return {
+                criterion: {
+                    "logic": state.logic,
+                    "satisfied_explanation": state.satisfied_explanation,
+                    "failure_count": state.failure_count,
+                    "failure_explanations": list(state.failure_explanations),
+                }
+                for criterion, state in self._criteria.items()
+            }
+
+    def merge_state(self, other: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Add the running aggregate of other files, e.g. of an unchanged subdirectory.
+
+        This is equivalent to adding their file scores one by one, up to which
+        explanations are kept, in time proportional to the number of criteria.
+
+        Args:
+            other (Dict[str, Dict[str, Any]]): A state returned by `get_state`.
+        """
+        with self._lock:
+            for criterion, other_state in other.items():
+                state = self._criteria.get(criterion)
+                if state is None:
+                    state = CriterionState(self.aggregation_logic.get(criterion, "OR"))
+                    self._criteria[criterion] = state
+
+                if state.logic == "OR":
+                    if state.satisfied_explanation is None:
+                        state.satisfied_explanation = other_state["satisfied_explanation"]
+                elif state.logic == "AND":
+                    state.failure_count += other_state["failure_count"]
+                    free = max(
+                        self.max_failure_explanations - len(state.failure_explanations), 0
+                    )
+                    state.failure_explanations += other_state["failure_explanations"][:free]
+                if state.decided:
+                    self._decided.add(criterion)
+
+            if len(self._decided) != len(self._decided_snapshot):
+                self._decided_snapshot = frozenset(self._decided)
+
+    def get_decided_criteria(self) -> FrozenSet[str]:
+        """
+        Get the criteria whose directory score can no longer change.
+
+        Returns:
+            FrozenSet[str]: The IDs of the decided criteria.
+        """
+        return self._decided_snapshot
+
+    def result(self) -> Dict[str, Any]:
+        """
+        Get the combined scores of the files added so far.
+
+        Returns:
+            Dict[str, Any]: Combined scores keyed by criterion ID.
+        """
+        combined_scores = {}
+        with self._lock:
+            for criterion, state in self._criteria.items():
+                if state.logic == "OR" and state.satisfied_explanation is not None:
+                    combined_scores[criterion] = {
+                        "score": 1,
+                        "explanation": state.satisfied_explanation,
+                    }
+                elif state.logic == "AND" and state.failure_count == 0:
+                    combined_scores[criterion] = {
+                        "score": 1,
+                        "explanation": CONSISTENTLY_SATISFIED_EXPLANATION,
+                    }
+                elif state.logic == "AND":
+                    explanation = (
+                        "This criterion is not consistently satisfied. Issues include: "
+                        + "; ".join(state.failure_explanations)
+                    )
+                    omitted = state.failure_count - len(state.failure_explanations)
+                    if omitted > 0:
+                        explanation += f" and {omitted} more issues."
+                    combined_scores[criterion] = {
+                        "score": 0,
+                        "explanation": explanation,
+                    }
+                else:
+                    combined_scores[criterion] = {
+                        "score": 0,
+                        "explanation": NOT_SATISFIED_EXPLANATION,
+                    }
+        return combined_scores
@@ -1,37 +1,171 @@
 import os
-import tiktoken
+import time
+import threading
+import contextvars
+from functools import lru_cache, partial
 from logger import get_logger
 import concurrent.futures
 from config import paths
 from dotenv import load_dotenv
-from typing import List, Dict, Any, Tuple, Union
+from typing import FrozenSet, Iterable, List, Dict, Any, Optional, Tuple, TYPE_CHECKING
+from metrics import MetricsCollector, get_llm_config, trace
 from utils.general import read_yaml_file
-from langchain_core.documents import Document
-from generators import get_instructions
-from output_parsers import get_content_based_scoring_model
-from directory_scorer.tree import build_tree, post_order_generator
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_community.document_loaders import (
-    NotebookLoader,
-    PyPDFLoader,
-    Docx2txtLoader,
-    TextLoader,
+from utils.llm import get_llm_config_id
+from utils.progress import AssessmentCancelledError, ProgressTracker
+from generators import get_aggregation_logic, get_instructions
+from output_parsers import get_content_based_scoring_model, warm_up_scoring_models
+from directory_scorer.tree import build_tree, compute_content_hashes, post_order_generator
+from directory_scorer.splitter import STRUCTURED_EXTENSIONS, split_file_by_structure
+from directory_scorer.prechecks import run_prechecks
+from directory_scorer.aggregation import StreamingAggregator
+from directory_scorer.prioritizer import prioritize_files
+from directory_scorer.preprocessing import FilePreparer
+from directory_scorer.near_duplicates import NearDuplicateIndex, compute_minhash
+from directory_scorer.sampling import (
+    SAMPLE_CONFIDENCE,
+    annotate_sampled_scores,
+    stratified_sample,
 )
 
+# LangChain loaders, PyPDF and tiktoken are imported on first use to keep startup fast
+if TYPE_CHECKING:
+    import tiktoken
+    import numpy as np
+    from utils.router import ModelRouter
+    from utils.call_policy import CallPolicy
+    from utils.checkpoint import CheckpointJournal
+    from directory_scorer.subtree_store import SubtreeResultStore
+    from langchain_core.documents import Document
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.runnables import Runnable
+
 load_dotenv()
 
 logger = get_logger(__name__)
 
 dir_path = os.path.dirname((os.path.abspath(__file__)))
 extensions = read_yaml_file(paths.TRACKED_FILES_FPATH)
-scoring_file_prompt = read_yaml_file(paths.PROMPTS_FPATH)["score_file"]
+prompts = read_yaml_file(paths.PROMPTS_FPATH)
+scoring_file_prompt = prompts["score_file"]
+scoring_chunk_prompt = prompts["score_file_chunk"]
 
 tracked_extensions = extensions["tracked_extensions"]
 text_extensions = extensions["text_extensions"]
 ignored_names = extensions["ignored_names"]
 
-instructions = get_instructions(content_based_only=True)
+# Tokens kept free in each call for the structured response
+OUTPUT_TOKEN_RESERVE = 4096
+
+# Structured-output runnables keyed by (model config, file extension, excluded criteria)
+structured_llms: Dict[Tuple[str, str, FrozenSet[str]], "Runnable"] = {}
+structured_llms_lock = threading.Lock()
+
+
+def get_file_extension(file_path: str) -> str:
+    """
+    Get the extension used to select scoring criteria for a file.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        str: The lowercased file extension, or the file name if it has no extension.
+    """
+    file_extension = os.path.splitext(file_path)[-1].lower()
+    if file_extension == "":
+        file_extension = os.path.basename(file_path)
+    return file_extension
+
+
+@lru_cache(maxsize=None)
+def get_file_instructions(
+    file_extension: str, excluded_criteria: FrozenSet[str] = frozenset()
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Get the scoring instructions of the criteria that apply to a file extension.
+
+    Args:
+        file_extension (str): The extension of the files to score.
+        excluded_criteria (FrozenSet[str]): Criteria decided without the model.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: The instructions keyed by criterion ID.
+    """
+    return get_instructions(
+        content_based_only=True,
+        input_file_extension=file_extension,
+        excluded_criteria=excluded_criteria,
+    )
+
+
+def get_structured_llm(
+    llm: "BaseChatModel",
+    file_extension: str,
+    excluded_criteria: FrozenSet[str] = frozenset(),
+) -> "Runnable":
+    """
+    Get the structured-output runnable that scores files with the given extension.
+
+    Binding the scoring model to the LLM generates its JSON schema, so the
+    runnable is built once per model configuration, extension and set of
+    excluded criteria, and reused afterwards. Instances whose name or
+    parameters differ get their own runnables.
+
+    Args:
+        llm (BaseChatModel): The language model to use for scoring.
+        file_extension (str): The extension of the files to score.
+        excluded_criteria (FrozenSet[str]): Criteria left out of the scoring model.
+
+    Returns:
+        Runnable: The LLM bound to the extension's scoring model.
+    """
+    key = (get_llm_config_id(llm), file_extension, excluded_criteria)
+    structured_llm = structured_llms.get(key)
+    if structured_llm is None:
+        with structured_llms_lock:
+            structured_llm = structured_llms.get(key)
+            if structured_llm is None:
+                CodeQualityFileScoring = get_content_based_scoring_model(
+                    file_extension, excluded_criteria
+                )
+                structured_llm = llm.with_structured_output(CodeQualityFileScoring)
+                structured_llms[key] = structured_llm
+    return structured_llm
+
+
+def warm_up_scoring_cache(
+    llm: "BaseChatModel",
+    file_extensions: Iterable[str] = tracked_extensions,
+    excluded_criteria: FrozenSet[str] = frozenset(),
+) -> None:
+    """
+    Build the scoring models and structured-output runnables ahead of scoring.
+
+    Args:
+        llm (BaseChatModel): The language model that will be used for scoring.
+        file_extensions (Iterable[str]): The file extensions to warm up.
+        excluded_criteria (FrozenSet[str]): Criteria that will not be scored.
+    """
+    file_extensions = [ext.strip().lower() for ext in file_extensions]
+    warm_up_scoring_models(file_extensions, excluded_criteria)
+    for file_extension in file_extensions:
+        get_structured_llm(llm, file_extension, excluded_criteria)
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model_name: str) -> "tiktoken.Encoding":
+    """
+    Get the tiktoken encoding for a model, loading tiktoken on first use.
+
+    Args:
+        model_name (str): The name of the model to get the encoding for.
+
+    Returns:
+        tiktoken.Encoding: The encoding used by the model.
+    """
+    import tiktoken
+
+    return tiktoken.encoding_for_model(model_name)
 
 
 def count_tokens(text: str, model_name: str = "gpt-4") -> int:
@@ -46,79 +180,440 @@ def count_tokens(text: str, model_name: str = "gpt-4") -> int:
     Returns:
         int: The number of tokens in the text.
     """
-    encoding = tiktoken.encoding_for_model(model_name)
+    encoding = get_encoding(model_name)
     tokens = encoding.encode(text)
     return len(tokens)
 
 
+@lru_cache(maxsize=64)
+def get_prompt_overhead_tokens(context: str, file_extension: str) -> int:
+    """
+    Count the tokens a chunk prompt uses besides the chunk itself.
+
+    Args:
+        context (str): The global context prepended to each chunk.
+        file_extension (str): The extension of the file, which selects the instructions.
+
+    Returns:
+        int: The number of tokens of the prompt template, instructions and context.
+    """
+    prompt = scoring_chunk_prompt.format(
+        file_content=context,
+        chunk_number=0,
+        num_chunks=0,
+        instructions=get_file_instructions(file_extension),
+    )
+    return count_tokens(prompt, model_name="gpt-4o")
+
+
+class PreparedFile:
+    """
+    A file loaded, split into chunks and pre-checked, ready to be scored.
+
+    Preparing a file is CPU-bound and needs no language model, so it can run in
+    a separate process and be handed to the scoring threads.
+
+    Attributes:
+        file_path (str): The path to the file.
+        file_extension (str): The extension used to select scoring criteria.
+        chunks (List[str]): The chunks to score, empty if the file is skipped.
+        chunk_tokens (List[int]): The number of tokens of each chunk.
+        decided_scores (Dict[str, Dict[str, Any]]): The scores decided by pre-checks.
+        structured (bool): Whether the file was split along its structure.
+        prepare_seconds (float): The time spent preparing the file.
+        signature (Optional[np.ndarray]): The MinHash signature of the file content,
+            if computed.
+    """
+
+    __slots__ = (
+        "file_path",
+        "file_extension",
+        "chunks",
+        "chunk_tokens",
+        "decided_scores",
+        "structured",
+        "prepare_seconds",
+        "signature",
+    )
+
+    def __init__(self, file_path: str, file_extension: str):
+        self.file_path = file_path
+        self.file_extension = file_extension
+        self.chunks: List[str] = []
+        self.chunk_tokens: List[int] = []
+        self.decided_scores: Dict[str, Dict[str, Any]] = {}
+        self.structured = False
+        self.prepare_seconds = 0.0
+        self.signature: Optional["np.ndarray"] = None
+
+    def __getstate__(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state: Tuple[Any, ...]) -> None:
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+
+def prepare_file(
+    file_path: str,
+    chunk_size: int = 128000,
+    chunk_overlap: int = 200,
+    max_token_count: int = 128_000,
+    global_context: str = "",
+    map_reduce: bool = True,
+    use_prechecks: bool = True,
+    metrics: Optional[MetricsCollector] = None,
+    compute_signature: bool = False,
+) -> PreparedFile:
+    """
+    Load a file, split it into chunks, count their tokens and run the pre-checks.
+
+    Args:
+        file_path (str): The path to the file to prepare.
+        chunk_size (int): The size of each text chunk, in characters, when splitting
+            the content of files without a structure-aware splitter.
+        chunk_overlap (int): The overlap between text chunks to maintain context.
+        max_token_count (int): Maximum allowed tokens per call. Files (or, in
+            map-reduce mode, chunks) exceeding this are skipped.
+        global_context (str): Additional context about the codebase to help inform scoring.
+        map_reduce (bool): Whether the chunks will be scored separately.
+        use_prechecks (bool): Whether to decide obvious criteria with local pre-checks.
+        metrics (Optional[MetricsCollector]): Collector for stage timings.
+        compute_signature (bool): Whether to compute the MinHash signature of the loaded
+            content, to find near-duplicates of the file.
+
+    Returns:
+        PreparedFile: The prepared file, without chunks if it is empty or too long.
+    """
+    from langchain_core.documents import Document
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    start = time.perf_counter()
+    # In map-reduce mode every chunk is scored with the global context
+    context = f"{global_context}\n\n" if global_context and map_reduce else ""
+    file_extension = get_file_extension(file_path)
+    prepared = PreparedFile(file_path, file_extension)
+
+    structured_chunks = None
+    if map_reduce and file_extension in STRUCTURED_EXTENSIONS:
+        budget = (
+            max_token_count
+            - get_prompt_overhead_tokens(context, file_extension)
+            - OUTPUT_TOKEN_RESERVE
+        )
+        with trace(metrics, "split_by_structure"):
+            structured_chunks = split_file_by_structure(
+                file_path,
+                max_tokens=max(budget, 1),
+                length_function=partial(count_tokens, model_name="gpt-4o"),
+            )
+
+    if structured_chunks is not None:
+        chunks = [chunk for chunk, _ in structured_chunks]
+        chunk_tokens = [tokens for _, tokens in structured_chunks]
+    else:
+        with trace(metrics, "load_document"):
+            documents = load_document(file_path)
+
+        # add global context as the first document in the list
+        if global_context and not map_reduce:
+            documents.insert(0, Document(page_content=global_context))
+
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=len,
+        )
+        splits = text_splitter.split_documents(documents)
+        chunks = [split.page_content for split in splits]
+
+        with trace(metrics, "count_tokens"):
+            chunk_tokens = [count_tokens(chunk, model_name="gpt-4o") for chunk in chunks]
+    prepared.chunk_tokens = chunk_tokens
+    prepared.structured = structured_chunks is not None
+
+    # check if the document (or its largest chunk) is too long
+    tokens = sum(chunk_tokens)
+    call_tokens = max(chunk_tokens, default=0) if map_reduce else tokens
+    if call_tokens > max_token_count:
+        logger.warning(
+            f"Skipping document as it is too long {file_path} ({call_tokens} tokens)"
+        )
+    elif tokens == 0:
+        logger.warning(f"Skipping document as it is empty {file_path}")
+    else:
+        prepared.chunks = chunks
+        # Notebooks loaded by NotebookLoader are not in a format the pre-checks expect
+        if use_prechecks and (prepared.structured or file_extension != ".ipynb"):
+            with trace(metrics, "prechecks"):
+                prepared.decided_scores = run_prechecks("".join(chunks), file_extension)
+        if compute_signature:
+            with trace(metrics, "minhash"):
+                prepared.signature = compute_minhash("\n".join(chunks))
+
+    prepared.prepare_seconds = time.perf_counter() - start
+    return prepared
+
+
 def score_file(
     file_path: str,
-    llm: BaseChatModel,
+    llm: "BaseChatModel",
     chunk_size: int = 128000,
     chunk_overlap: int = 200,
     max_token_count: int = 128_000,
     global_context: str = "",
+    metrics: Optional[MetricsCollector] = None,
+    router: Optional["ModelRouter"] = None,
+    map_reduce: bool = True,
+    aggregation_logic: Optional[Dict[str, str]] = None,
+    use_prechecks: bool = True,
+    skipped_criteria: FrozenSet[str] = frozenset(),
+    prepared: Optional[PreparedFile] = None,
+    call_policy: Optional["CallPolicy"] = None,
 ) -> Dict[str, Any]:
     """
     Score a file's code quality using a language model.
 
+    In map-reduce mode, Python files and notebooks are split on top-level
+    definitions and cell groups into chunks sized by tokens, so each chunk fills
+    the context window left by the prompt; other files are split by characters.
+    A file that splits into several chunks has each chunk scored in its own call,
+    concurrently, and the chunk scores are reduced per criterion with its AND/OR
+    aggregation logic. Only chunks, not whole files, are limited by
+    `max_token_count`. Otherwise all chunks are sent in a single call and files
+    over `max_token_count` tokens are skipped.
+
+    Only the instructions of the criteria that apply to the file extension are
+    sent. Criteria whose outcome is obvious from a local pre-check, such as the
+    logging criteria for a file that never uses a logging library, are scored
+    without the model and left out of the prompt and the response schema.
+
     Args:
         file_path (str): The path to the file to score.
         llm (BaseChatModel): The language model to use for scoring.
-        chunk_size (int): The size of each text chunk when splitting the file content.
+        chunk_size (int): The size of each text chunk, in characters, when splitting
+            the content of files without a structure-aware splitter.
         chunk_overlap (int): The overlap between text chunks to maintain context.
-        max_token_count (int): Maximum allowed tokens. Files exceeding this will be skipped.
+        max_token_count (int): Maximum allowed tokens per call. Files (or, in
+            map-reduce mode, chunks) exceeding this will be skipped.
         global_context (str): Additional context about the codebase to help inform scoring.
+        metrics (Optional[MetricsCollector]): Collector for stage timings and token usage.
+        router (Optional[ModelRouter]): Routes the call to a fast or strong model by
+            file size and extension. `llm` is used directly if not given.
+        map_reduce (bool): Whether to score chunks separately and reduce their scores.
+        aggregation_logic (Optional[Dict[str, str]]): The AND/OR logic per criterion
+            used to reduce chunk scores. Defaults to the logic of the criteria files.
+        use_prechecks (bool): Whether to decide obvious criteria with local pre-checks.
+        skipped_criteria (FrozenSet[str]): Criteria already decided for the whole
+            directory, which are not asked of the model for this file.
+        prepared (Optional[PreparedFile]): The file already prepared by `prepare_file`
+            with the same settings, e.g. in a pre-processing process. The file is
+            prepared in the calling thread if not given.
+        call_policy (Optional[CallPolicy]): The deadline and hedging of each call.
 
     Returns:
-        str: The summarized content."""
-    documents = load_document(file_path)
+        Dict[str, Any]: The criterion scores of the file and its path, or an empty
+        dictionary if the file was skipped.
+    """
+    # In map-reduce mode every chunk is scored with the global context
+    context = f"{global_context}\n\n" if global_context and map_reduce else ""
+    file_extension = get_file_extension(file_path)
 
-    # add global context as the first document in the list
-    if global_context:
-        documents.insert(0, Document(page_content=global_context))
+    with trace(metrics, "score_file", file_path=file_path) as span:
+        if prepared is None:
+            prepared = prepare_file(
+                file_path,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                max_token_count=max_token_count,
+                global_context=global_context,
+                map_reduce=map_reduce,
+                use_prechecks=use_prechecks,
+                metrics=metrics,
+            )
+        elif span is not None:
+            span.set_attribute("prepare_seconds", prepared.prepare_seconds)
 
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        length_function=len,
-    )
-    splits = text_splitter.split_documents(documents)
+        chunks = prepared.chunks
+        decided_scores = prepared.decided_scores
+        tokens = sum(prepared.chunk_tokens)
+        call_tokens = max(prepared.chunk_tokens, default=0) if map_reduce else tokens
+        if span is not None:
+            span.set_attribute("file_tokens", tokens)
+            span.set_attribute("num_chunks", len(prepared.chunk_tokens))
+            if decided_scores:
+                span.set_attribute("prechecked_criteria", len(decided_scores))
 
-    # check if the document is too long using max_str_length
-    combined_text = "".join([split.page_content for split in splits])
-    tokens = count_tokens(combined_text, model_name="gpt-4o")
-    if tokens > max_token_count:
-        logger.warning(
-            f"Skipping document as it is too long {file_path} ({tokens} tokens)"
+        if not chunks:
+            return {}
+
+        excluded_criteria = frozenset(decided_scores) | skipped_criteria
+        if span is not None and skipped_criteria:
+            span.set_attribute("skipped_criteria", len(skipped_criteria))
+        scoring_model = get_content_based_scoring_model(
+            file_extension, excluded_criteria
         )
-        return {}
+        if not scoring_model.model_fields["scores"].annotation.model_fields:
+            return {"scores": decided_scores, "file_path": file_path}
+        instructions = get_file_instructions(file_extension, excluded_criteria)
 
-    if tokens == 0:
-        logger.warning(f"Skipping document as it is empty {file_path}")
-        return {}
+        if not map_reduce:
+            prompts = [
+                scoring_file_prompt.format(file_content=chunk, instructions=instructions)
+                for chunk in chunks
+            ]
+            inputs = [prompts]
+        elif len(chunks) == 1:
+            inputs = [
+                scoring_file_prompt.format(
+                    file_content=context + chunks[0], instructions=instructions
+                )
+            ]
+        else:
+            inputs = [
+                scoring_chunk_prompt.format(
+                    file_content=context + chunk,
+                    chunk_number=i + 1,
+                    num_chunks=len(chunks),
+                    instructions=instructions,
+                )
+                for i, chunk in enumerate(chunks)
+            ]
 
-    prompts = [
-        scoring_file_prompt.format(
-            file_content=split.page_content, instructions=instructions
-        )
-        for split in splits
-    ]
+        if router is not None:
+            route = router.route_file(call_tokens, file_extension)
+            if span is not None:
+                span.set_attribute("route", route)
+            responses = router.batch(
+                route,
+                inputs,
+                lambda model: get_structured_llm(
+                    model, file_extension, excluded_criteria
+                ),
+                cache_key=f"{file_extension}:{','.join(sorted(excluded_criteria))}",
+                config=get_llm_config(metrics),
+                call_policy=call_policy,
+            )
+        else:
+            structured_llm = get_structured_llm(llm, file_extension, excluded_criteria)
+            if call_policy is not None:
+                responses = call_policy.batch(
+                    structured_llm, inputs, config=get_llm_config(metrics)
+                )
+            elif len(inputs) == 1:
+                responses = [
+                    structured_llm.invoke(inputs[0], config=get_llm_config(metrics))
+                ]
+            else:
+                responses = structured_llm.batch(inputs, config=get_llm_config(metrics))
 
-    file_extension = os.path.splitext(file_path)[-1].lower()
-    if file_extension == "":
-        file_extension = os.path.basename(file_path)
+        chunk_scores = [response.model_dump() for response in responses]
+        if len(chunk_scores) == 1:
+            results = chunk_scores[0]
+        else:
+            with trace(metrics, "reduce_chunk_scores", num_chunks=len(chunk_scores)):
+                results = reduce_chunk_scores(
+                    chunk_scores,
+                    aggregation_logic
+                    if aggregation_logic is not None
+                    else get_aggregation_logic(),
+                )
+        results["scores"] = {**results["scores"], **decided_scores}
+        results["file_path"] = file_path
+        return results
 
-    CodeQualityFileScoring = get_content_based_scoring_model(file_extension)
 
-    results = (
-        llm.with_structured_output(CodeQualityFileScoring).invoke(prompts).model_dump()
-    )
-    results["file_path"] = file_path
-    return results
+def drop_criteria(
+    scores: Dict[str, Dict[str, Any]], criteria: FrozenSet[str]
+) -> Dict[str, Dict[str, Any]]:
+    """Remove the given criteria from the criterion scores of a file."""
+    return {
+        criterion: score for criterion, score in scores.items() if criterion not in criteria
+    }
+
+
+def reuse_file_score(
+    prepared: PreparedFile,
+    source_path: str,
+    similarity: float,
+    source_score: Dict[str, Any],
+    excluded_criteria: FrozenSet[str] = frozenset(),
+) -> Dict[str, Any]:
+    """
+    Score a file with the scores of a near-duplicate file.
+
+    The criteria decided by the file's own pre-checks keep their pre-check
+    scores, so a cheap local check still overrides the reused scores.
+
+    Args:
+        prepared (PreparedFile): The file to score, prepared with its signature.
+        source_path (str): The path to the near-duplicate file.
+        similarity (float): The estimated similarity of the two files.
+        source_score (Dict[str, Any]): The scores of the near-duplicate file.
+        excluded_criteria (FrozenSet[str]): Criteria that are not scored, which
+            are left out of the reused scores.
+
+    Returns:
+        Dict[str, Any]: The criterion scores of the file, its path, and the path and
+        similarity of the file whose scores were reused.
+    """
+    scores = {**source_score["scores"], **prepared.decided_scores}
+    return {
+        "scores": drop_criteria(scores, excluded_criteria),
+        "file_path": prepared.file_path,
+        "near_duplicate_of": source_path,
+        "similarity": round(similarity, 3),
+    }
+
+
+def reduce_chunk_scores(
+    chunk_scores: List[Dict[str, Any]], aggregation_logic: Dict[str, str]
+) -> Dict[str, Any]:
+    """
+    Reduce the scores of the chunks of one file into the scores of the file.
 
+    Args:
+        chunk_scores (List[Dict[str, Any]]): The scores of each chunk, in file order.
+        aggregation_logic (Dict[str, str]): Dictionary mapping criteria to aggregation logic.
+            Supported values are "OR" and "AND".
 
-def load_document(file_path) -> List[Document]:
+    Returns:
+        Dict[str, Any]: The file scores, in the same format as a single-chunk result.
+
+    Notes:
+        - "OR" logic: The file satisfies the criterion if any chunk does.
+        - "AND" logic: The file satisfies the criterion only if every chunk does.
+    """
+    criteria: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+    for chunk_number, chunk_score in enumerate(chunk_scores, start=1):
+        for criterion, score in chunk_score["scores"].items():
+            criteria.setdefault(criterion, []).append((chunk_number, score))
+
+    scores = {}
+    for criterion, chunk_results in criteria.items():
+        logic = aggregation_logic.get(criterion, "OR")
+        passed = [(n, score) for n, score in chunk_results if score["score"] == 1]
+        failed = [(n, score) for n, score in chunk_results if score["score"] != 1]
+
+        if logic == "AND":
+            satisfied = not failed
+            explained = chunk_results[:1] if satisfied else failed[:3]
+        else:
+            satisfied = bool(passed)
+            explained = passed[:1] if satisfied else chunk_results[:1]
+
+        scores[criterion] = {
+            "score": int(satisfied),
+            "explanation": " ".join(
+                f"Part {n}/{len(chunk_scores)}: {score['explanation']}"
+                for n, score in explained
+            ),
+        }
+
+    return {"scores": scores}
+
+
+def load_document(file_path) -> List["Document"]:
     """
     Load the document based on file type.
 
@@ -133,16 +628,21 @@ def load_document(file_path) -> List[Document]:
     """
     ext = os.path.splitext(file_path)[-1].lower()
 
-    # Initialize loader variable with correct type
-    loader: Union[PyPDFLoader, Docx2txtLoader, NotebookLoader, TextLoader]
-
     if ext == ".pdf":
+        from langchain_community.document_loaders import PyPDFLoader
+
         loader = PyPDFLoader(file_path)
     elif ext == ".docx":
+        from langchain_community.document_loaders import Docx2txtLoader
+
         loader = Docx2txtLoader(file_path)
     elif ext == ".ipynb":
+        from langchain_community.document_loaders import NotebookLoader
+
         loader = NotebookLoader(file_path)
     elif ext in text_extensions:
+        from langchain_community.document_loaders import TextLoader
+
         loader = TextLoader(file_path)
     else:
         raise ValueError(f"Unsupported file type: {ext}")
@@ -153,7 +653,7 @@ def load_document(file_path) -> List[Document]:
 
 def score_directory_based_on_files(
     directory_path: str,
-    llm: BaseChatModel,
+    llm: "BaseChatModel",
     aggregation_logic: Dict[str, str],
     chunk_size: int = 128000,
     chunk_overlap: int = 200,
@@ -162,6 +662,19 @@ def score_directory_based_on_files(
     ignored_names: List[str] = ignored_names,
     global_context: str = "",
     max_workers: int = 4,
+    metrics: Optional[MetricsCollector] = None,
+    router: Optional["ModelRouter"] = None,
+    early_exit: bool = False,
+    journal: Optional["CheckpointJournal"] = None,
+    progress: Optional[ProgressTracker] = None,
+    preprocess_workers: int = 0,
+    result_store: Optional["SubtreeResultStore"] = None,
+    near_duplicate_index: Optional[NearDuplicateIndex] = None,
+    sample_size: Optional[int] = None,
+    sample_confidence: float = SAMPLE_CONFIDENCE,
+    excluded_criteria: FrozenSet[str] = frozenset(),
+    stop_criteria: FrozenSet[str] = frozenset(),
+    call_policy: Optional["CallPolicy"] = None,
 ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
     """
     Score all files in a directory based on code quality criteria.
@@ -177,62 +690,330 @@ def score_directory_based_on_files(
         ignored_names (List[str]): File/directory names to ignore.
         global_context (str): Additional context about the codebase to help inform scoring.
         max_workers (int): Maximum number of parallel workers to use.
+        metrics (Optional[MetricsCollector]): Collector for stage timings and token usage.
+        router (Optional[ModelRouter]): Routes each file to a fast or strong model.
+        early_exit (bool): Whether to stop asking about criteria that are already
+            decided for the directory, i.e. "OR" criteria satisfied by a finished
+            file and "AND" criteria failed by one. Files scored afterwards then
+            lack those criteria in their individual scores.
+        journal (Optional[CheckpointJournal]): Journal that every file result is
+            appended to. Files it already holds results for are not scored again.
+        progress (Optional[ProgressTracker]): Receives the number of scored files and
+            is checked for cancellation before each file is scored.
+        preprocess_workers (int): The number of processes that load, split and
+            tokenize files ahead of the scoring threads. Files are prepared in the
+            scoring threads if 0.
+        result_store (Optional[SubtreeResultStore]): File scores and directory
+            aggregates keyed by the Merkle hash of their subtree. Files and
+            directories it holds are restored without being read or scored, and the
+            results of the others are added to it.
+        near_duplicate_index (Optional[NearDuplicateIndex]): The files scored so far,
+            e.g. in other repositories of the same template. A file that is a
+            near-duplicate of one of them reuses its scores instead of being sent
+            to the model, and the other files are added to it once scored.
+        sample_size (Optional[int]): If the directory has more files, only a random
+            sample of this many files, stratified by top-level directory and
+            extension, is scored. Every sampled file is scored on the "AND"
+            criteria, whose scores then hold the share of sampled files that
+            satisfy them with its confidence bounds, while "OR" criteria are no
+            longer asked about once a sampled file satisfies them.
+        sample_confidence (float): The confidence level of the bounds of sampled
+            "AND" criteria.
+        excluded_criteria (FrozenSet[str]): Criteria that are not scored, e.g. those
+            above the target tier. They are left out of every prompt and scoring
+            model and of the directory scores.
+        stop_criteria (FrozenSet[str]): "AND" criteria whose failure by any file
+            stops the scoring, e.g. the Essential criteria of a pass/fail gate.
+            Files that are being scored are finished, and only the criteria
+            decided by then are returned in the directory scores.
+        call_policy (Optional[CallPolicy]): The deadline and hedging of each call,
+            so a slow response does not hold up a worker. Files whose calls time
+            out are left unscored.
 
     Returns:
         Tuple[Dict[str, Any], List[Dict[str, Any]]]: A tuple containing:
             - Combined scores across all files
             - List of individual file scores
+
+    Raises:
+        AssessmentCancelledError: If `progress` is cancelled. Files that are being
+            scored are finished and journaled first.
     """
 
-    root = build_tree(
-        directory_path,
-        ignored_names=ignored_names,
-        tracked_extensions=tracked_extensions,
-        global_context=global_context,
-    )
+    with trace(metrics, "build_tree"):
+        root = build_tree(
+            directory_path,
+            ignored_names=ignored_names,
+            tracked_extensions=tracked_extensions,
+            global_context=global_context,
+        )
 
     if root.is_dir and not root.children:
         logger.warning(f"Skipping directory as it is empty {directory_path}")
         raise ValueError("Cannot summarize an empty directory.")
 
-    # Collect all non-directory nodes to process
+    # Collect all non-directory nodes to process, most decisive and largest first
     files_to_score = []
     for node in post_order_generator(root):
         if not node.is_dir:
             files_to_score.append(node)
+    files_to_score = prioritize_files(files_to_score, directory_path)
+    num_files = len(files_to_score)
+    sampled = sample_size is not None and num_files > sample_size
+    if sampled:
+        files_to_score = stratified_sample(files_to_score, sample_size, directory_path)
+        logger.info(f"Scoring a sample of {len(files_to_score)} of {num_files} files")
+        if metrics is not None:
+            metrics.add_report(
+                "sampling", {"files": num_files, "sampled_files": len(files_to_score)}
+            )
 
     all_scores = []
+    aggregator = StreamingAggregator(aggregation_logic)
+    num_restored = 0
+
+    # Reuse the results of unchanged files and directories, here or in other repositories
+    complete_scores: Dict[str, Dict[str, Any]] = {}
+    if result_store is not None:
+        with trace(metrics, "hash_tree"):
+            compute_content_hashes(root, max_workers=max_workers)
+        sampled_paths = {node.full_path for node in files_to_score}
+        with trace(metrics, "restore_subtrees"):
+            for subtree in result_store.restore(root):
+                file_scores = subtree.file_scores
+                aggregate = subtree.aggregate
+                if sampled:
+                    # Files left out of the sample must not weigh on the estimates
+                    file_scores = {
+                        file_path: score
+                        for file_path, score in file_scores.items()
+                        if file_path in sampled_paths
+                    }
+                    aggregate = None
+                for score in file_scores.values():
+                    if score != {}:
+                        all_scores.append(score)
+                        if aggregate is None:
+                            aggregator.add(score)
+                if aggregate is not None:
+                    aggregator.merge_state(aggregate)
+                complete_scores.update(file_scores)
+        files_to_score = [
+            node for node in files_to_score if node.full_path not in complete_scores
+        ]
+        num_restored += len(complete_scores)
+
+    # Reuse the results of files completed by an interrupted run
+    if journal is not None:
+        pending_files = []
+        for node in files_to_score:
+            score = journal.completed_files.get(node.full_path)
+            if score is None:
+                pending_files.append(node)
+            elif score != {}:
+                all_scores.append(score)
+                aggregator.add(score)
+        num_restored += len(files_to_score) - len(pending_files)
+        files_to_score = pending_files
+
+    if get_failed_criteria(aggregator, stop_criteria):
+        files_to_score = []
+
+    if progress is not None:
+        progress.start_stage(
+            "file_scoring", num_restored + len(files_to_score), completed=num_restored
+        )
+
+    preparer = None
+    if preprocess_workers > 0 and files_to_score:
+        preparer = FilePreparer(
+            partial(
+                prepare_file,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                max_token_count=max_token_count,
+                compute_signature=near_duplicate_index is not None,
+            ),
+            [
+                (node.full_path, {"global_context": node.global_context})
+                for node in files_to_score
+            ],
+            max_workers=preprocess_workers,
+        )
 
     # Define a worker function to score a single file
     def score_file_worker(node):
+        if progress is not None:
+            progress.check_cancelled()
+        prepared = None
+        if preparer is not None:
+            with trace(metrics, "wait_for_preprocessing", file_path=node.full_path):
+                prepared = preparer.get(node.full_path)
+        if near_duplicate_index is not None:
+            if prepared is None:
+                prepared = prepare_file(
+                    node.full_path,
+                    chunk_size=chunk_size,
+                    chunk_overlap=chunk_overlap,
+                    max_token_count=max_token_count,
+                    global_context=node.global_context,
+                    metrics=metrics,
+                    compute_signature=True,
+                )
+            if prepared.signature is not None:
+                match = near_duplicate_index.query(
+                    prepared.file_extension, prepared.signature
+                )
+                if match is not None:
+                    logger.info(f"Reusing the scores of {match[0]} for {node.name}")
+                    return reuse_file_score(prepared, *match, excluded_criteria), True
         logger.info(f"Scoring {node.name}")
-        return score_file(
+        skipped_criteria = excluded_criteria
+        if sampled:
+            # "AND" criteria are estimated from every sampled file
+            skipped_criteria |= frozenset(
+                criterion
+                for criterion in aggregator.get_decided_criteria()
+                if aggregation_logic.get(criterion, "OR") == "OR"
+            )
+        elif early_exit:
+            skipped_criteria |= aggregator.get_decided_criteria()
+        score = score_file(
             node.full_path,
             llm=llm,
+            aggregation_logic=aggregation_logic,
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             max_token_count=max_token_count,
             global_context=node.global_context,
+            metrics=metrics,
+            router=router,
+            skipped_criteria=skipped_criteria,
+            prepared=prepared,
+            call_policy=call_policy,
         )
+        if score and excluded_criteria:
+            # Pre-checks may still have decided criteria that are not scored
+            score["scores"] = drop_criteria(score["scores"], excluded_criteria)
+        # Files are complete when scored on every criterion of the assessment
+        complete = not (skipped_criteria - excluded_criteria)
+        if (
+            near_duplicate_index is not None
+            and score
+            and complete
+            and prepared.signature is not None
+        ):
+            near_duplicate_index.add(
+                node.full_path, prepared.file_extension, prepared.signature, score
+            )
+        return score, complete
 
     # Process files in parallel
     with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Copy the context so file spans nest under the caller's open span
         future_to_file = {
-            executor.submit(score_file_worker, node): node for node in files_to_score
+            executor.submit(contextvars.copy_context().run, score_file_worker, node): node
+            for node in files_to_score
         }
+        cancelling = False
+        stopped = False
         for future in concurrent.futures.as_completed(future_to_file):
+            if progress is not None and progress.cancelled and not cancelling:
+                # Stop starting new files but keep the results of the running ones
+                cancelling = True
+                for pending_future in future_to_file:
+                    pending_future.cancel()
+            if future.cancelled():
+                continue
             try:
-                score = future.result()
+                score, complete = future.result()
+                if journal is not None:
+                    journal.record_file(future_to_file[future].full_path, score)
+                if complete:
+                    complete_scores[future_to_file[future].full_path] = score
                 if score != {}:
                     all_scores.append(score)
+                    aggregator.add(score)
+                if not stopped and get_failed_criteria(aggregator, stop_criteria):
+                    # Stop starting new files, as the outcome is already known
+                    logger.info("Stopping file scoring as a stop criterion failed")
+                    stopped = True
+                    for pending_future in future_to_file:
+                        pending_future.cancel()
+            except AssessmentCancelledError:
+                continue
             except Exception as exc:
                 node = future_to_file[future]
                 logger.error(f"Error scoring {node.name}: {exc}")
+            if progress is not None:
+                progress.advance()
+    if preparer is not None:
+        preparer.shutdown()
+
+    if progress is not None:
+        progress.check_cancelled()
+
+    if result_store is not None:
+        with trace(metrics, "save_subtrees"):
+            result_store.save(root, complete_scores, aggregation_logic)
 
-    directory_scores = combine_scores(all_scores, aggregation_logic)
+    if near_duplicate_index is not None and metrics is not None:
+        num_reused = sum(
+            1
+            for node in files_to_score
+            if "near_duplicate_of" in complete_scores.get(node.full_path, {})
+        )
+        metrics.add_report(
+            "near_duplicates",
+            {
+                "scored_files": len(files_to_score),
+                "reused_files": num_reused,
+                "reuse_rate": num_reused / len(files_to_score) if files_to_score else 0.0,
+                "indexed_files": len(near_duplicate_index),
+            },
+        )
+
+    with trace(metrics, "combine_scores", num_files=len(all_scores)):
+        directory_scores = aggregator.result()
+    for criterion in excluded_criteria:
+        # Pre-checks may still have decided criteria that are not scored
+        directory_scores.pop(criterion, None)
+    if get_failed_criteria(aggregator, stop_criteria):
+        decided_criteria = aggregator.get_decided_criteria()
+        directory_scores = {
+            criterion: score
+            for criterion, score in directory_scores.items()
+            if criterion in decided_criteria
+        }
+    if sampled:
+        annotate_sampled_scores(
+            directory_scores, all_scores, aggregation_logic, num_files, sample_confidence
+        )
     return directory_scores, all_scores
 
 
+def get_failed_criteria(
+    aggregator: StreamingAggregator, criteria: FrozenSet[str]
+) -> FrozenSet[str]:
+    """
+    Get the "AND" criteria among the given ones that a file has already failed.
+
+    Args:
+        aggregator (StreamingAggregator): The aggregate of the files scored so far.
+        criteria (FrozenSet[str]): The criteria to check.
+
+    Returns:
+        FrozenSet[str]: The failed criteria.
+    """
+    if not criteria:
+        return frozenset()
+    return frozenset(
+        criterion
+        for criterion in aggregator.get_decided_criteria() & criteria
+        if aggregator.aggregation_logic.get(criterion, "OR") == "AND"
+    )
+
+
 def combine_scores(
     file_scores: List[Dict[str, Any]], aggregation_logic: Dict[str, str]
 ) -> Dict[str, Any]:
@@ -251,78 +1032,7 @@ def combine_scores(
         - "OR" logic: If any file satisfies the criterion, the combined score is 1.
         - "AND" logic: All files must satisfy the criterion for the combined score to be 1.
     """
-    # Collect all unique criteria from all files
-    all_criteria = set()
+    aggregator = StreamingAggregator(aggregation_logic)
     for file_score in file_scores:
-        all_criteria.update(file_score["scores"].keys())
-
-    # Initialize combined scores with all criteria set to 0
-    combined_scores = {
-        criterion: {
-            "score": 0,
-            "explanation": "Not satisfied by any files in the project.",
-        }
-        for criterion in all_criteria
-    }
-
-    # Iterate over each criterion
-    for criterion in combined_scores.keys():
-        logic = aggregation_logic.get(criterion, "OR")
-
-        if logic == "OR":
-            # OR logic: If any file satisfies the criterion, update the combined score
-            satisfied_files = []
-            for file_score in file_scores:
-                # Skip if this file doesn't have this criterion
-                if criterion not in file_score["scores"]:
-                    continue
-
-                if file_score["scores"][criterion]["score"] == 1:
-                    file_name = os.path.basename(file_score["file_path"])
-                    satisfied_files.append(
-                        file_score["scores"][criterion]["explanation"]
-                    )
-                    combined_scores[criterion] = {
-                        "score": 1,
-                        "explanation": f"This criterion is satisfied in the project by file '{file_name}'. {file_score['scores'][criterion]['explanation']}",
-                    }
-                    break  # No need to check further if one file satisfies
-        elif logic == "AND":
-            # Initialize the score to 1, assuming all files satisfy the criterion
-            combined_scores[criterion]["score"] = 1
-            combined_scores[criterion][
-                "explanation"
-            ] = "This criterion is consistently satisfied throughout the project."
-
-            # Collect explanations for files that do not satisfy the criterion
-            failure_explanations = []
-
-            # Check each file's score
-            for file_score in file_scores:
-                # Skip if this file doesn't have this criterion
-                if criterion not in file_score["scores"]:
-                    continue
-
-                if file_score["scores"][criterion]["score"] == 0:
-                    file_name = os.path.basename(file_score["file_path"])
-                    failure_explanations.append(
-                        f"{file_name}: {file_score['scores'][criterion]['explanation']}"
-                    )
-                    combined_scores[criterion]["score"] = 0
-
-            # If there are any failures, update the explanation
-            if failure_explanations:
-                combined_scores[criterion]["explanation"] = (
-                    "This criterion is not consistently satisfied. Issues include: "
-                    + "; ".join(
-                        failure_explanations[
-                            :3
-                        ]  # Limit to first 3 explanations to avoid overly long text
-                    )
-                )
-                if len(failure_explanations) > 3:
-                    combined_scores[criterion][
-                        "explanation"
-                    ] += f" and {len(failure_explanations) - 3} more issues."
-
-    return combined_scores
+        aggregator.add(file_score)
+    return aggregator.result()
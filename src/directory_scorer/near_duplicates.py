@@ -0,0 +1,222 @@
+import re
+import zlib
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+# NumPy is imported on first use to keep startup fast
+if TYPE_CHECKING:
+    import numpy as np
+
+# Number of hash functions of a MinHash signature
+NUM_PERMUTATIONS = 128
+
+# Number of consecutive tokens hashed together
+SHINGLE_SIZE = 5
+
+# Minimum estimated Jaccard similarity of two files for one to reuse the scores of the other
+SIMILARITY_THRESHOLD = 0.9
+
+# Number of shingles hashed at once, which bounds the memory of the hash matrix
+SHINGLE_BLOCK_SIZE = 4096
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+@lru_cache(maxsize=None)
+def get_permutations(num_perm: int) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Get the coefficients of the hash functions of a MinHash signature.
+
+    Args:
+        num_perm (int): The number of hash functions.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The multipliers and offsets of the functions.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(1)
+    # Below 2**31 so products with 32-bit hashes do not overflow 64 bits
+    a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, 1 << 31, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def get_shingles(text: str, shingle_size: int = SHINGLE_SIZE) -> List[str]:
+    """
+    Normalize a text and split it into overlapping sequences of tokens.
+
+    The text is lowercased and split into words and punctuation, so changes in
+    whitespace, indentation and line breaks do not change the shingles.
+
+    Args:
+        text (str): The text.
+        shingle_size (int): The number of tokens per shingle.
+
+    Returns:
+        List[str]: The distinct shingles.
+    """
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    if not tokens:
+        return []
+    return list(
+        {
+            " ".join(tokens[i : i + shingle_size])
+            for i in range(max(len(tokens) - shingle_size + 1, 1))
+        }
+    )
+
+
+def compute_minhash(text: str, num_perm: int = NUM_PERMUTATIONS) -> Optional["np.ndarray"]:
+    """
+    Compute the MinHash signature of the shingles of a text.
+
+    The share of equal values in two signatures estimates the Jaccard
+    similarity of the shingles of the two texts.
+
+    Args:
+        text (str): The text.
+        num_perm (int): The number of hash functions.
+
+    Returns:
+        Optional[np.ndarray]: The signature, or None if the text has no tokens.
+    """
+    import numpy as np
+
+    shingles = get_shingles(text)
+    if not shingles:
+        return None
+    a, b = get_permutations(num_perm)
+    signature = np.full(num_perm, MAX_HASH, dtype=np.uint64)
+    for start in range(0, len(shingles), SHINGLE_BLOCK_SIZE):
+        block = shingles[start : start + SHINGLE_BLOCK_SIZE]
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in block),
+            dtype=np.uint64,
+            count=len(block),
+        )
+        permuted = (np.outer(hashes, a) + b) % MERSENNE_PRIME & MAX_HASH
+        np.minimum(signature, permuted.min(axis=0), out=signature)
+    return signature
+
+
+def get_lsh_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Choose how to split signatures into bands for locality-sensitive hashing.
+
+    Two signatures are candidates if all rows of one of their bands are equal,
+    which is most likely above a similarity of about (1 / bands) ** (1 / rows).
+    The split whose threshold is closest below `threshold` is chosen, so few
+    near-duplicates are missed.
+
+    Args:
+        threshold (float): The similarity threshold.
+        num_perm (int): The number of values of a signature.
+
+    Returns:
+        Tuple[int, int]: The number of bands and of rows per band.
+    """
+    splits = [
+        (bands, num_perm // bands)
+        for bands in range(1, num_perm + 1)
+        if num_perm % bands == 0
+    ]
+    below = [
+        (bands, rows) for bands, rows in splits if (1 / bands) ** (1 / rows) <= threshold
+    ]
+    return max(below or splits[-1:], key=lambda split: (1 / split[0]) ** (1 / split[1]))
+
+
+class NearDuplicateIndex:
+    """
+    A MinHash LSH index of the scored files, to reuse scores of near-duplicate files.
+
+    Repositories forked from one template share many files that are almost
+    but not exactly the same. A file whose estimated similarity to a file
+    already in the index is at least the threshold, and that has the same
+    extension and hence the same criteria, can reuse its scores instead of
+    being sent to the language model.
+
+    Attributes:
+        threshold (float): The minimum estimated Jaccard similarity of a near-duplicate.
+        num_perm (int): The number of values of a signature.
+        bands (int): The number of LSH bands.
+        rows (int): The number of signature values per band.
+    """
+
+    def __init__(
+        self, threshold: float = SIMILARITY_THRESHOLD, num_perm: int = NUM_PERMUTATIONS
+    ):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = get_lsh_bands(threshold, num_perm)
+        self._buckets: List[Dict[Tuple[str, bytes], List[int]]] = [
+            {} for _ in range(self.bands)
+        ]
+        self._entries: List[Tuple[str, "np.ndarray", Dict[str, Any]]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get_band_keys(
+        self, file_extension: str, signature: "np.ndarray"
+    ) -> List[Tuple[str, bytes]]:
+        return [
+            (file_extension, signature[band * self.rows : (band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def add(
+        self,
+        file_path: str,
+        file_extension: str,
+        signature: "np.ndarray",
+        file_score: Dict[str, Any],
+    ) -> None:
+        """
+        Add a scored file to the index.
+
+        Args:
+            file_path (str): The path to the file.
+            file_extension (str): The extension used to select its scoring criteria.
+            signature (np.ndarray): The MinHash signature of the file content.
+            file_score (Dict[str, Any]): The scores of the file on every criterion.
+        """
+        with self._lock:
+            index = len(self._entries)
+            self._entries.append((file_path, signature, file_score))
+            keys = self._get_band_keys(file_extension, signature)
+            for bucket, key in zip(self._buckets, keys):
+                bucket.setdefault(key, []).append(index)
+
+    def query(
+        self, file_extension: str, signature: "np.ndarray"
+    ) -> Optional[Tuple[str, float, Dict[str, Any]]]:
+        """
+        Find the most similar indexed file, if it is a near-duplicate.
+
+        Args:
+            file_extension (str): The extension used to select the file's scoring criteria.
+            signature (np.ndarray): The MinHash signature of the file content.
+
+        Returns:
+            Optional[Tuple[str, float, Dict[str, Any]]]: The path, estimated similarity
+            and scores of the most similar file, or None if no file reaches the
+            threshold.
+        """
+        with self._lock:
+            candidates = set()
+            keys = self._get_band_keys(file_extension, signature)
+            for bucket, key in zip(self._buckets, keys):
+                candidates.update(bucket.get(key, ()))
+            best = None
+            for index in candidates:
+                file_path, candidate_signature, file_score = self._entries[index]
+                similarity = float((candidate_signature == signature).mean())
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (file_path, similarity, file_score)
+        return best
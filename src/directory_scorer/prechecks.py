@@ -0,0 +1,61 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, Pattern, Tuple
+from generators import content_based_criterion_generator
+
+
+@lru_cache(maxsize=None)
+def get_prechecks(
+    file_extension: str,
+) -> Tuple[Tuple[str, Pattern[str], int, str], ...]:
+    """
+    Get the local pre-checks of the content-based criteria for a file extension.
+
+    A pre-check is defined by the `precheck` entry of a criterion: if the file
+    does not match `required_pattern`, the criterion is decided without the
+    language model, with score `score_if_absent` and the given explanation.
+
+    Args:
+        file_extension (str): The file extension.
+
+    Returns:
+        Tuple[Tuple[str, Pattern[str], int, str], ...]: The criterion ID, compiled
+        pattern, score and explanation of each pre-check.
+    """
+    prechecks = []
+    for criterion_id, criterion in content_based_criterion_generator(file_extension):
+        precheck = criterion.get("precheck")
+        if not precheck:
+            continue
+        prechecks.append(
+            (
+                criterion_id,
+                re.compile(precheck["required_pattern"], re.MULTILINE),
+                int(precheck["score_if_absent"]),
+                precheck["explanation"],
+            )
+        )
+    return tuple(prechecks)
+
+
+def run_prechecks(content: str, file_extension: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Decide the criteria whose outcome is obvious from the file content.
+
+    For example, a file that never mentions a logging library does not satisfy
+    the logging criteria, and a file without functions or classes trivially
+    satisfies the docstring criteria.
+
+    Args:
+        content (str): The file content.
+        file_extension (str): The file extension.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: The scores of the decided criteria, keyed by
+        criterion ID, in the same format as the language model scores.
+    """
+    scores = {}
+    for criterion_id, pattern, score, explanation in get_prechecks(file_extension):
+        if pattern.search(content) is None:
+            scores[criterion_id] = {"score": score, "explanation": explanation}
+    return scores
@@ -0,0 +1,94 @@
+import threading
+import multiprocessing
+import concurrent.futures
+from typing import Any, Callable, Dict, List, Tuple
+
+
+class FilePreparer:
+    """
+    Prepares files in a pool of processes ahead of the scoring threads.
+
+    Loading documents, parsing PDFs and notebooks, splitting text and counting
+    tokens hold the GIL, so on a thread pool they cap throughput at one core.
+    This stage runs them in separate processes and hands the prepared chunks
+    to the I/O-bound threads that call the language model.
+
+    Files are prepared in the given order, at most `lookahead` files ahead of
+    the last one requested, so prepared content does not pile up in memory
+    while the scoring threads wait on the language model.
+
+    Attributes:
+        file_paths (List[str]): The files to prepare, in scoring order.
+        max_workers (int): The number of pre-processing processes.
+        lookahead (int): How many files to prepare ahead of the scoring threads.
+    """
+
+    def __init__(
+        self,
+        prepare_fn: Callable[..., Any],
+        files: List[Tuple[str, Dict[str, Any]]],
+        max_workers: int,
+        lookahead: int = 0,
+    ):
+        """
+        Start the process pool.
+
+        Args:
+            prepare_fn (Callable[..., Any]): Prepares one file given its path. It must
+                be picklable, e.g. a module-level function or a `functools.partial`
+                of one.
+            files (List[Tuple[str, Dict[str, Any]]]): The files to prepare, in scoring
+                order, each with extra keyword arguments for `prepare_fn`.
+            max_workers (int): The number of pre-processing processes.
+            lookahead (int): How many files to prepare ahead of the scoring threads.
+                Defaults to four per process.
+        """
+        self.file_paths = [file_path for file_path, _ in files]
+        self.max_workers = max_workers
+        self.lookahead = lookahead or 4 * max_workers
+        self._prepare_fn = prepare_fn
+        self._kwargs = [kwargs for _, kwargs in files]
+        self._positions = {file_path: i for i, file_path in enumerate(self.file_paths)}
+        self._futures: Dict[str, concurrent.futures.Future] = {}
+        self._next_index = 0
+        self._lock = threading.Lock()
+        # Forking a process that runs scoring threads can copy held locks
+        self._pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def _submit_until(self, index: int) -> None:
+        while self._next_index < min(index, len(self.file_paths)):
+            file_path = self.file_paths[self._next_index]
+            self._futures[file_path] = self._pool.submit(
+                self._prepare_fn, file_path, **self._kwargs[self._next_index]
+            )
+            self._next_index += 1
+
+    def get(self, file_path: str) -> Any:
+        """
+        Get a prepared file, waiting for its preparation to finish.
+
+        Args:
+            file_path (str): One of the files to prepare.
+
+        Returns:
+            Any: The result of `prepare_fn` for the file.
+
+        Raises:
+            Exception: Any exception raised while preparing the file.
+        """
+        with self._lock:
+            self._submit_until(self._positions[file_path] + 1 + self.lookahead)
+            future = self._futures.pop(file_path)
+        return future.result()
+
+    def shutdown(self) -> None:
+        """Cancel the pending preparations and stop the processes."""
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "FilePreparer":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.shutdown()
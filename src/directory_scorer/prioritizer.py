@@ -0,0 +1,87 @@
+import os
+from typing import List, Tuple
+from directory_scorer.tree import TreeNode
+
+# Lower priorities are scored first
+SOURCE_PRIORITY = 0
+CODE_PRIORITY = 1
+DOCUMENT_PRIORITY = 2
+TEST_PRIORITY = 3
+CONFIG_PRIORITY = 4
+
+SOURCE_DIRECTORIES = {"src", "lib", "app", "notebooks"}
+TEST_DIRECTORIES = {"test", "tests", "testing"}
+CODE_EXTENSIONS = {".py", ".ipynb"}
+DOCUMENT_EXTENSIONS = {".md", ".pdf", ".docx", ".txt"}
+
+
+def is_test_file(parts: List[str], name: str) -> bool:
+    """Check whether a path looks like a test module or lives in a test directory."""
+    stem = os.path.splitext(name)[0]
+    return (
+        any(part.lower() in TEST_DIRECTORIES for part in parts)
+        or stem.startswith("test_")
+        or stem.endswith("_test")
+        or name == "conftest.py"
+    )
+
+
+def get_file_priority(node: TreeNode, root_path: str) -> int:
+    """
+    Estimate how decisive a file's scores are likely to be.
+
+    Source modules and notebooks decide most code quality criteria, while tests
+    and configuration files rarely do.
+
+    Args:
+        node (TreeNode): The file node.
+        root_path (str): The path of the scored directory.
+
+    Returns:
+        int: The priority, lower values first.
+    """
+    relative_path = os.path.relpath(node.full_path, root_path)
+    parts = relative_path.split(os.sep)[:-1]
+    extension = os.path.splitext(node.name)[-1].lower()
+
+    if extension in CODE_EXTENSIONS:
+        if is_test_file(parts, node.name):
+            return TEST_PRIORITY
+        if extension == ".ipynb" or any(
+            part.lower() in SOURCE_DIRECTORIES for part in parts
+        ):
+            return SOURCE_PRIORITY
+        return CODE_PRIORITY
+    if extension in DOCUMENT_EXTENSIONS:
+        return DOCUMENT_PRIORITY
+    return CONFIG_PRIORITY
+
+
+def get_file_size(node: TreeNode) -> int:
+    """Get the size of a file in bytes, or 0 if it cannot be read."""
+    try:
+        return os.path.getsize(node.full_path)
+    except OSError:
+        return 0
+
+
+def prioritize_files(files: List[TreeNode], root_path: str) -> List[TreeNode]:
+    """
+    Order files so that the most decisive and the longest jobs start first.
+
+    Files are sorted by priority (source modules and notebooks, other code,
+    documents, tests, then configuration files) and, within a priority, by
+    decreasing size so large files do not straggle at the end of the pool.
+
+    Args:
+        files (List[TreeNode]): The file nodes to score.
+        root_path (str): The path of the scored directory.
+
+    Returns:
+        List[TreeNode]: The files in scoring order.
+    """
+
+    def sort_key(node: TreeNode) -> Tuple[int, int, str]:
+        return (get_file_priority(node, root_path), -get_file_size(node), node.full_path)
+
+    return sorted(files, key=sort_key)
@@ -0,0 +1,176 @@
+import os
+import random
+from statistics import NormalDist
+from typing import Any, Dict, List, Tuple
+from directory_scorer.tree import TreeNode
+
+# Confidence level of the bounds of criteria estimated from a sample
+SAMPLE_CONFIDENCE = 0.95
+
+ROOT_STRATUM = "."
+
+
+def get_stratum(node: TreeNode, root_path: str) -> Tuple[str, str]:
+    """
+    Get the stratum of a file: its top-level directory and its extension.
+
+    Args:
+        node (TreeNode): The file.
+        root_path (str): The path to the repository.
+
+    Returns:
+        Tuple[str, str]: The top-level directory, "." for files in the root, and
+        the lowercased extension.
+    """
+    parts = os.path.relpath(node.full_path, root_path).split(os.sep)
+    directory = parts[0] if len(parts) > 1 else ROOT_STRATUM
+    return directory, os.path.splitext(node.name)[-1].lower()
+
+
+def allocate_sample(stratum_sizes: Dict[Any, int], sample_size: int) -> Dict[Any, int]:
+    """
+    Split a sample size across strata in proportion to their size.
+
+    Every stratum gets at least one file if the sample is large enough, so
+    small directories and rare file types are represented. Otherwise the
+    largest strata get one file each.
+
+    Args:
+        stratum_sizes (Dict[Any, int]): The number of files of each stratum.
+        sample_size (int): The total number of files to sample.
+
+    Returns:
+        Dict[Any, int]: The number of files to sample from each stratum.
+    """
+    by_size = sorted(stratum_sizes, key=lambda stratum: -stratum_sizes[stratum])
+    if sample_size <= len(by_size):
+        return {stratum: int(i < sample_size) for i, stratum in enumerate(by_size)}
+
+    allocation = {stratum: 1 for stratum in by_size}
+    remaining = sample_size - len(by_size)
+    spare = {stratum: stratum_sizes[stratum] - 1 for stratum in by_size}
+    total_spare = sum(spare.values())
+    if total_spare == 0:
+        return allocation
+    # Largest remainder apportionment of the files left after one per stratum
+    quotas = {stratum: remaining * spare[stratum] / total_spare for stratum in by_size}
+    for stratum in by_size:
+        allocation[stratum] += min(int(quotas[stratum]), spare[stratum])
+    leftover = sample_size - sum(allocation.values())
+    for stratum in sorted(by_size, key=lambda s: int(quotas[s]) - quotas[s]):
+        if leftover <= 0:
+            break
+        if allocation[stratum] < stratum_sizes[stratum]:
+            allocation[stratum] += 1
+            leftover -= 1
+    return allocation
+
+
+def stratified_sample(
+    files: List[TreeNode], sample_size: int, root_path: str, seed: int = 0
+) -> List[TreeNode]:
+    """
+    Draw a random sample of files, stratified by top-level directory and extension.
+
+    Args:
+        files (List[TreeNode]): The files, in scoring order.
+        sample_size (int): The number of files to sample.
+        root_path (str): The path to the repository.
+        seed (int): The seed of the random draw, so reruns sample the same files.
+
+    Returns:
+        List[TreeNode]: The sampled files, in scoring order.
+    """
+    if sample_size >= len(files):
+        return list(files)
+
+    strata: Dict[Tuple[str, str], List[TreeNode]] = {}
+    for node in files:
+        strata.setdefault(get_stratum(node, root_path), []).append(node)
+    allocation = allocate_sample(
+        {stratum: len(nodes) for stratum, nodes in strata.items()}, sample_size
+    )
+
+    rng = random.Random(seed)
+    sampled = set()
+    for stratum in sorted(strata):
+        sampled.update(id(node) for node in rng.sample(strata[stratum], allocation[stratum]))
+    return [node for node in files if id(node) in sampled]
+
+
+def wilson_interval(
+    successes: int, trials: int, confidence: float = SAMPLE_CONFIDENCE
+) -> Tuple[float, float]:
+    """
+    Get the Wilson score interval of a proportion.
+
+    Unlike the normal approximation, it stays within [0, 1] and is reliable
+    for proportions close to 0 or 1 and for small samples.
+
+    Args:
+        successes (int): The number of successes.
+        trials (int): The number of trials.
+        confidence (float): The confidence level of the interval.
+
+    Returns:
+        Tuple[float, float]: The lower and upper bounds, (0, 1) if there are no trials.
+    """
+    if trials == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+    p = successes / trials
+    denominator = 1 + z**2 / trials
+    center = (p + z**2 / (2 * trials)) / denominator
+    margin = z * ((p * (1 - p) + z**2 / (4 * trials)) / trials) ** 0.5 / denominator
+    low = 0.0 if successes == 0 else max(0.0, center - margin)
+    high = 1.0 if successes == trials else min(1.0, center + margin)
+    return low, high
+
+
+def annotate_sampled_scores(
+    directory_scores: Dict[str, Dict[str, Any]],
+    file_scores: List[Dict[str, Any]],
+    aggregation_logic: Dict[str, str],
+    num_files: int,
+    confidence: float = SAMPLE_CONFIDENCE,
+) -> None:
+    """
+    Mark the directory scores that were estimated from a sample of the files.
+
+    An "AND" criterion gets the share of sampled files that satisfy it, with
+    its confidence bounds. An "OR" criterion that no sampled file satisfies
+    could still be satisfied by a file outside the sample. An "OR" criterion
+    satisfied by a sampled file is certain and is left unmarked.
+
+    Args:
+        directory_scores (Dict[str, Dict[str, Any]]): The combined scores, updated in place.
+        file_scores (List[Dict[str, Any]]): The scores of the sampled files.
+        aggregation_logic (Dict[str, str]): The AND/OR logic per criterion.
+        num_files (int): The number of files in the repository.
+        confidence (float): The confidence level of the bounds.
+    """
+    for criterion, result in directory_scores.items():
+        scores = [
+            file_score["scores"][criterion]["score"]
+            for file_score in file_scores
+            if criterion in file_score["scores"]
+        ]
+        if aggregation_logic.get(criterion, "OR") == "AND":
+            low, high = wilson_interval(sum(scores), len(scores), confidence)
+            pass_rate = sum(scores) / len(scores) if scores else 0.0
+            result["pass_rate"] = round(pass_rate, 3)
+            result["pass_rate_bounds"] = [round(low, 3), round(high, 3)]
+            result["explanation"] += (
+                f" Estimated from a sample of {len(scores)} of {num_files} files: "
+                f"{pass_rate:.0%} of the sampled files satisfy it "
+                f"({confidence:.0%} confidence interval {low:.0%}-{high:.0%})."
+            )
+        elif result["score"] == 0:
+            result["explanation"] += (
+                f" Only {len(scores)} of {num_files} files were sampled, so a file "
+                "outside the sample may satisfy it."
+            )
+        else:
+            continue
+        result["sampled"] = True
+        result["sample_size"] = len(scores)
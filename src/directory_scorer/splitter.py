@@ -0,0 +1,204 @@
+import os
+import ast
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Extensions that are split along their structure rather than by characters
+STRUCTURED_EXTENSIONS = (".py", ".ipynb")
+
+
+def split_python_source(source: str) -> List[str]:
+    """
+    Split Python source code on top-level statement boundaries.
+
+    Each top-level function or class (with its decorators and the comments
+    directly above it) becomes its own segment, so no definition is cut in the
+    middle. Consecutive small statements such as imports are merged later when
+    segments are packed into chunks.
+
+    Args:
+        source (str): The Python source code.
+
+    Returns:
+        List[str]: The segments, which concatenate back to the original source.
+        Source that cannot be parsed is split on blank lines instead.
+    """
+    lines = source.splitlines(keepends=True)
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        logger.debug("Could not parse Python source, splitting on blank lines")
+        return split_on_blank_lines(lines)
+
+    starts = []
+    for node in tree.body:
+        start = min(
+            [node.lineno] + [decorator.lineno for decorator in node_decorators(node)]
+        )
+        # Keep the comments directly above a statement with it
+        while start > 1 and lines[start - 2].lstrip().startswith("#"):
+            start -= 1
+        starts.append(start - 1)
+
+    if not starts:
+        return [source] if source else []
+
+    starts[0] = 0
+    boundaries = sorted(set(starts)) + [len(lines)]
+    return [
+        "".join(lines[begin:end]) for begin, end in zip(boundaries, boundaries[1:])
+    ]
+
+
+def node_decorators(node: ast.stmt) -> List[ast.expr]:
+    """Get the decorators of a function or class definition, if any."""
+    return getattr(node, "decorator_list", [])
+
+
+def split_on_blank_lines(lines: List[str]) -> List[str]:
+    """Split lines into paragraphs that end at a blank line."""
+    segments, current = [], []
+    for line in lines:
+        current.append(line)
+        if not line.strip():
+            segments.append("".join(current))
+            current = []
+    if current:
+        segments.append("".join(current))
+    return segments
+
+
+def render_notebook_cell(cell: Dict[str, Any]) -> str:
+    """Render a notebook cell in the percent format used by Jupytext."""
+    source = cell.get("source", "")
+    if isinstance(source, list):
+        source = "".join(source)
+    cell_type = cell.get("cell_type", "code")
+    header = "# %%" if cell_type == "code" else f"# %% [{cell_type}]"
+    return f"{header}\n{source.rstrip()}\n\n"
+
+
+def split_notebook(notebook: Dict[str, Any]) -> List[str]:
+    """
+    Split a Jupyter notebook into groups of cells.
+
+    A group starts at each markdown cell and contains the code cells that
+    follow it, so the explanation of a step is kept with its code.
+
+    Args:
+        notebook (Dict[str, Any]): The parsed notebook JSON.
+
+    Returns:
+        List[str]: The rendered cell groups.
+    """
+    segments: List[str] = []
+    current: List[str] = []
+    for cell in notebook.get("cells", []):
+        if cell.get("cell_type") == "markdown" and current:
+            segments.append("".join(current))
+            current = []
+        current.append(render_notebook_cell(cell))
+    if current:
+        segments.append("".join(current))
+    return segments
+
+
+def split_oversized_segment(
+    segment: str, max_tokens: int, length_function: Callable[[str], int]
+) -> List[Tuple[str, int]]:
+    """
+    Split a segment that does not fit in one chunk on line boundaries.
+
+    Lines that are too long on their own are halved by characters until they fit.
+
+    Args:
+        segment (str): The segment to split.
+        max_tokens (int): The maximum number of tokens per piece.
+        length_function (Callable[[str], int]): Counts the tokens of a text.
+
+    Returns:
+        List[Tuple[str, int]]: The pieces and their token counts.
+    """
+    lines = segment.splitlines(keepends=True)
+    if len(lines) == 1:
+        if len(segment) <= 1:
+            return [(segment, length_function(segment))]
+        middle = len(segment) // 2
+        lines = [segment[:middle], segment[middle:]]
+    return pack_segments(lines, max_tokens, length_function)
+
+
+def pack_segments(
+    segments: List[str],
+    max_tokens: int,
+    length_function: Callable[[str], int],
+) -> List[Tuple[str, int]]:
+    """
+    Greedily pack consecutive segments into chunks of at most `max_tokens` tokens.
+
+    Args:
+        segments (List[str]): The segments, in file order.
+        max_tokens (int): The maximum number of tokens per chunk.
+        length_function (Callable[[str], int]): Counts the tokens of a text.
+
+    Returns:
+        List[Tuple[str, int]]: The chunks and their (approximate) token counts.
+    """
+    chunks: List[Tuple[str, int]] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    for segment in segments:
+        tokens = length_function(segment)
+        if tokens > max_tokens:
+            pieces = split_oversized_segment(segment, max_tokens, length_function)
+        else:
+            pieces = [(segment, tokens)]
+
+        for piece, piece_tokens in pieces:
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append(("".join(current), current_tokens))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+
+    if current:
+        chunks.append(("".join(current), current_tokens))
+    return chunks
+
+
+def split_file_by_structure(
+    file_path: str, max_tokens: int, length_function: Callable[[str], int]
+) -> Optional[List[Tuple[str, int]]]:
+    """
+    Split a Python file or notebook into token-sized chunks along its structure.
+
+    Args:
+        file_path (str): The path to the file.
+        max_tokens (int): The maximum number of tokens per chunk.
+        length_function (Callable[[str], int]): Counts the tokens of a text.
+
+    Returns:
+        Optional[List[Tuple[str, int]]]: The chunks and their token counts, or None
+        if the file type has no structure-aware splitter or the file cannot be parsed.
+    """
+    ext = os.path.splitext(file_path)[-1].lower()
+    if ext not in STRUCTURED_EXTENSIONS:
+        return None
+
+    with open(file_path, "r", encoding="utf-8", errors="replace") as file:
+        content = file.read()
+
+    if ext == ".py":
+        segments = split_python_source(content)
+    else:
+        try:
+            segments = split_notebook(json.loads(content))
+        except (json.JSONDecodeError, AttributeError):
+            logger.warning(f"Could not parse notebook {file_path}")
+            return None
+
+    return pack_segments(segments, max_tokens, length_function)
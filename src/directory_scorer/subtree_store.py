@@ -0,0 +1,233 @@
+import os
+import json
+import hashlib
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+from config import paths
+from logger import get_logger
+from utils.general import write_json_file
+from directory_scorer.tree import TreeNode, post_order_generator
+from directory_scorer.aggregation import StreamingAggregator
+
+logger = get_logger(__name__)
+
+# The files whose content changes how files are scored
+SCORING_DEFINITION_FPATHS = [
+    paths.CODE_QUALITY_CRITERIA_FPATH,
+    paths.PROMPTS_FPATH,
+]
+
+
+def get_result_namespace(
+    model_name: str,
+    global_context: str = "",
+    excluded_criteria: FrozenSet[str] = frozenset(),
+) -> str:
+    """
+    Get the namespace of the file scores given by a model with the current criteria.
+
+    Args:
+        model_name (str): Identifies the model, or the routing configuration, the
+            files are scored with.
+        global_context (str): The context about the codebase sent with each file.
+        excluded_criteria (FrozenSet[str]): Criteria the files are not scored on,
+            e.g. those above the target tier.
+
+    Returns:
+        str: The namespace.
+    """
+    digest = hashlib.sha256(global_context.encode("utf-8"))
+    for file_path in SCORING_DEFINITION_FPATHS:
+        with open(file_path, "rb") as file:
+            digest.update(file.read())
+    if excluded_criteria:
+        digest.update(",".join(sorted(excluded_criteria)).encode("utf-8"))
+    return f"{model_name}:{digest.hexdigest()[:16]}"
+
+
+class RestoredSubtree:
+    """
+    The stored results of a file or directory whose content has not changed.
+
+    Attributes:
+        file_scores (Dict[str, Dict[str, Any]]): The scores of the files of the
+            subtree keyed by their current path. Skipped files have an empty result.
+        aggregate (Optional[Dict[str, Dict[str, Any]]]): For a directory, the
+            `StreamingAggregator` state of its file scores.
+    """
+
+    __slots__ = ("file_scores", "aggregate")
+
+    def __init__(
+        self,
+        file_scores: Dict[str, Dict[str, Any]],
+        aggregate: Optional[Dict[str, Dict[str, Any]]] = None,
+    ):
+        self.file_scores = file_scores
+        self.aggregate = aggregate
+
+
+class SubtreeResultStore:
+    """
+    File scores and partial directory aggregates keyed by the Merkle hash of the subtree.
+
+    A file entry holds the scores of the file, and a directory entry the scores
+    of all its files along with their running aggregate. A subtree whose hash is
+    stored, such as a vendored package, a template folder shared by student
+    forks or an unchanged directory of a previous run, is restored from a single
+    entry: its files are neither read nor scored again, and its aggregate is
+    merged into the directory scores as a whole.
+
+    Attributes:
+        store_dir (str): The directory the entries are stored in.
+        namespace (str): Identifies the model and criteria the files were scored
+            with. Entries of other namespaces are not reused.
+    """
+
+    def __init__(self, store_dir: str, namespace: str = ""):
+        self.store_dir = store_dir
+        self.namespace = namespace
+        self._stored: Set[str] = set()
+
+    def _get_path(self, content_hash: str) -> str:
+        key = hashlib.sha256(f"{self.namespace}\0{content_hash}".encode("utf-8")).hexdigest()
+        return os.path.join(self.store_dir, key[:2], f"{key}.json")
+
+    def get(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a stored entry.
+
+        Args:
+            content_hash (str): The Merkle hash of the file or directory.
+
+        Returns:
+            Optional[Dict[str, Any]]: The entry, or None if it is not stored.
+        """
+        try:
+            with open(self._get_path(content_hash), "r", encoding="utf-8") as file:
+                entry = json.load(file)
+        except FileNotFoundError:
+            return None
+        except ValueError as exc:
+            logger.warning(f"Ignoring unreadable result entry {content_hash}: {exc}")
+            return None
+        self._stored.add(content_hash)
+        return entry
+
+    def put(self, content_hash: str, entry: Dict[str, Any]) -> None:
+        """
+        Store an entry.
+
+        Args:
+            content_hash (str): The Merkle hash of the file or directory.
+            entry (Dict[str, Any]): The entry.
+        """
+        file_path = self._get_path(content_hash)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        write_json_file(file_path, entry)
+        self._stored.add(content_hash)
+
+    def restore(self, root: TreeNode) -> List[RestoredSubtree]:
+        """
+        Restore the results of the largest unchanged subtrees of a tree.
+
+        The tree is searched from the root down, and the descendants of a stored
+        directory are not looked up.
+
+        Args:
+            root (TreeNode): The root of a tree with content hashes.
+
+        Returns:
+            List[RestoredSubtree]: The results of the stored subtrees.
+        """
+        restored: List[RestoredSubtree] = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            entry = self.get(node.content_hash)
+            if entry is None:
+                stack.extend(node.children)
+            elif node.is_dir:
+                file_scores = {}
+                for relative_path, score in entry["file_scores"].items():
+                    file_path = os.path.join(node.full_path, *relative_path.split("/"))
+                    file_scores[file_path] = with_file_path(score, file_path)
+                restored.append(RestoredSubtree(file_scores, entry["aggregate"]))
+                # Descendants are stored before the directories that contain them
+                self._stored.update(
+                    descendant.content_hash for descendant in post_order_generator(node)
+                )
+            else:
+                restored.append(
+                    RestoredSubtree(
+                        {node.full_path: with_file_path(entry["score"], node.full_path)}
+                    )
+                )
+        return restored
+
+    def save(
+        self,
+        root: TreeNode,
+        file_scores: Dict[str, Dict[str, Any]],
+        aggregation_logic: Dict[str, str],
+    ) -> int:
+        """
+        Store the results of every file and complete directory of a tree.
+
+        A directory is stored only if all its files have a result. Subtrees that
+        are already stored are not written again.
+
+        Args:
+            root (TreeNode): The root of a tree with content hashes.
+            file_scores (Dict[str, Dict[str, Any]]): The scores of the files scored on
+                every criterion, keyed by path. Skipped files have an empty result.
+            aggregation_logic (Dict[str, str]): The AND/OR logic per criterion.
+
+        Returns:
+            int: The number of entries written.
+        """
+        # The file scores (by path relative to the node) and aggregate of each complete node
+        complete: Dict[int, Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]]]] = {}
+        num_written = 0
+        for node in post_order_generator(root):
+            if not node.is_dir:
+                score = file_scores.get(node.full_path)
+                if score is None:
+                    continue
+                score = without_file_path(score)
+                aggregator = StreamingAggregator(aggregation_logic)
+                if score:
+                    aggregator.add(with_file_path(score, node.full_path))
+                complete[id(node)] = ({node.name: score}, aggregator.get_state())
+                if node.content_hash not in self._stored:
+                    self.put(node.content_hash, {"score": score})
+                    num_written += 1
+                continue
+
+            if not all(id(child) in complete for child in node.children):
+                continue
+            subtree_scores: Dict[str, Dict[str, Any]] = {}
+            aggregator = StreamingAggregator(aggregation_logic)
+            for child in node.children:
+                child_scores, child_aggregate = complete.pop(id(child))
+                prefix = f"{child.name}/" if child.is_dir else ""
+                for relative_path, score in child_scores.items():
+                    subtree_scores[prefix + relative_path] = score
+                aggregator.merge_state(child_aggregate)
+            complete[id(node)] = (subtree_scores, aggregator.get_state())
+            if node.content_hash not in self._stored:
+                self.put(
+                    node.content_hash,
+                    {"file_scores": subtree_scores, "aggregate": aggregator.get_state()},
+                )
+                num_written += 1
+        return num_written
+
+
+def with_file_path(score: Dict[str, Any], file_path: str) -> Dict[str, Any]:
+    """Get a file result with its current path, or an empty result for a skipped file."""
+    return {**score, "file_path": file_path} if score else {}
+
+
+def without_file_path(score: Dict[str, Any]) -> Dict[str, Any]:
+    """Get a file result without its path, which is not part of the file content."""
+    return {key: value for key, value in score.items() if key != "file_path"}
@@ -0,0 +1,364 @@
+import os
+import hashlib
+import threading
+import contextvars
+import concurrent.futures
+from typing import Any, Dict, List, Optional, Set, TYPE_CHECKING
+from config import paths
+from logger import get_logger
+from metrics import MetricsCollector, get_llm_config, trace
+from utils.general import read_yaml_file
+from utils.progress import ProgressTracker
+from utils.router import FAST_ROUTE, ModelRouter
+from directory_scorer.tree import TreeNode, compute_content_hashes, post_order_generator
+from directory_scorer.content_based_scorer import load_document
+
+if TYPE_CHECKING:
+    from langchain_core.language_models.chat_models import BaseChatModel
+
+logger = get_logger(__name__)
+
+prompts = read_yaml_file(paths.PROMPTS_FPATH)
+summarize_file_prompt = prompts["summarize_file"]
+summarize_directory_prompt = prompts["summarize_directory"]
+
+# Approximate number of characters per token of code and prose
+SUMMARY_CHARS_PER_TOKEN = 4
+
+# Maximum number of characters of a file sent to be summarized
+FILE_SUMMARY_MAX_CHARS = 24000
+
+# Maximum number of children listed in a directory summary prompt
+MAX_DIRECTORY_CHILDREN = 100
+
+# Maximum number of characters of each child summary in a directory summary prompt
+CHILD_SUMMARY_MAX_CHARS = 600
+
+# Depth of the directory levels listed in the repository digest, the root being 0
+DIGEST_MAX_DEPTH = 2
+
+# Token budget of the repository digest
+DIGEST_MAX_TOKENS = 2000
+
+
+class SummaryCache:
+    """
+    Summaries of files and directories keyed by the hash of their content.
+
+    Each summary is stored in its own text file, so concurrent runs can share
+    the cache and a subtree that has not changed since a previous run, or that
+    is copied across repositories, is not summarized again.
+
+    Attributes:
+        cache_dir (str): The directory the summaries are stored in.
+        namespace (str): Identifies the model and prompts the summaries were
+            written with. Summaries of other namespaces are not reused.
+    """
+
+    def __init__(self, cache_dir: str, namespace: str = ""):
+        self.cache_dir = cache_dir
+        self.namespace = namespace
+
+    def _get_path(self, content_hash: str) -> str:
+        key = hashlib.sha256(f"{self.namespace}\0{content_hash}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], f"{key}.txt")
+
+    def get(self, content_hash: str) -> Optional[str]:
+        """
+        Get a cached summary.
+
+        Args:
+            content_hash (str): The hash of the summarized subtree.
+
+        Returns:
+            Optional[str]: The summary, or None if it is not cached.
+        """
+        try:
+            with open(self._get_path(content_hash), "r", encoding="utf-8") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, content_hash: str, summary: str) -> None:
+        """
+        Cache a summary.
+
+        Args:
+            content_hash (str): The hash of the summarized subtree.
+            summary (str): The summary.
+        """
+        file_path = self._get_path(content_hash)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        temp_file_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_file_path, "w", encoding="utf-8") as file:
+            file.write(summary)
+        os.replace(temp_file_path, file_path)
+
+
+def get_summary_namespace(model_name: str) -> str:
+    """
+    Get the cache namespace of the summaries written by a model with the current prompts.
+
+    Args:
+        model_name (str): The model that writes the summaries, or the routing
+            configuration when summaries are routed.
+
+    Returns:
+        str: The namespace.
+    """
+    prompts_hash = hashlib.sha256(
+        (summarize_file_prompt + summarize_directory_prompt).encode("utf-8")
+    ).hexdigest()
+    return f"{model_name}:{prompts_hash[:16]}"
+
+
+def get_relative_path(node: TreeNode, root: TreeNode) -> str:
+    """Get the path of a node relative to the parent of the root, e.g. "repo/src"."""
+    relative_path = os.path.relpath(node.full_path, os.path.dirname(root.full_path))
+    return relative_path.replace(os.sep, "/")
+
+
+def get_node_heights(root: TreeNode) -> Dict[str, int]:
+    """
+    Get the height of every node, 0 for files and empty directories.
+
+    Args:
+        root (TreeNode): The root of the tree.
+
+    Returns:
+        Dict[str, int]: The height of each node keyed by its full path.
+    """
+    heights: Dict[str, int] = {}
+    for node in post_order_generator(root):
+        heights[node.full_path] = max(
+            (heights[child.full_path] + 1 for child in node.children), default=0
+        )
+    return heights
+
+
+def build_summary_prompt(node: TreeNode, root: TreeNode) -> str:
+    """
+    Build the prompt that summarizes a file, or a directory from its children's summaries.
+
+    Args:
+        node (TreeNode): The file or directory to summarize. The children of a
+            directory must be summarized first.
+        root (TreeNode): The root of the tree, used to show the node's path.
+
+    Returns:
+        str: The prompt.
+    """
+    path = get_relative_path(node, root)
+    if not node.is_dir:
+        documents = load_document(node.full_path)
+        content = "\n\n".join(document.page_content for document in documents)
+        if len(content) > FILE_SUMMARY_MAX_CHARS:
+            content = content[:FILE_SUMMARY_MAX_CHARS] + "\n[...]"
+        return summarize_file_prompt.format(file_path=path, file_content=content)
+
+    children = sorted(node.children, key=lambda child: (not child.is_dir, child.name))
+    lines = []
+    for child in children[:MAX_DIRECTORY_CHILDREN]:
+        summary = " ".join(child.summary.split()) or "(no summary)"
+        if len(summary) > CHILD_SUMMARY_MAX_CHARS:
+            summary = summary[:CHILD_SUMMARY_MAX_CHARS] + " [...]"
+        suffix = "/" if child.is_dir else ""
+        lines.append(f"- {child.name}{suffix}: {summary}")
+    if len(children) > MAX_DIRECTORY_CHILDREN:
+        lines.append(f"- ... {len(children) - MAX_DIRECTORY_CHILDREN} more entries")
+    return summarize_directory_prompt.format(directory_path=path, children="\n".join(lines))
+
+
+def summarize_node(
+    node: TreeNode,
+    root: TreeNode,
+    llm: "BaseChatModel",
+    metrics: Optional[MetricsCollector] = None,
+    router: Optional["ModelRouter"] = None,
+) -> str:
+    """
+    Summarize a file, or a directory from the summaries of its children.
+
+    Args:
+        node (TreeNode): The file or directory to summarize.
+        root (TreeNode): The root of the tree.
+        llm (BaseChatModel): The language model to summarize with.
+        metrics (Optional[MetricsCollector]): Collector for stage timings and token usage.
+        router (Optional[ModelRouter]): Sends the call to the fast route. `llm` is
+            used directly if not given.
+
+    Returns:
+        str: The summary.
+    """
+    span_name = "summarize_directory" if node.is_dir else "summarize_file"
+    with trace(metrics, span_name, file_path=node.full_path):
+        prompt = build_summary_prompt(node, root)
+        if router is not None:
+            response = router.invoke(
+                FAST_ROUTE,
+                prompt,
+                lambda model: model,
+                cache_key="summary",
+                config=get_llm_config(metrics),
+            )
+        else:
+            response = llm.invoke(prompt, config=get_llm_config(metrics))
+    return str(response.content).strip()
+
+
+def summarize_tree(
+    root: TreeNode,
+    llm: "BaseChatModel",
+    cache: Optional[SummaryCache] = None,
+    max_workers: int = 4,
+    metrics: Optional[MetricsCollector] = None,
+    router: Optional["ModelRouter"] = None,
+    progress: Optional[ProgressTracker] = None,
+    output_dir: Optional[str] = None,
+) -> Dict[str, int]:
+    """
+    Summarize every file and directory of a tree, bottom-up.
+
+    Files are summarized first, then directories level by level from the
+    deepest up, each from the summaries of its children. The nodes of a level
+    are summarized concurrently. Summaries are cached by the hash of the content
+    of their subtree, so a directory whose content has not changed is taken
+    from the cache along with its descendants, without reading or summarizing
+    them again. The summaries are stored in the `summary` of each node.
+
+    Args:
+        root (TreeNode): The root of the tree to summarize.
+        llm (BaseChatModel): The language model to summarize with.
+        cache (Optional[SummaryCache]): The summaries of previous runs. Nothing is
+            cached if not given.
+        max_workers (int): The maximum number of concurrent summaries.
+        metrics (Optional[MetricsCollector]): Collector for stage timings and token usage.
+        router (Optional[ModelRouter]): Sends the calls to the fast route.
+        progress (Optional[ProgressTracker]): Receives the number of summarized nodes
+            and is checked for cancellation before each one.
+        output_dir (Optional[str]): The directory to save each summary to, with
+            `TreeNode.save_summary`. Summaries are not saved if not given.
+
+    Returns:
+        Dict[str, int]: The number of nodes that were summarized, taken from the
+        cache, and failed.
+
+    Raises:
+        AssessmentCancelledError: If `progress` is cancelled.
+    """
+    if not root.content_hash:
+        with trace(metrics, "hash_tree"):
+            compute_content_hashes(root)
+    heights = get_node_heights(root)
+
+    # Take the summaries of unchanged subtrees from the cache and skip their descendants
+    pending: List[TreeNode] = []
+    num_cached = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        summary = cache.get(node.content_hash) if cache is not None else None
+        if summary is None:
+            pending.append(node)
+            stack.extend(node.children)
+            continue
+        # The descendants keep the summaries they were cached with, if any
+        for descendant in post_order_generator(node):
+            summary = cache.get(descendant.content_hash)
+            if summary is not None:
+                descendant.summary = summary
+                num_cached += 1
+
+    if progress is not None:
+        progress.start_stage("summarization", len(pending))
+
+    levels: Dict[int, List[TreeNode]] = {}
+    for node in pending:
+        levels.setdefault(heights[node.full_path], []).append(node)
+
+    def summarize_worker(node: TreeNode) -> str:
+        if progress is not None:
+            progress.check_cancelled()
+        return summarize_node(node, root, llm, metrics=metrics, router=router)
+
+    num_failed = 0
+    incomplete: Set[str] = set()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for height in sorted(levels):
+            # Copy the context so summary spans nest under the caller's open span
+            future_to_node = {
+                executor.submit(contextvars.copy_context().run, summarize_worker, node): node
+                for node in levels[height]
+            }
+            for future in concurrent.futures.as_completed(future_to_node):
+                node = future_to_node[future]
+                try:
+                    node.summary = future.result()
+                except Exception as exc:
+                    logger.error(f"Error summarizing {node.name}: {exc}")
+                    num_failed += 1
+                    incomplete.add(node.full_path)
+                else:
+                    # A directory summarized without the summary of a descendant
+                    # is summarized again, rather than restored, on later runs
+                    if any(
+                        not child.summary or child.full_path in incomplete
+                        for child in node.children
+                    ):
+                        incomplete.add(node.full_path)
+                    elif cache is not None:
+                        cache.put(node.content_hash, node.summary)
+                if progress is not None:
+                    progress.advance()
+            if progress is not None:
+                progress.check_cancelled()
+
+    if output_dir is not None:
+        for node in post_order_generator(root):
+            if node.summary:
+                node.save_summary(output_dir)
+
+    return {
+        "summarized": len(pending) - num_failed,
+        "cached": num_cached,
+        "failed": num_failed,
+    }
+
+
+def get_repo_digest(
+    root: TreeNode,
+    max_depth: int = DIGEST_MAX_DEPTH,
+    max_tokens: int = DIGEST_MAX_TOKENS,
+) -> str:
+    """
+    Render the summaries of the upper levels of a summarized tree as a compact digest.
+
+    The digest starts with the summary of the repository, followed by the
+    summaries of its directories and files down to `max_depth`, directories first.
+
+    Args:
+        root (TreeNode): The root of a tree summarized by `summarize_tree`.
+        max_depth (int): The depth of the deepest entries listed, the root being 0.
+        max_tokens (int): The approximate token budget of the digest.
+
+    Returns:
+        str: The digest, cut off at the budget.
+    """
+    max_chars = max_tokens * SUMMARY_CHARS_PER_TOKEN
+    lines: List[str] = []
+    num_chars = 0
+    stack: List[Any] = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        suffix = "/" if node.is_dir else ""
+        summary = " ".join(node.summary.split()) or "(no summary)"
+        line = "  " * depth + f"- {get_relative_path(node, root)}{suffix}: {summary}"
+        if num_chars + len(line) > max_chars:
+            lines.append("… (digest truncated)")
+            break
+        lines.append(line)
+        num_chars += len(line) + 1
+        if depth < max_depth:
+            children = sorted(node.children, key=lambda child: (not child.is_dir, child.name))
+            stack.extend((child, depth + 1) for child in reversed(children))
+    return "\n".join(lines)
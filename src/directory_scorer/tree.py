@@ -1,10 +1,14 @@
 import os
+import hashlib
+import concurrent.futures
 from pathlib import Path
 from typing import Generator, List, Optional
 from logger import get_logger
 
 logger = get_logger(__name__)
 
+HASH_READ_SIZE = 1 << 20
+
 
 class TreeNode:
     """
@@ -21,6 +25,8 @@ class TreeNode:
         summary (str): A summary of the file or directory content.
         parent (Optional["TreeNode"]): The parent node of this node.
         global_context (str): Additional context about the codebase.
+        content_hash (str): The Merkle hash of the content of the node, set by
+            `compute_content_hashes`.
     """
 
     def __init__(
@@ -48,6 +54,7 @@ class TreeNode:
         self.summary: str = ""
         self.parent = parent
         self.global_context = global_context
+        self.content_hash: str = ""
 
     def add_child(self, child: "TreeNode"):
         """
@@ -116,6 +123,63 @@ def post_order_generator(node: TreeNode) -> Generator[TreeNode, None, None]:
     yield node
 
 
+def get_file_hash(file_path: str) -> str:
+    """
+    Hash the content of a file.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        str: The SHA-256 hex digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def compute_content_hashes(root: TreeNode, max_workers: int = 8) -> None:
+    """
+    Set the Merkle hash of the content of every node of a tree.
+
+    A file is hashed on its name and content, and a directory on the names and
+    hashes of its children, so two subtrees with the same hash have the same
+    files with the same content, wherever they are and in whichever repository.
+    Files are read and hashed in parallel threads, since hashlib releases the
+    GIL on large inputs.
+
+    Args:
+        root (TreeNode): The root of the tree.
+        max_workers (int): The number of threads hashing files.
+    """
+    nodes = list(post_order_generator(root))
+    files = [node for node in nodes if not node.is_dir]
+
+    def hash_file(node: TreeNode) -> str:
+        try:
+            return get_file_hash(node.full_path)
+        except OSError as exc:
+            logger.warning(f"Could not hash {node.full_path}: {exc}")
+            return ""
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        file_hashes = dict(zip(map(id, files), executor.map(hash_file, files)))
+
+    for node in nodes:
+        if node.is_dir:
+            content = "\n".join(
+                sorted(f"{child.name}\0{child.content_hash}" for child in node.children)
+            )
+        else:
+            content = file_hashes[id(node)]
+        kind = "dir" if node.is_dir else "file"
+        node.content_hash = hashlib.sha256(
+            f"{kind}\0{node.name}\0{content}".encode("utf-8")
+        ).hexdigest()
+
+
 def build_tree(
     path: str,
     tracked_extensions: List[str],
@@ -1,4 +1,4 @@
-from typing import List, Optional, Dict, Tuple, Generator, Any
+from typing import List, Optional, Dict, Tuple, Generator, Any, Iterable
 from config import paths
 from utils.general import read_yaml_file
 
@@ -16,6 +16,9 @@ ALL_CRITERIA = [
     DOCUMENTATION_CRITERIA,
 ]
 
+# Criteria tiers, from the most basic to the most demanding
+TIERS = ["Essential", "Professional", "Elite"]
+
 
 def criteria_generator(
     criteria: Dict[str, Any],
@@ -35,6 +38,30 @@ def criteria_generator(
                 yield criterion_id, criteria[category][sub_category][criterion_id]
 
 
+def applies_to_file_extension(
+    criterion: Dict[str, Any], input_file_extension: Optional[str] = None
+) -> bool:
+    """
+    Check whether a criterion applies to files with the given extension.
+
+    Args:
+        criterion: The criterion details
+        input_file_extension: Optional file extension. Every criterion applies if not given.
+
+    Returns:
+        True if the extension is not excluded by the criterion's include/exclude lists
+    """
+    if not input_file_extension:
+        return True
+    included_file_extensions = criterion.get("include_extensions", None)
+    excluded_file_extensions = criterion.get("exclude_extensions", None)
+    if included_file_extensions and input_file_extension not in included_file_extensions:
+        return False
+    if excluded_file_extensions and input_file_extension in excluded_file_extensions:
+        return False
+    return True
+
+
 def code_quality_criterion_generator(
     input_file_extension: Optional[str] = None,
 ) -> Generator[Tuple[str, Dict[str, Any]], None, None]:
@@ -48,20 +75,7 @@ def code_quality_criterion_generator(
         Generator yielding tuples of (criterion_id, criterion_details) for code quality criteria
     """
     for criterion_id, criterion in criteria_generator(CODE_QUALITY_CRITERIA):
-        included_file_extensions = criterion.get("include_extensions", None)
-        excluded_file_extensions = criterion.get("exclude_extensions", None)
-
-        if (
-            input_file_extension
-            and included_file_extensions
-            and input_file_extension not in included_file_extensions
-        ):
-            continue
-        if (
-            input_file_extension
-            and excluded_file_extensions
-            and input_file_extension in excluded_file_extensions
-        ):
+        if not applies_to_file_extension(criterion, input_file_extension):
             continue
 
         yield criterion_id, criterion
@@ -83,21 +97,7 @@ def content_based_criterion_generator(
         for criterion_id, criterion in criteria_generator(criteria):
             if criterion.get("based_on") != "file_content":
                 continue
-
-            included_file_extensions = criterion.get("include_extensions", None)
-            excluded_file_extensions = criterion.get("exclude_extensions", None)
-
-            if (
-                input_file_extension
-                and included_file_extensions
-                and input_file_extension not in included_file_extensions
-            ):
-                continue
-            if (
-                input_file_extension
-                and excluded_file_extensions
-                and input_file_extension in excluded_file_extensions
-            ):
+            if not applies_to_file_extension(criterion, input_file_extension):
                 continue
 
             yield criterion_id, criterion
@@ -225,6 +225,30 @@ def get_criteria_by_type() -> Dict[str, List[str]]:
     return result
 
 
+def get_tier_criteria(target_tier: str) -> List[str]:
+    """
+    Get the criteria needed to assess a project up to a tier.
+
+    Args:
+        target_tier: The tier to reach, one of 'Essential', 'Professional' or 'Elite'
+
+    Returns:
+        List of the IDs of the criteria of the target tier and the tiers below it
+
+    Raises:
+        ValueError: If the tier is unknown
+    """
+    if target_tier not in TIERS:
+        raise ValueError(f"Unknown tier {target_tier!r}, expected one of {TIERS}")
+    criteria_by_type = get_criteria_by_type()
+    result = []
+    for tier in TIERS[: TIERS.index(target_tier) + 1]:
+        for criterion_id in criteria_by_type[tier]:
+            if criterion_id not in result:
+                result.append(criterion_id)
+    return result
+
+
 def get_criteria_names() -> Dict[str, str]:
     """
     Get the display names for all criteria.
@@ -260,6 +284,8 @@ def get_instructions(
     criterion_id: Optional[str] = None,
     content_based_only: bool = False,
     metadata_based_only: bool = False,
+    input_file_extension: Optional[str] = None,
+    excluded_criteria: Iterable[str] = (),
 ) -> Dict[str, Dict[str, Any]]:
     """
     Get instructions for criteria, with optional filtering.
@@ -268,6 +294,9 @@ def get_instructions(
         criterion_id: Optional specific criterion ID to get instructions for
         content_based_only: If True, only return content-based criteria
         metadata_based_only: If True, only return metadata-based criteria
+        input_file_extension: Optional file extension. If given, only criteria that
+            apply to files with this extension are included
+        excluded_criteria: Criterion IDs to leave out, e.g. criteria already scored
 
     Returns:
         Dictionary mapping criterion IDs to their instructions and names
@@ -302,6 +331,11 @@ def get_instructions(
             if metadata_based_only and is_content_based:
                 continue
 
+            if criterion_id_iter in excluded_criteria:
+                continue
+            if not applies_to_file_extension(criterion, input_file_extension):
+                continue
+
             instructions = criterion.get("instructions", None)
             if instructions:
                 result[criterion_id_iter] = {
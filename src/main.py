@@ -1,8 +1,19 @@
 import os
-from typing import Dict, Any
+import sys
+import time
+import argparse
+import threading
+from typing import Dict, Any, FrozenSet, Iterable, List, Optional, Tuple
 from logger import get_logger
+from metrics import MetricsCollector, get_llm_config, trace
 from config import paths
-from utils.llm import get_llm, GPT_4O_MINI, GEMINI_1_5_FLASH, LLAMA_3_1_8B_INSTANT
+from utils.llm import get_llm, get_default_llm_name, get_key_pool_report
+from utils.router import AllModelsFailedError, ModelRouter
+from utils.checkpoint import CheckpointJournal
+from utils.results_store import write_results
+from utils.progress import ProgressTracker, TimeBudgetExceededError
+from utils.call_policy import CallPolicy, CallTimeoutError
+from utils.readme import ReadmeIndex
 from utils.general import read_yaml_file, write_json_file, read_json_file
 from utils.repository import (
     get_readme_content,
@@ -12,11 +23,14 @@ from utils.repository import (
     is_repo_public,
 )
 from generators import (
+    TIERS,
     get_aggregation_logic,
     get_criteria_by_type,
     get_criteria_names,
     get_category_criteria,
     get_instructions,
+    get_tier_criteria,
+    content_based_criterion_generator,
     logic_based_criterion_generator,
     metadata_based_criterion_generator,
 )
@@ -31,26 +45,38 @@ from utils.project_validators import (
     get_script_lengths,
 )
 from config.logic_based_scoring import logic_based_scoring
-from directory_scorer.content_based_scorer import score_directory_based_on_files
+from directory_scorer.content_based_scorer import (
+    score_directory_based_on_files,
+    warm_up_scoring_cache,
+    tracked_extensions,
+    ignored_names,
+)
+from directory_scorer.tree import build_tree
+from directory_scorer.subtree_store import SubtreeResultStore, get_result_namespace
+from directory_scorer.near_duplicates import NearDuplicateIndex, SIMILARITY_THRESHOLD
+from directory_scorer.sampling import SAMPLE_CONFIDENCE
+from directory_scorer.summarizer import (
+    SummaryCache,
+    get_repo_digest,
+    get_summary_namespace,
+    summarize_tree,
+)
 from output_parsers import CriterionScoring
 from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from report import generate_markdown_report
+from planner import (
+    BudgetExceededError,
+    build_plan,
+    check_budget,
+    plan_criterion_call,
+    plan_file_calls,
+)
 from generators import get_criteria_args
 from dotenv import load_dotenv
 
 load_dotenv()
 
-if "OPENAI_API_KEY" in os.environ:
-    llm_name = GPT_4O_MINI
-elif "GOOGLE_API_KEY" in os.environ:
-    llm_name = GEMINI_1_5_FLASH
-elif "GROQ_API_KEY" in os.environ:
-    llm_name = LLAMA_3_1_8B_INSTANT
-
-else:
-    raise ValueError("No API key found")
-
 criteria_args = get_criteria_args()
 logger = get_logger(__name__)
 
@@ -72,7 +98,9 @@ def download_project(repo_url: str) -> str:
     return repo_dir_path
 
 
-def get_repo_metadata(repo_dir_path: str) -> Dict[str, Any]:
+def get_repo_metadata(
+    repo_dir_path: str, metrics: Optional[MetricsCollector] = None
+) -> Dict[str, Any]:
     readme_exists = has_readme(repo_dir_path)
     requirements_txt_exists = has_requirements_txt(repo_dir_path)
     pyproject_toml_exists = has_pyproject_toml(repo_dir_path)
@@ -80,8 +108,10 @@ def get_repo_metadata(repo_dir_path: str) -> Dict[str, Any]:
     license_file_exists = has_license_file(repo_dir_path)
     gitignore_file_exists = has_gitignore_file(repo_dir_path)
     ignored_files_exist = has_ignored_files(repo_dir_path)
-    directory_structure = get_repo_tree(repo_dir_path)
-    script_lengths = get_script_lengths(repo_dir_path)
+    with trace(metrics, "get_repo_tree"):
+        directory_structure = get_repo_tree(repo_dir_path)
+    with trace(metrics, "get_script_lengths"):
+        script_lengths = get_script_lengths(repo_dir_path)
 
     readme_content = get_readme_content(repo_dir_path) if readme_exists else None
 
@@ -107,106 +137,860 @@ def format_criterion(criterion: dict) -> str:
     """
 
 
-if __name__ == "__main__":
-    prompts = read_yaml_file(paths.PROMPTS_FPATH)
-    config = read_json_file(paths.CONFIG_FPATH)
-    criteria_types = get_criteria_by_type()
-
-    prompt_template = prompts["scoring_v0"]
-
-    repo_urls = config["urls"]
-    max_workers = config["max_workers"]
-
-    from_inputs_directory = config["from_inputs_directory"]
-
-    if from_inputs_directory:
-        project_name = config["project_name"]
-        project_path = os.path.join(paths.INPUTS_DIR, project_name)
-        if not os.path.exists(project_path):
-            raise NotADirectoryError(f"Project directory {project_path} does not exist")
-        projects = [project_name]
-    else:
-        projects = repo_urls
-
-    for project in projects:
-        if not from_inputs_directory:
-            project_path = download_project(project)
+def build_criterion_prompt(
+    criterion_id: str,
+    criterion: Dict[str, Any],
+    prompt_template: str,
+    metadata: Dict[str, Any],
+    directory_structure: str,
+    readme_content: Optional[str],
+    readme_index: Optional[ReadmeIndex] = None,
+    repo_digest: Optional[str] = None,
+) -> str:
+    """
+    Build the prompt that scores a metadata-based criterion.
+
+    Args:
+        criterion_id (str): The ID of the criterion to score.
+        criterion (Dict[str, Any]): The criterion definition.
+        prompt_template (str): The metadata scoring prompt template.
+        metadata (Dict[str, Any]): The repository metadata.
+        directory_structure (str): The rendered directory tree.
+        readme_content (Optional[str]): The README content, if any.
+        readme_index (Optional[ReadmeIndex]): The section index of the README. If
+            given, only the README sections listed in the `readme_sections` of the
+            criterion are sent instead of `readme_content`.
+        repo_digest (Optional[str]): The summaries of the upper levels of the
+            repository. If given, it is sent in place of `directory_structure` to
+            the criteria that set `repo_digest`.
+
+    Returns:
+        str: The prompt.
+    """
+    if readme_index is not None:
+        readme_content = readme_index.get_content(criterion.get("readme_sections"))
+    if repo_digest is not None and criterion.get("repo_digest"):
+        directory_structure = repo_digest
+    return prompt_template.format(
+        project_info=metadata,
+        directory_structure=directory_structure,
+        readme_content=readme_content,
+        criterion=format_criterion(criterion),
+        instructions=get_instructions(criterion_id=criterion_id),
+    )
+
+
+def process_criterion(
+    criterion_id: str,
+    criterion: Dict[str, Any],
+    prompt_template: str,
+    metadata: Dict[str, Any],
+    directory_structure: str,
+    readme_content: Optional[str],
+    llm,
+    metrics: Optional[MetricsCollector] = None,
+    router: Optional[ModelRouter] = None,
+    readme_index: Optional[ReadmeIndex] = None,
+    repo_digest: Optional[str] = None,
+    call_policy: Optional[CallPolicy] = None,
+):
+    """
+    Score a single metadata-based criterion with the language model.
+
+    Args:
+        criterion_id (str): The ID of the criterion to score.
+        criterion (Dict[str, Any]): The criterion definition.
+        prompt_template (str): The metadata scoring prompt template.
+        metadata (Dict[str, Any]): The repository metadata.
+        directory_structure (str): The rendered directory tree.
+        readme_content (Optional[str]): The README content, if any.
+        llm: The structured-output language model to score with.
+        metrics (Optional[MetricsCollector]): Collector for stage timings and token usage.
+        router (Optional[ModelRouter]): Routes the call to a fast or strong model.
+            `llm` is used directly if not given.
+        readme_index (Optional[ReadmeIndex]): The section index of the README, see
+            `build_criterion_prompt`.
+        repo_digest (Optional[str]): The summaries of the upper levels of the
+            repository, see `build_criterion_prompt`.
+        call_policy (Optional[CallPolicy]): The deadline and hedging of the call.
+
+    Returns:
+        Tuple[str, Dict[str, Any]]: The criterion ID and its score.
+    """
+    logger.info(f"Scoring criterion: {criterion_id}")
+    with trace(metrics, "process_criterion", criterion_id=criterion_id):
+        prompt = build_criterion_prompt(
+            criterion_id,
+            criterion,
+            prompt_template,
+            metadata=metadata,
+            directory_structure=directory_structure,
+            readme_content=readme_content,
+            readme_index=readme_index,
+            repo_digest=repo_digest,
+        )
+        if router is not None:
+            response = router.invoke(
+                router.route_criterion(criterion_id),
+                prompt,
+                lambda model: model.with_structured_output(CriterionScoring),
+                cache_key="criterion",
+                config=get_llm_config(metrics),
+                call_policy=call_policy,
+            )
+        elif call_policy is not None:
+            response = call_policy.invoke(llm, prompt, config=get_llm_config(metrics))
         else:
-            project_path = os.path.join(paths.INPUTS_DIR, project)
-
-        output_dir = os.path.join(paths.OUTPUTS_DIR, os.path.basename(project_path))
-        os.makedirs(output_dir, exist_ok=True)
-
-        metadata = get_repo_metadata(project_path)
-
-        directory_structure = metadata["directory_structure"]
-        readme_content = metadata["readme_content"]
+            response = llm.invoke(prompt, config=get_llm_config(metrics))
+        response = response.model_dump()
+    return criterion_id, response
+
+
+def assess_project(
+    project_path: str,
+    llm_name: str,
+    prompt_template: str,
+    max_workers: int,
+    metrics: Optional[MetricsCollector] = None,
+    otlp_endpoint: Optional[str] = None,
+    router: Optional[ModelRouter] = None,
+    early_exit: bool = False,
+    resume: bool = False,
+    run_id: Optional[str] = None,
+    results_store_dir: str = paths.RESULTS_STORE_DIR,
+    progress: Optional[ProgressTracker] = None,
+    preprocess_workers: int = 0,
+    summarize: bool = False,
+    subtree_store_dir: Optional[str] = None,
+    near_duplicate_index: Optional[NearDuplicateIndex] = None,
+    sample_size: Optional[int] = None,
+    sample_confidence: float = SAMPLE_CONFIDENCE,
+    target_tier: Optional[str] = None,
+    gate: bool = False,
+    max_cost_usd: Optional[float] = None,
+    max_minutes: Optional[float] = None,
+    call_timeout: Optional[float] = None,
+    hedge: bool = False,
+    hedge_percentile: float = 95,
+    time_budget_seconds: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Run the full assessment of a project and write its outputs.
+
+    Args:
+        project_path (str): The path to the project directory.
+        llm_name (str): The identifier of the language model to score with.
+        prompt_template (str): The metadata scoring prompt template.
+        max_workers (int): The maximum number of parallel workers.
+        metrics (Optional[MetricsCollector]): Collector for stage timings and token
+            usage. A new one is created if not given.
+        otlp_endpoint (Optional[str]): OpenTelemetry collector URL to export spans to.
+        router (Optional[ModelRouter]): Routes scoring calls across models by cost
+            and difficulty. All calls go to `llm_name` if not given.
+        early_exit (bool): Whether to stop scoring file criteria once they are
+            decided for the whole project, at the cost of incomplete per-file scores.
+        resume (bool): Whether to reuse the file and criterion results recorded in
+            the checkpoint journal of an interrupted run.
+        run_id (Optional[str]): The run to record the scores under in the Parquet
+            results store. The results store is not written if not given.
+        results_store_dir (str): The root directory of the results store.
+        progress (Optional[ProgressTracker]): Receives the progress of each scoring
+            stage and can cancel the assessment between files and criteria.
+        preprocess_workers (int): The number of processes that load, split and
+            tokenize files ahead of the scoring threads, or 0 to do it in the threads.
+        summarize (bool): Whether to summarize the repository bottom-up and send the
+            digest of its summaries to the criteria that use it instead of the tree.
+        subtree_store_dir (Optional[str]): The directory of the file scores and
+            directory aggregates keyed by the Merkle hash of their subtree, which are
+            reused for unchanged files and directories across runs and repositories.
+            Every file is scored if not given.
+        near_duplicate_index (Optional[NearDuplicateIndex]): The files scored so far,
+            whose scores are reused for near-duplicate files of the project.
+        sample_size (Optional[int]): The maximum number of files to score. Larger
+            projects are scored on a stratified sample of their files, and the
+            file criteria estimated from it are marked as sampled. Every file is
+            scored if not given.
+        sample_confidence (float): The confidence level of the bounds of sampled criteria.
+        target_tier (Optional[str]): Only the criteria of this tier ("Essential",
+            "Professional" or "Elite") and of the tiers below it are scored, and
+            only their prompts and scoring models are built. Every criterion is
+            scored if not given.
+        gate (bool): Whether to stop as soon as an Essential criterion fails, for a
+            pass/fail check. The results then only hold the criteria scored so far.
+        max_cost_usd (Optional[float]): The maximum estimated cost of the LLM calls.
+        max_minutes (Optional[float]): The maximum estimated duration of the LLM calls.
+            If either is given, the assessment is planned first and the plan is
+            written to `plan.json`.
+        call_timeout (Optional[float]): The seconds after which an LLM call is
+            abandoned. Calls are not bounded if not given.
+        hedge (bool): Whether to send a duplicate of a call that is slower than the
+            `hedge_percentile` of recent calls, and take the first response.
+        hedge_percentile (float): The latency percentile after which calls are hedged.
+        time_budget_seconds (Optional[float]): The time after which the assessment
+            stops. Calls in flight are abandoned and the completed work is kept in
+            the checkpoint journal.
+
+    Returns:
+        Dict[str, Any]: The assessment results keyed by criterion ID.
+
+    Raises:
+        AssessmentCancelledError: If `progress` is cancelled. The completed work is
+            kept in the checkpoint journal and can be resumed.
+        BudgetExceededError: If the plan exceeds `max_cost_usd` or `max_minutes`.
+            No LLM call is made.
+        TimeBudgetExceededError: If the assessment runs out of `time_budget_seconds`.
+    """
+    output_dir = os.path.join(paths.OUTPUTS_DIR, os.path.basename(project_path))
+    os.makedirs(output_dir, exist_ok=True)
+
+    if metrics is None:
+        metrics = MetricsCollector(os.path.basename(project_path))
+    if time_budget_seconds is not None:
+        progress = progress if progress is not None else ProgressTracker()
+        progress.set_deadline(time_budget_seconds)
+    call_policy = CallPolicy(
+        timeout_seconds=call_timeout,
+        hedge=hedge,
+        hedge_percentile=hedge_percentile,
+        progress=progress,
+    )
+
+    if max_cost_usd is not None or max_minutes is not None:
+        with metrics.span("plan_project"):
+            plan = plan_project(
+                project_path,
+                llm_name=llm_name,
+                prompt_template=prompt_template,
+                max_workers=max_workers,
+                target_tier=target_tier,
+                sample_size=sample_size,
+                metrics=metrics,
+            )
+        write_json_file(os.path.join(output_dir, "plan.json"), plan)
+        metrics.add_report("plan", plan["total"])
+        check_budget(plan, max_cost_usd=max_cost_usd, max_minutes=max_minutes)
+
+    with metrics.span("get_repo_metadata"):
+        metadata = get_repo_metadata(project_path, metrics=metrics)
+
+    directory_structure = metadata["directory_structure"]
+    readme_content = metadata["readme_content"]
+    readme_index = ReadmeIndex(readme_content) if readme_content else None
+
+    del metadata["directory_structure"]
+    del metadata["readme_content"]
+
+    llm = get_llm(llm=llm_name).with_structured_output(CriterionScoring)
+
+    repo_digest = None
+    if summarize:
+        with metrics.span("summarize_repository"):
+            repo_digest = summarize_repository(
+                project_path,
+                output_dir,
+                llm_name=llm_name,
+                max_workers=max_workers,
+                metrics=metrics,
+                router=router,
+                progress=progress,
+            )
 
-        del metadata["directory_structure"]
-        del metadata["readme_content"]
+    target_criteria = set(get_tier_criteria(target_tier)) if target_tier else None
+    gate_criteria = get_criteria_by_type()["Essential"] if gate else []
 
-        llm = get_llm(llm=llm_name).with_structured_output(CriterionScoring)
+    def is_targeted(criterion_id: str) -> bool:
+        return target_criteria is None or criterion_id in target_criteria
 
-        results = {}
+    results = {}
 
-        for criterion_id, criterion in logic_based_criterion_generator():
+    for criterion_id, criterion in logic_based_criterion_generator():
+        if not is_targeted(criterion_id):
+            continue
+        with metrics.span("logic_based_scoring", criterion_id=criterion_id):
             results[criterion_id] = logic_based_scoring[criterion_id](
                 metadata, **criteria_args[criterion_id]
             )
 
-        def process_criterion(
-            criterion_id,
-            criterion,
-            prompt_template,
-            metadata,
-            directory_structure,
-            readme_content,
-            llm,
-        ):
-            logger.info(f"Scoring criterion: {criterion_id}")
-            prompt = prompt_template.format(
-                project_info=metadata,
-                directory_structure=directory_structure,
-                readme_content=readme_content,
-                criterion=format_criterion(criterion),
-                instructions=get_instructions(criterion_id=criterion_id),
+    aggregation_logic = get_aggregation_logic()
+    result_namespace = get_result_namespace(
+        llm_name if router is None else router.get_config_id(),
+        excluded_criteria=get_untargeted_file_criteria(target_tier),
+    )
+    result_store = None
+    if subtree_store_dir is not None:
+        result_store = SubtreeResultStore(subtree_store_dir, result_namespace)
+    journal = CheckpointJournal(
+        os.path.join(output_dir, "checkpoint.jsonl"),
+        resume=resume,
+        namespace=result_namespace,
+    )
+    with journal:
+        # The metadata criteria are scored first, as they take one call each
+        pending_criteria = [
+            (criterion_id, criterion)
+            for criterion_id, criterion in metadata_based_criterion_generator()
+            if is_targeted(criterion_id)
+            and criterion_id not in journal.completed_criteria
+        ]
+        if get_gate_failures({**results, **journal.completed_criteria}, gate_criteria):
+            pending_criteria = []
+        if progress is not None:
+            progress.start_stage(
+                "criteria_scoring",
+                len(journal.completed_criteria) + len(pending_criteria),
+                completed=len(journal.completed_criteria),
             )
-            response = llm.invoke(prompt).model_dump()
-            return criterion_id, response
 
-        aggregation_logic = get_aggregation_logic()
-        dir_score, file_scores = score_directory_based_on_files(
-            project_path,
-            llm=get_llm(llm=llm_name),
-            aggregation_logic=aggregation_logic,
-            max_workers=max_workers,
+        process_fn = partial(
+            process_criterion,
+            prompt_template=prompt_template,
+            metadata=metadata,
+            directory_structure=directory_structure,
+            readme_content=readme_content,
+            llm=llm,
+            metrics=metrics,
+            router=router,
+            readme_index=readme_index,
+            repo_digest=repo_digest,
+            call_policy=call_policy,
         )
+        gate_failed = threading.Event()
+
+        def process_pending_criterion(item: Tuple[str, Dict[str, Any]]):
+            if progress is not None:
+                progress.check_cancelled()
+            if gate_failed.is_set():
+                return item[0], None
+            try:
+                return process_fn(*item)
+            except (CallTimeoutError, AllModelsFailedError) as exc:
+                # Like a file whose call failed, the criterion is left unscored
+                logger.error(f"Error scoring criterion {item[0]}: {exc}")
+                if progress is not None:
+                    progress.advance()
+                return item[0], None
 
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            process_fn = partial(
-                process_criterion,
-                prompt_template=prompt_template,
+            for criterion_id, response in executor.map(
+                process_pending_criterion, pending_criteria
+            ):
+                if response is None:
+                    continue
+                journal.record_criterion(criterion_id, response)
+                if progress is not None:
+                    progress.advance()
+                if get_gate_failures({criterion_id: response}, gate_criteria):
+                    gate_failed.set()
+
+        dir_score, file_scores = {}, []
+        if not get_gate_failures({**results, **journal.completed_criteria}, gate_criteria):
+            with metrics.span("file_scoring"):
+                dir_score, file_scores = score_directory_based_on_files(
+                    project_path,
+                    llm=get_llm(llm=llm_name),
+                    aggregation_logic=aggregation_logic,
+                    max_workers=max_workers,
+                    metrics=metrics,
+                    router=router,
+                    early_exit=early_exit,
+                    journal=journal,
+                    progress=progress,
+                    preprocess_workers=preprocess_workers,
+                    result_store=result_store,
+                    near_duplicate_index=near_duplicate_index,
+                    sample_size=sample_size,
+                    sample_confidence=sample_confidence,
+                    excluded_criteria=get_untargeted_file_criteria(target_tier),
+                    stop_criteria=frozenset(gate_criteria),
+                    call_policy=call_policy,
+                )
+
+    for criterion_id, _ in metadata_based_criterion_generator():
+        if criterion_id in journal.completed_criteria and is_targeted(criterion_id):
+            results[criterion_id] = journal.completed_criteria[criterion_id]
+
+    results = {**results, **dir_score}
+    if gate:
+        gate_failures = get_gate_failures(results, gate_criteria)
+        logger.info(
+            f"{os.path.basename(project_path)} "
+            f"{'failed' if gate_failures else 'passed'} the Essential gate"
+        )
+        metrics.add_report(
+            "gate",
+            {
+                "target_tier": target_tier,
+                "passed": not gate_failures,
+                "failed_criteria": gate_failures,
+            },
+        )
+
+    write_json_file(os.path.join(output_dir, "assessment.json"), results)
+    write_json_file(os.path.join(output_dir, "file_scores.json"), file_scores)
+    if run_id is not None:
+        with metrics.span("results_store"):
+            write_results(
+                results_store_dir,
+                run_id=run_id,
+                repo=os.path.basename(project_path),
+                results=results,
+                file_scores=file_scores,
+            )
+
+    with metrics.span("generate_report"):
+        generate_report(output_dir, results)
+
+    metrics.add_report("llm_calls", call_policy.report())
+    key_pool_report = get_key_pool_report()
+    if key_pool_report:
+        metrics.add_report("api_keys", key_pool_report)
+    if router is not None:
+        metrics.add_report("routing", router.report())
+    metrics.write(os.path.join(output_dir, "metrics.json"))
+    if otlp_endpoint:
+        metrics.export_otlp(otlp_endpoint)
+    return results
+
+
+def plan_project(
+    project_path: str,
+    llm_name: str,
+    prompt_template: str,
+    max_workers: int,
+    target_tier: Optional[str] = None,
+    sample_size: Optional[int] = None,
+    metrics: Optional[MetricsCollector] = None,
+) -> Dict[str, Any]:
+    """
+    Estimate the LLM calls, tokens, cost and duration of assessing a project.
+
+    The project is scanned, its metadata criterion prompts built and its files
+    loaded, split, pre-checked and tokenized as for the assessment, but no
+    language model is called. Repository summaries are not included.
+
+    Args:
+        project_path (str): The path to the project directory.
+        llm_name (str): The identifier of the language model to price the calls with.
+        prompt_template (str): The metadata scoring prompt template.
+        max_workers (int): The maximum number of parallel workers.
+        target_tier (Optional[str]): Only plan the criteria up to this tier.
+        sample_size (Optional[int]): The maximum number of files to score.
+        metrics (Optional[MetricsCollector]): Collector for stage timings.
+
+    Returns:
+        Dict[str, Any]: The plan, see `planner.build_plan`.
+    """
+    metadata = get_repo_metadata(project_path, metrics=metrics)
+    directory_structure = metadata.pop("directory_structure")
+    readme_content = metadata.pop("readme_content")
+    readme_index = ReadmeIndex(readme_content) if readme_content else None
+    target_criteria = set(get_tier_criteria(target_tier)) if target_tier else None
+
+    calls = [
+        plan_criterion_call(
+            build_criterion_prompt(
+                criterion_id,
+                criterion,
+                prompt_template,
                 metadata=metadata,
                 directory_structure=directory_structure,
                 readme_content=readme_content,
-                llm=llm,
+                readme_index=readme_index,
+            )
+        )
+        for criterion_id, criterion in metadata_based_criterion_generator()
+        if target_criteria is None or criterion_id in target_criteria
+    ]
+    with trace(metrics, "plan_file_calls"):
+        calls += plan_file_calls(
+            project_path,
+            excluded_criteria=get_untargeted_file_criteria(target_tier),
+            sample_size=sample_size,
+        )
+    return build_plan(calls, llm_name, max_workers)
+
+
+def summarize_repository(
+    project_path: str,
+    output_dir: str,
+    llm_name: str,
+    max_workers: int,
+    metrics: Optional[MetricsCollector] = None,
+    router: Optional[ModelRouter] = None,
+    progress: Optional[ProgressTracker] = None,
+) -> str:
+    """
+    Summarize the tracked files and directories of a project and write its digest.
+
+    Summaries are cached across runs and projects in the summary cache, keyed by
+    the content of the summarized subtree.
+
+    Args:
+        project_path (str): The path to the project directory.
+        output_dir (str): The project output directory. The summaries are saved to
+            its `summaries` directory and the digest to `repo_digest.md`.
+        llm_name (str): The identifier of the language model to summarize with.
+        max_workers (int): The maximum number of concurrent summaries.
+        metrics (Optional[MetricsCollector]): Collector for stage timings and token usage.
+        router (Optional[ModelRouter]): Sends the summaries to the fast route.
+        progress (Optional[ProgressTracker]): Receives the summarization progress and
+            can cancel it.
+
+    Returns:
+        str: The repository digest.
+    """
+    root = build_tree(
+        project_path,
+        tracked_extensions=tracked_extensions,
+        ignored_names=ignored_names,
+    )
+    llm = get_llm(llm=llm_name)
+    model_name = llm_name if router is None else router.get_config_id()
+    report = summarize_tree(
+        root,
+        llm,
+        cache=SummaryCache(paths.SUMMARY_CACHE_DIR, get_summary_namespace(model_name)),
+        max_workers=max_workers,
+        metrics=metrics,
+        router=router,
+        progress=progress,
+        output_dir=os.path.join(output_dir, "summaries"),
+    )
+    if metrics is not None:
+        metrics.add_report("summaries", report)
+    repo_digest = get_repo_digest(root)
+    with open(os.path.join(output_dir, "repo_digest.md"), "w", encoding="utf-8") as file:
+        file.write(repo_digest)
+    return repo_digest
+
+
+def assess_source(
+    project_path: str,
+    repo_url: Optional[str],
+    config: Dict[str, Any],
+    llm_name: str,
+    prompt_template: str,
+    run_id: Optional[str] = None,
+    resume: bool = False,
+    progress: Optional[ProgressTracker] = None,
+    near_duplicate_index: Optional[NearDuplicateIndex] = None,
+) -> Dict[str, Any]:
+    """
+    Download a project if needed and assess it with the run configuration.
+
+    Args:
+        project_path (str): The local project directory.
+        repo_url (Optional[str]): The repository URL to download the project from,
+            or None for a local project.
+        config (Dict[str, Any]): The run configuration.
+        llm_name (str): The identifier of the language model to score with.
+        prompt_template (str): The metadata scoring prompt template.
+        run_id (Optional[str]): The run to record the scores under in the results store.
+        resume (bool): Whether to resume from the checkpoint journal, reusing an
+            already downloaded project.
+        progress (Optional[ProgressTracker]): Receives the assessment progress and
+            can cancel it.
+        near_duplicate_index (Optional[NearDuplicateIndex]): The files scored in
+            previous assessments. A new index is created for the project if not
+            given and near-duplicate detection is enabled.
+
+    Returns:
+        Dict[str, Any]: The assessment results keyed by criterion ID.
+    """
+    if near_duplicate_index is None:
+        near_duplicate_index = get_near_duplicate_index(config)
+    metrics = MetricsCollector(os.path.basename(project_path))
+    routing_config = dict(config.get("routing") or {})
+    router = ModelRouter(routing_config) if routing_config.pop("enabled", False) else None
+    sampling = dict(config.get("sampling") or {})
+    budget = config.get("budget") or {}
+    llm_calls = config.get("llm_calls") or {}
+    time_budget_minutes = config.get("time_budget_minutes")
+    if repo_url is not None and not (resume and os.path.isdir(project_path)):
+        if progress is not None:
+            progress.start_stage("download_project", 1)
+        with metrics.span("download_project", repo_url=repo_url):
+            download_project(repo_url)
+
+    return assess_project(
+        project_path,
+        llm_name=llm_name,
+        prompt_template=prompt_template,
+        max_workers=config["max_workers"],
+        metrics=metrics,
+        otlp_endpoint=config.get("otlp_endpoint"),
+        router=router,
+        early_exit=not config.get("full_file_scores", True),
+        resume=resume,
+        run_id=run_id,
+        progress=progress,
+        preprocess_workers=config.get("preprocess_workers", 0),
+        summarize=config.get("repo_digest", False),
+        subtree_store_dir=(
+            paths.SUBTREE_STORE_DIR if config.get("subtree_store", False) else None
+        ),
+        near_duplicate_index=near_duplicate_index,
+        sample_size=sampling.get("max_calls") if sampling.pop("enabled", False) else None,
+        sample_confidence=sampling.get("confidence", SAMPLE_CONFIDENCE),
+        target_tier=config.get("target_tier"),
+        gate=config.get("gate", False),
+        max_cost_usd=budget.get("max_cost_usd"),
+        max_minutes=budget.get("max_minutes"),
+        call_timeout=llm_calls.get("timeout_seconds"),
+        hedge=llm_calls.get("hedge", False),
+        hedge_percentile=llm_calls.get("hedge_percentile", 95),
+        time_budget_seconds=(
+            time_budget_minutes * 60 if time_budget_minutes is not None else None
+        ),
+    )
+
+
+def get_untargeted_file_criteria(target_tier: Optional[str]) -> FrozenSet[str]:
+    """
+    Get the file content criteria that are not needed to assess a project up to a tier.
+
+    Args:
+        target_tier (Optional[str]): The tier to reach, or None for every tier.
+
+    Returns:
+        FrozenSet[str]: The IDs of the file content criteria above the target tier.
+    """
+    if target_tier is None:
+        return frozenset()
+    target_criteria = set(get_tier_criteria(target_tier))
+    return frozenset(
+        criterion_id
+        for criterion_id, _ in content_based_criterion_generator()
+        if criterion_id not in target_criteria
+    )
+
+
+def get_gate_failures(results: Dict[str, Any], gate_criteria: Iterable[str]) -> List[str]:
+    """
+    Get the gate criteria that a project fails.
+
+    Args:
+        results (Dict[str, Any]): The assessment results keyed by criterion ID.
+        gate_criteria (Iterable[str]): The criteria a project must all satisfy.
+
+    Returns:
+        List[str]: The IDs of the scored gate criteria that are not satisfied.
+    """
+    return [
+        criterion_id
+        for criterion_id in gate_criteria
+        if criterion_id in results and results[criterion_id].get("score", 0) == 0
+    ]
+
+
+def get_near_duplicate_index(config: Dict[str, Any]) -> Optional[NearDuplicateIndex]:
+    """
+    Create the near-duplicate file index of the run configuration.
+
+    Args:
+        config (Dict[str, Any]): The run configuration.
+
+    Returns:
+        Optional[NearDuplicateIndex]: An empty index, or None if near-duplicate
+        detection is disabled.
+    """
+    settings = config.get("near_duplicates") or {}
+    if not settings.get("enabled", False):
+        return None
+    return NearDuplicateIndex(threshold=settings.get("threshold", SIMILARITY_THRESHOLD))
+
+
+def generate_report(output_dir: str, assessment: Dict[str, Any]) -> None:
+    """
+    Generate the Markdown report for an assessment.
+
+    Args:
+        output_dir (str): The project output directory.
+        assessment (Dict[str, Any]): The assessment results keyed by criterion ID.
+    """
+    generate_markdown_report(
+        assessment=assessment,
+        output_file=os.path.join(output_dir, "report.md"),
+        criteria_types=get_criteria_by_type(),
+        criteria_names=get_criteria_names(),
+        category_criteria=get_category_criteria(),
+    )
+
+
+def get_project_sources(config: Dict[str, Any]) -> List[Tuple[str, Optional[str]]]:
+    """
+    Resolve the project directories to assess and where to download them from.
+
+    Args:
+        config (Dict[str, Any]): The run configuration.
+
+    Returns:
+        List[Tuple[str, Optional[str]]]: The local project directories, each with the
+        repository URL to download it from, or None for local projects.
+
+    Raises:
+        NotADirectoryError: If the configured local project does not exist.
+    """
+    if config["from_inputs_directory"]:
+        project_path = os.path.join(paths.INPUTS_DIR, config["project_name"])
+        if not os.path.exists(project_path):
+            raise NotADirectoryError(f"Project directory {project_path} does not exist")
+        return [(project_path, None)]
+
+    return [
+        (os.path.join(paths.INPUTS_DIR, os.path.basename(repo_url)), repo_url)
+        for repo_url in config["urls"]
+    ]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parse the command line arguments.
+
+    Args:
+        argv (Optional[List[str]]): The arguments to parse. Defaults to sys.argv.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Assess AI/ML repositories against the Ready Tensor best practices."
+    )
+    parser.add_argument(
+        "--config",
+        default=paths.CONFIG_FPATH,
+        help="Path to the run configuration file.",
+    )
+    parser.add_argument(
+        "--llm",
+        default=None,
+        help="ID of the model to score with (e.g. gpt-4o-mini or fake-llm). "
+        "Defaults to the first provider with an API key set.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Resume interrupted assessments from their checkpoint.jsonl, skipping "
+        "files and criteria that were already scored.",
+    )
+    parser.add_argument(
+        "--run-id",
+        default=None,
+        help="Identifier of this run in the Parquet results store. "
+        "Defaults to the start time of the run.",
+    )
+    parser.add_argument(
+        "--report-only",
+        action="store_true",
+        help="Regenerate report.md from existing assessment.json files without scoring.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Estimate the LLM calls, tokens, cost and duration of each assessment "
+        "and write them to plan.json without calling any LLM.",
+    )
+    parser.add_argument(
+        "--target-tier",
+        choices=TIERS,
+        default=None,
+        help="Only score the criteria of this tier and the tiers below it. "
+        "Overrides target_tier of the run configuration.",
+    )
+    parser.add_argument(
+        "--gate",
+        action="store_true",
+        help="Stop assessing a project as soon as an Essential criterion fails, and "
+        "exit with status 1 if any project fails an Essential criterion.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    config = read_json_file(args.config)
+
+    if args.report_only:
+        if config["from_inputs_directory"]:
+            project_names = [config["project_name"]]
+        else:
+            project_names = [os.path.basename(url) for url in config["urls"]]
+        for project_name in project_names:
+            output_dir = os.path.join(paths.OUTPUTS_DIR, project_name)
+            assessment = read_json_file(os.path.join(output_dir, "assessment.json"))
+            generate_report(output_dir, assessment)
+        return
+
+    if args.target_tier is not None:
+        config["target_tier"] = args.target_tier
+    if args.gate:
+        config["gate"] = True
+
+    llm_name = args.llm or get_default_llm_name()
+    prompts = read_yaml_file(paths.PROMPTS_FPATH)
+    prompt_template = prompts["scoring_v0"]
+
+    if args.dry_run:
+        sampling = config.get("sampling") or {}
+        for project_path, repo_url in get_project_sources(config):
+            if repo_url is not None and not os.path.isdir(project_path):
+                download_project(repo_url)
+            plan = plan_project(
+                project_path,
+                llm_name=llm_name,
+                prompt_template=prompt_template,
+                max_workers=config["max_workers"],
+                target_tier=config.get("target_tier"),
+                sample_size=(
+                    sampling.get("max_calls") if sampling.get("enabled", False) else None
+                ),
+            )
+            output_dir = os.path.join(paths.OUTPUTS_DIR, os.path.basename(project_path))
+            os.makedirs(output_dir, exist_ok=True)
+            write_json_file(os.path.join(output_dir, "plan.json"), plan)
+            total = plan["total"]
+            logger.info(
+                f"{os.path.basename(project_path)}: {total['calls']} calls, "
+                f"{total['input_tokens']} input and {total['output_tokens']} output "
+                f"tokens, ${total['cost_usd']:.4f}, {total['minutes']:.1f} minutes "
+                f"with {llm_name}"
             )
+        return
 
-            for criterion_id, response in executor.map(
-                lambda x: process_fn(x[0], x[1]), metadata_based_criterion_generator()
-            ):
-                results[criterion_id] = response
-                write_json_file(os.path.join(output_dir, "assessment.json"), results)
+    warm_up_scoring_cache(
+        get_llm(llm=llm_name),
+        excluded_criteria=get_untargeted_file_criteria(config.get("target_tier")),
+    )
 
-        results = {**results, **dir_score}
+    run_id = None
+    if config.get("results_store", True):
+        run_id = args.run_id or time.strftime("%Y%m%dT%H%M%S")
 
-        write_json_file(os.path.join(output_dir, "assessment.json"), results)
-        write_json_file(os.path.join(output_dir, "file_scores.json"), file_scores)
+    # Files of later projects reuse the scores of near-duplicates in earlier ones
+    near_duplicate_index = get_near_duplicate_index(config)
+    gate_failed = False
+    for project_path, repo_url in get_project_sources(config):
+        try:
+            results = assess_source(
+                project_path,
+                repo_url,
+                config=config,
+                llm_name=llm_name,
+                prompt_template=prompt_template,
+                run_id=run_id,
+                resume=args.resume,
+                near_duplicate_index=near_duplicate_index,
+            )
+        except (BudgetExceededError, TimeBudgetExceededError) as exc:
+            logger.error(f"Skipping {os.path.basename(project_path)}: {exc}")
+            continue
+        if config.get("gate", False):
+            essential_criteria = get_criteria_by_type()["Essential"]
+            gate_failed |= bool(get_gate_failures(results, essential_criteria))
 
-        generate_markdown_report(
-            assessment=results,
-            output_file=os.path.join(output_dir, "report.md"),
-            criteria_types=criteria_types,
-            criteria_names=get_criteria_names(),
-            category_criteria=get_category_criteria(),
-        )
+    if gate_failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+import os
+import json
+import math
+import time
+import threading
+import contextvars
+import urllib.request
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Generator, List, Optional
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+SERVICE_NAME = "rt-repo-assessment"
+
+# The span that is currently open in this thread/context, used as the parent of new spans
+current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+def new_id(num_bytes: int) -> str:
+    """Generate a random hexadecimal identifier compatible with OpenTelemetry IDs."""
+    return os.urandom(num_bytes).hex()
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Compute a percentile of a list of values using the nearest-rank method.
+
+    Args:
+        values (List[float]): The values, in any order.
+        q (float): The percentile to compute, between 0 and 100.
+
+    Returns:
+        float: The percentile, or 0.0 if there are no values.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class Span:
+    """
+    A timed unit of work, such as scoring a file or a criterion.
+
+    Attributes:
+        name (str): The stage name of the span.
+        span_id (str): The unique ID of the span.
+        parent_id (Optional[str]): The ID of the enclosing span, if any.
+        attributes (Dict[str, Any]): Extra information about the work done.
+        start_time (float): The wall-clock start time in seconds since the epoch.
+        duration (float): The duration in seconds, set when the span ends.
+        error (Optional[str]): The error message if the work failed.
+    """
+
+    def __init__(
+        self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]
+    ):
+        self.name = name
+        self.span_id = new_id(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_time = time.time()
+        self.duration = 0.0
+        self.error: Optional[str] = None
+        self._start = time.perf_counter()
+
+    def end(self) -> None:
+        """Mark the span as finished."""
+        self.duration = time.perf_counter() - self._start
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Set an attribute on the span."""
+        self.attributes[key] = value
+
+    def add_to_attribute(self, key: str, value: float) -> None:
+        """Add a value to a numeric attribute, starting from zero."""
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serializable representation of the span."""
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration_s": round(self.duration, 6),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class MetricsCollector:
+    """
+    Thread-safe collector of per-stage timings and LLM token usage for one assessment.
+
+    Attributes:
+        name (str): The name of the assessed project.
+        trace_id (str): The ID shared by all spans of this assessment.
+        spans (List[Span]): All finished spans.
+        token_usage (Dict[str, Dict[str, int]]): Calls and tokens per model name.
+        llm_latencies (Dict[str, List[float]]): LLM call latencies per model name.
+        reports (Dict[str, Any]): Extra named reports, such as the routing summary.
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self.trace_id = new_id(16)
+        self.spans: List[Span] = []
+        self.token_usage: Dict[str, Dict[str, int]] = {}
+        self.llm_latencies: Dict[str, List[float]] = {}
+        self.reports: Dict[str, Any] = {}
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._callback_handler = None
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Generator[Span, None, None]:
+        """
+        Time a block of work as a span nested under the currently open span.
+
+        Args:
+            name (str): The stage name of the span.
+            **attributes: Extra information about the work done.
+
+        Yields:
+            Span: The open span, which can be given more attributes.
+        """
+        parent = current_span.get()
+        span = Span(name, parent.span_id if parent else None, attributes)
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.error = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            span.end()
+            current_span.reset(token)
+            with self._lock:
+                self.spans.append(span)
+
+    def record_llm_usage(
+        self,
+        model_name: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        error: bool = False,
+    ) -> None:
+        """
+        Record the token usage of a single LLM call.
+
+        The tokens are also added to the attributes of the currently open span.
+
+        Args:
+            model_name (str): The name of the model that served the call.
+            prompt_tokens (int): The number of prompt tokens.
+            completion_tokens (int): The number of completion tokens.
+            error (bool): Whether the call failed.
+        """
+        with self._lock:
+            usage = self.token_usage.setdefault(
+                model_name,
+                {"calls": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0},
+            )
+            usage["calls"] += 1
+            usage["errors"] += int(error)
+            usage["prompt_tokens"] += prompt_tokens
+            usage["completion_tokens"] += completion_tokens
+
+        span = current_span.get()
+        if span is not None:
+            span.add_to_attribute("prompt_tokens", prompt_tokens)
+            span.add_to_attribute("completion_tokens", completion_tokens)
+
+    def record_llm_latency(self, model_name: str, latency: float) -> None:
+        """
+        Record the latency of a single LLM call.
+
+        Args:
+            model_name (str): The name of the model that served the call.
+            latency (float): The call latency in seconds.
+        """
+        with self._lock:
+            self.llm_latencies.setdefault(model_name, []).append(latency)
+
+    def add_report(self, name: str, report: Dict[str, Any]) -> None:
+        """
+        Attach a named report to the metrics, written alongside the stage summary.
+
+        Args:
+            name (str): The name of the report, e.g. "routing".
+            report (Dict[str, Any]): A JSON-serializable report.
+        """
+        with self._lock:
+            self.reports[name] = report
+
+    @property
+    def callback_handler(self):
+        """The LangChain callback handler that reports LLM calls to this collector."""
+        if self._callback_handler is None:
+            from utils.llm_callbacks import MetricsCallbackHandler
+
+            self._callback_handler = MetricsCallbackHandler(self)
+        return self._callback_handler
+
+    def get_llm_config(self) -> Dict[str, Any]:
+        """Get the runnable config that attaches the callback handler to an LLM call."""
+        return {"callbacks": [self.callback_handler]}
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Summarize the collected spans per stage and the token usage per model.
+
+        Returns:
+            Dict[str, Any]: Per-stage counts and latency percentiles, and LLM totals.
+        """
+        with self._lock:
+            spans = list(self.spans)
+            token_usage = {model: dict(usage) for model, usage in self.token_usage.items()}
+            llm_latencies = {
+                model: list(latencies) for model, latencies in self.llm_latencies.items()
+            }
+
+        durations: Dict[str, List[float]] = {}
+        errors: Dict[str, int] = {}
+        for span in spans:
+            durations.setdefault(span.name, []).append(span.duration)
+            errors[span.name] = errors.get(span.name, 0) + int(span.error is not None)
+
+        stages = {}
+        for name, values in durations.items():
+            stages[name] = {
+                "count": len(values),
+                "errors": errors[name],
+                "total_s": round(sum(values), 6),
+                "mean_s": round(sum(values) / len(values), 6),
+                "p50_s": round(percentile(values, 50), 6),
+                "p95_s": round(percentile(values, 95), 6),
+                "p99_s": round(percentile(values, 99), 6),
+                "max_s": round(max(values), 6),
+            }
+
+        totals = {"calls": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        for usage in token_usage.values():
+            for key in totals:
+                totals[key] += usage[key]
+
+        for model_name, latencies in llm_latencies.items():
+            usage = token_usage.setdefault(model_name, {})
+            usage["latency_p50_s"] = round(percentile(latencies, 50), 6)
+            usage["latency_p95_s"] = round(percentile(latencies, 95), 6)
+            usage["latency_p99_s"] = round(percentile(latencies, 99), 6)
+
+        return {
+            "stages": stages,
+            "llm": {**totals, "by_model": token_usage},
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serializable representation of all collected metrics."""
+        with self._lock:
+            spans = [span.to_dict() for span in self.spans]
+            reports = dict(self.reports)
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "start_time": self.start_time,
+            "wall_time_s": round(time.perf_counter() - self._start, 6),
+            **self.summary(),
+            **reports,
+            "spans": spans,
+        }
+
+    def write(self, file_path: str) -> None:
+        """
+        Write the collected metrics to a JSON file.
+
+        Args:
+            file_path (str): The path of the output file, usually metrics.json.
+        """
+        from utils.general import write_json_file
+
+        write_json_file(file_path, self.to_dict())
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """
+        Convert the collected spans to an OTLP/JSON trace export request.
+
+        Returns:
+            Dict[str, Any]: The payload accepted by an OpenTelemetry collector's
+            /v1/traces HTTP endpoint.
+        """
+        with self._lock:
+            spans = list(self.spans)
+
+        otlp_spans = []
+        for span in spans:
+            otlp_span = {
+                "traceId": self.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(int(span.start_time * 1e9)),
+                "endTimeUnixNano": str(int((span.start_time + span.duration) * 1e9)),
+                "attributes": [
+                    otlp_attribute(key, value) for key, value in span.attributes.items()
+                ],
+                "status": (
+                    {"code": 2, "message": span.error} if span.error else {"code": 1}
+                ),
+            }
+            if span.parent_id:
+                otlp_span["parentSpanId"] = span.parent_id
+            otlp_spans.append(otlp_span)
+
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            otlp_attribute("service.name", SERVICE_NAME),
+                            otlp_attribute("project.name", self.name),
+                        ]
+                    },
+                    "scopeSpans": [
+                        {"scope": {"name": SERVICE_NAME}, "spans": otlp_spans}
+                    ],
+                }
+            ]
+        }
+
+    def export_otlp(self, endpoint: str, timeout: float = 10.0) -> bool:
+        """
+        Export the collected spans to an OpenTelemetry collector over OTLP/HTTP.
+
+        Args:
+            endpoint (str): The collector base URL, e.g. http://localhost:4318.
+            timeout (float): The request timeout in seconds.
+
+        Returns:
+            bool: True if the collector accepted the spans, False otherwise.
+        """
+        url = endpoint.rstrip("/")
+        if not url.endswith("/v1/traces"):
+            url = f"{url}/v1/traces"
+        request = urllib.request.Request(
+            url,
+            data=json.dumps(self.to_otlp()).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            # Error statuses raise an HTTPError
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                response.read()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to export metrics to {url}: {e}")
+            return False
+
+
+def otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    """Convert a key/value pair to an OTLP attribute."""
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def trace(metrics: Optional[MetricsCollector], name: str, **attributes: Any):
+    """
+    Open a span on a collector, or do nothing if no collector is given.
+
+    Args:
+        metrics (Optional[MetricsCollector]): The collector to record the span on.
+        name (str): The stage name of the span.
+        **attributes: Extra information about the work done.
+
+    Returns:
+        A context manager yielding the span, or None without a collector.
+    """
+    if metrics is None:
+        return nullcontext()
+    return metrics.span(name, **attributes)
+
+
+def get_llm_config(metrics: Optional[MetricsCollector]) -> Optional[Dict[str, Any]]:
+    """Get the runnable config that reports LLM calls to a collector, if any."""
+    if metrics is None:
+        return None
+    return metrics.get_llm_config()
@@ -1,4 +1,5 @@
-from typing import Type
+from functools import lru_cache
+from typing import FrozenSet, Iterable, Type
 from pydantic import BaseModel, Field, create_model
 from generators import content_based_criterion_generator
 
@@ -18,18 +19,24 @@ class CriterionScoring(BaseModel):
     explanation: str = Field(description="The explanation for the score")
 
 
+@lru_cache(maxsize=None)
 def get_content_based_scoring_model(
     input_file_extension: str = None,
+    excluded_criteria: FrozenSet[str] = frozenset(),
 ) -> Type[BaseModel]:
     """
     Dynamically creates a Pydantic model for content-based scoring based on file extension.
 
     This function generates a model structure that can validate and store scores for
     various code quality criteria that are applicable to the given file extension.
+    Models are cached per extension and excluded criteria, so repeated calls return
+    the same class.
 
     Args:
         input_file_extension (str, optional): The file extension to filter criteria by.
             If None, all criteria will be included. Defaults to None.
+        excluded_criteria (FrozenSet[str], optional): Criterion IDs to leave out of the
+            model, e.g. criteria already decided by a local pre-check.
 
     Returns:
         Type[BaseModel]: A dynamically created Pydantic model with nested structure
@@ -39,6 +46,8 @@ def get_content_based_scoring_model(
     for criterion_id, criterion in content_based_criterion_generator(
         input_file_extension
     ):
+        if criterion_id in excluded_criteria:
+            continue
 
         scores_fields[criterion_id] = (
             CriterionScoring,
@@ -54,3 +63,17 @@ def get_content_based_scoring_model(
     }
 
     return create_model("CodeQualityFileScoring", **field_definitions)
+
+
+def warm_up_scoring_models(
+    file_extensions: Iterable[str], excluded_criteria: FrozenSet[str] = frozenset()
+) -> None:
+    """
+    Build and cache the content-based scoring models for the given file extensions.
+
+    Args:
+        file_extensions (Iterable[str]): The file extensions to build models for.
+        excluded_criteria (FrozenSet[str]): Criterion IDs to leave out of the models.
+    """
+    for file_extension in file_extensions:
+        get_content_based_scoring_model(file_extension, excluded_criteria)
@@ -0,0 +1,261 @@
+import heapq
+from typing import Any, Dict, FrozenSet, List, Optional
+from logger import get_logger
+from utils.llm import get_model_price, get_num_api_keys
+from directory_scorer.tree import build_tree, post_order_generator
+from directory_scorer.prioritizer import prioritize_files
+from directory_scorer.sampling import stratified_sample
+from directory_scorer.content_based_scorer import (
+    count_tokens,
+    get_file_instructions,
+    get_prompt_overhead_tokens,
+    prepare_file,
+    tracked_extensions,
+    ignored_names,
+)
+
+logger = get_logger(__name__)
+
+# Output tokens of the score and one-sentence explanation of a criterion
+OUTPUT_TOKENS_PER_CRITERION = 80
+
+# Rates assumed for models missing from the price table
+DEFAULT_RATES = {
+    "rpm": 500,
+    "tpm": 200000,
+    "seconds_per_call": 1.0,
+    "output_tokens_per_second": 60,
+}
+
+# Stages in the order an assessment dispatches them
+STAGES = ["criteria_scoring", "file_scoring"]
+
+
+class BudgetExceededError(RuntimeError):
+    """Raised when the estimated cost or duration of an assessment exceeds its budget."""
+
+
+def get_model_rates(model_name: str) -> Dict[str, float]:
+    """
+    Get the prices and rate limits of a model, with defaults for unknown values.
+
+    The rate limits apply per API key, so they are multiplied by the number of
+    keys the calls are spread over.
+
+    Args:
+        model_name (str): The model ID.
+
+    Returns:
+        Dict[str, float]: The input and output prices in USD per million tokens,
+        the requests and tokens per minute, the seconds to the first output
+        token and the output tokens per second.
+    """
+    rates = {"input": 0.0, "output": 0.0, **DEFAULT_RATES}
+    rates.update(get_model_price(model_name) or {})
+    num_keys = get_num_api_keys(model_name)
+    rates["rpm"] *= num_keys
+    rates["tpm"] *= num_keys
+    return rates
+
+
+def plan_criterion_call(prompt: str) -> Dict[str, Any]:
+    """
+    Plan the call that scores a metadata criterion.
+
+    Args:
+        prompt (str): The prompt of the criterion.
+
+    Returns:
+        Dict[str, Any]: The stage and input and output tokens of the call.
+    """
+    return {
+        "stage": "criteria_scoring",
+        "input_tokens": count_tokens(prompt, model_name="gpt-4o"),
+        "output_tokens": OUTPUT_TOKENS_PER_CRITERION,
+    }
+
+
+def plan_file_calls(
+    project_path: str,
+    chunk_size: int = 128000,
+    chunk_overlap: int = 200,
+    max_token_count: int = 128000,
+    tracked_extensions: List[str] = tracked_extensions,
+    ignored_names: List[str] = ignored_names,
+    global_context: str = "",
+    excluded_criteria: FrozenSet[str] = frozenset(),
+    sample_size: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Plan the calls that score the files of a project.
+
+    Files are loaded, split and pre-checked as for scoring, and each chunk that
+    has criteria left after the pre-checks makes one call.
+
+    Args:
+        project_path (str): The path to the project directory.
+        chunk_size (int): The size of each text chunk when splitting file content.
+        chunk_overlap (int): The overlap between text chunks.
+        max_token_count (int): Maximum allowed tokens per call.
+        tracked_extensions (List[str]): File extensions to analyze.
+        ignored_names (List[str]): File/directory names to ignore.
+        global_context (str): Additional context sent with each chunk.
+        excluded_criteria (FrozenSet[str]): Criteria that are not scored.
+        sample_size (Optional[int]): The maximum number of files to score, as in
+            `score_directory_based_on_files`.
+
+    Returns:
+        List[Dict[str, Any]]: The stage, file path and input and output tokens of
+        each call.
+    """
+    root = build_tree(
+        project_path,
+        tracked_extensions=tracked_extensions,
+        ignored_names=ignored_names,
+        global_context=global_context,
+    )
+    files = [node for node in post_order_generator(root) if not node.is_dir]
+    files = prioritize_files(files, project_path)
+    if sample_size is not None and len(files) > sample_size:
+        files = stratified_sample(files, sample_size, project_path)
+
+    context = f"{global_context}\n\n" if global_context else ""
+    calls = []
+    for node in files:
+        prepared = prepare_file(
+            node.full_path,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            max_token_count=max_token_count,
+            global_context=global_context,
+        )
+        if not prepared.chunks:
+            continue
+        num_criteria = len(
+            get_file_instructions(
+                prepared.file_extension,
+                frozenset(prepared.decided_scores) | excluded_criteria,
+            )
+        )
+        if num_criteria == 0:
+            continue
+        overhead = get_prompt_overhead_tokens(context, prepared.file_extension)
+        for chunk_tokens in prepared.chunk_tokens:
+            calls.append(
+                {
+                    "stage": "file_scoring",
+                    "file_path": node.full_path,
+                    "input_tokens": overhead + chunk_tokens,
+                    "output_tokens": num_criteria * OUTPUT_TOKENS_PER_CRITERION,
+                }
+            )
+    return calls
+
+
+def simulate_stage(
+    calls: List[Dict[str, Any]], max_workers: int, rates: Dict[str, float]
+) -> float:
+    """
+    Estimate how long a stage takes to dispatch its calls.
+
+    Calls are assigned in order to the first free of `max_workers` workers,
+    each taking the time to the first token plus the generation time of its
+    output. The stage cannot be faster than the provider's request and token
+    rate limits allow.
+
+    Args:
+        calls (List[Dict[str, Any]]): The calls of the stage.
+        max_workers (int): The number of concurrent calls.
+        rates (Dict[str, float]): The rates of the model, from `get_model_rates`.
+
+    Returns:
+        float: The estimated duration in seconds.
+    """
+    if not calls:
+        return 0.0
+    workers = [0.0] * max(min(max_workers, len(calls)), 1)
+    for call in calls:
+        start = heapq.heappop(workers)
+        duration = (
+            rates["seconds_per_call"]
+            + call["output_tokens"] / rates["output_tokens_per_second"]
+        )
+        heapq.heappush(workers, start + duration)
+    tokens = sum(call["input_tokens"] + call["output_tokens"] for call in calls)
+    rate_limited = 60 * max(len(calls) / rates["rpm"], tokens / rates["tpm"])
+    return max(max(workers), rate_limited)
+
+
+def build_plan(
+    calls: List[Dict[str, Any]], model_name: str, max_workers: int
+) -> Dict[str, Any]:
+    """
+    Estimate the calls, tokens, cost and duration of an assessment.
+
+    Args:
+        calls (List[Dict[str, Any]]): The planned calls.
+        model_name (str): The model the calls are sent to.
+        max_workers (int): The number of concurrent calls of each stage.
+
+    Returns:
+        Dict[str, Any]: The estimates of each stage and their totals. Stages run
+        one after the other, so their durations add up.
+    """
+    rates = get_model_rates(model_name)
+    stages = {}
+    for stage in STAGES:
+        stage_calls = [call for call in calls if call["stage"] == stage]
+        input_tokens = sum(call["input_tokens"] for call in stage_calls)
+        output_tokens = sum(call["output_tokens"] for call in stage_calls)
+        stages[stage] = {
+            "calls": len(stage_calls),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cost_usd": (input_tokens * rates["input"] + output_tokens * rates["output"])
+            / 1e6,
+            "minutes": simulate_stage(stage_calls, max_workers, rates) / 60,
+        }
+    totals = {
+        key: sum(stage[key] for stage in stages.values())
+        for key in ["calls", "input_tokens", "output_tokens", "cost_usd", "minutes"]
+    }
+    totals["cost_usd"] = round(totals["cost_usd"], 6)
+    totals["minutes"] = round(totals["minutes"], 2)
+    for stage in stages.values():
+        stage["cost_usd"] = round(stage["cost_usd"], 6)
+        stage["minutes"] = round(stage["minutes"], 2)
+    return {
+        "model": model_name,
+        "max_workers": max_workers,
+        "stages": stages,
+        "total": totals,
+    }
+
+
+def check_budget(
+    plan: Dict[str, Any],
+    max_cost_usd: Optional[float] = None,
+    max_minutes: Optional[float] = None,
+) -> None:
+    """
+    Check that the estimates of a plan are within a budget.
+
+    Args:
+        plan (Dict[str, Any]): The plan returned by `build_plan`.
+        max_cost_usd (Optional[float]): The maximum cost in USD, if any.
+        max_minutes (Optional[float]): The maximum duration in minutes, if any.
+
+    Raises:
+        BudgetExceededError: If the estimated cost or duration exceeds the budget.
+    """
+    total = plan["total"]
+    if max_cost_usd is not None and total["cost_usd"] > max_cost_usd:
+        raise BudgetExceededError(
+            f"Estimated cost ${total['cost_usd']:.4f} exceeds the budget of "
+            f"${max_cost_usd:.4f}"
+        )
+    if max_minutes is not None and total["minutes"] > max_minutes:
+        raise BudgetExceededError(
+            f"Estimated duration of {total['minutes']:.2f} minutes exceeds the budget "
+            f"of {max_minutes:.2f} minutes"
+        )
@@ -25,6 +25,7 @@ def generate_markdown_report(
 
     total_criteria = len(assessment)
     met_criteria = sum(1 for score in assessment.values() if score.get("score", 0) == 1)
+    sampled_criteria = sum(1 for score in assessment.values() if score.get("sampled"))
 
     # Calculate statistics by category
     category_stats = {}
@@ -85,8 +86,14 @@ def generate_markdown_report(
         f.write("## Overall Summary\n\n")
         f.write(f"- **Total Criteria**: {total_criteria}\n")
         f.write(
-            f"- **Criteria Met**: {met_criteria} ({round(met_criteria/total_criteria*100, 1)}%)\n\n"
+            f"- **Criteria Met**: {met_criteria} ({round(met_criteria/total_criteria*100, 1)}%)\n"
         )
+        if sampled_criteria:
+            f.write(
+                f"- **Sampled Criteria**: {sampled_criteria}, estimated from a sample of "
+                "the files and marked with *(sampled)*\n"
+            )
+        f.write("\n")
 
         # Category breakdown
         f.write("## Category Breakdown\n\n")
@@ -125,6 +132,8 @@ def generate_markdown_report(
                         break
 
                 status = "✅" if assessment[criterion].get("score", 0) == 1 else "❌"
+                if assessment[criterion].get("sampled"):
+                    status += " *(sampled)*"
                 explanation = assessment[criterion].get(
                     "explanation", "No explanation provided"
                 )
@@ -0,0 +1,479 @@
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from logger import get_logger
+from metrics import new_id, percentile
+from config import paths
+from utils.general import read_json_file, read_yaml_file
+from utils.llm import get_llm, get_default_llm_name
+from utils.progress import (
+    AssessmentCancelledError,
+    ProgressTracker,
+    TimeBudgetExceededError,
+)
+from directory_scorer.content_based_scorer import warm_up_scoring_cache
+from main import assess_source, get_near_duplicate_index
+
+logger = get_logger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+# Number of recent jobs kept for the latency percentiles
+LATENCY_WINDOW = 1000
+
+
+class JobConflictError(ValueError):
+    """Raised when a project is submitted while it is already being assessed."""
+
+
+class AssessmentJob:
+    """
+    An assessment submitted to the service.
+
+    Attributes:
+        job_id (str): The unique ID of the job.
+        project_path (str): The local project directory.
+        repo_url (Optional[str]): The repository URL to download the project from,
+            or None for a local project.
+        resume (bool): Whether to resume from the project checkpoint journal.
+        run_id (Optional[str]): The run to record the scores under in the results store.
+        status (str): One of queued, running, succeeded, failed or cancelled.
+        progress (ProgressTracker): The progress and cancellation flag of the job.
+        submitted_at (float): The submission time in seconds since the epoch.
+        started_at (Optional[float]): The time the job started running.
+        finished_at (Optional[float]): The time the job finished.
+        error (Optional[str]): The error message if the job failed.
+        results (Optional[Dict[str, Any]]): The assessment results if the job succeeded.
+    """
+
+    def __init__(
+        self,
+        project_path: str,
+        repo_url: Optional[str],
+        resume: bool = False,
+        run_id: Optional[str] = None,
+    ):
+        self.job_id = new_id(8)
+        self.project_path = project_path
+        self.repo_url = repo_url
+        self.resume = resume
+        self.run_id = run_id
+        self.status = JOB_QUEUED
+        self.progress = ProgressTracker()
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.results: Optional[Dict[str, Any]] = None
+
+    def to_dict(self, include_results: bool = False) -> Dict[str, Any]:
+        """
+        Get the job state as a JSON-serializable dictionary.
+
+        Args:
+            include_results (bool): Whether to include the assessment results.
+
+        Returns:
+            Dict[str, Any]: The job state.
+        """
+        job = {
+            "job_id": self.job_id,
+            "project": os.path.basename(self.project_path),
+            "repo_url": self.repo_url,
+            "status": self.status,
+            "progress": self.progress.to_dict(),
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "output_dir": os.path.join(
+                paths.OUTPUTS_DIR, os.path.basename(self.project_path)
+            ),
+            "error": self.error,
+        }
+        if include_results and self.results is not None:
+            job["results"] = self.results
+        return job
+
+
+class AssessmentService:
+    """
+    Runs assessments submitted over time on a pool of long-lived workers.
+
+    The language model clients, criteria registry and structured-output models
+    are built once when the service starts and reused by every job, so small
+    assessments are not dominated by start-up cost.
+
+    Attributes:
+        config (Dict[str, Any]): The run configuration, as in `config.json`.
+        llm_name (str): The identifier of the language model to score with.
+        num_workers (int): The number of assessments run at the same time.
+        run_id (Optional[str]): The default run of the results store, or None if the
+            results store is disabled.
+    """
+
+    def __init__(self, config: Dict[str, Any], llm_name: str, num_workers: int = 2):
+        self.config = config
+        self.llm_name = llm_name
+        self.num_workers = num_workers
+        self.run_id = (
+            time.strftime("%Y%m%dT%H%M%S")
+            if config.get("results_store", True)
+            else None
+        )
+        self.prompt_template = read_yaml_file(paths.PROMPTS_FPATH)["scoring_v0"]
+        # Shared by all jobs, so forks of one template reuse each other's file scores
+        self.near_duplicate_index = get_near_duplicate_index(config)
+        self._jobs: Dict[str, AssessmentJob] = {}
+        self._queue: "queue.Queue[Optional[AssessmentJob]]" = queue.Queue()
+        self._workers: List[threading.Thread] = []
+        self._queue_waits: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._run_times: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Warm up the scoring caches and start the workers."""
+        warm_up_scoring_cache(get_llm(llm=self.llm_name))
+        for index in range(self.num_workers):
+            worker = threading.Thread(
+                target=self._work, name=f"assessment-worker-{index}", daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+        logger.info(f"Started {self.num_workers} assessment workers")
+
+    def stop(self) -> None:
+        """Cancel the running jobs and stop the workers once they are done."""
+        for job in self.list_jobs():
+            self.cancel(job.job_id)
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    def submit(self, request: Dict[str, Any]) -> AssessmentJob:
+        """
+        Queue an assessment.
+
+        Args:
+            request (Dict[str, Any]): Either `repo_url`, the repository to download,
+                or `project_name`, a project in the inputs directory. `resume` and
+                `run_id` are optional.
+
+        Returns:
+            AssessmentJob: The queued job.
+
+        Raises:
+            ValueError: If the request names no valid project.
+            JobConflictError: If the project is already queued or being assessed.
+        """
+        repo_url = request.get("repo_url")
+        project_name = request.get("project_name")
+        if bool(repo_url) == bool(project_name):
+            raise ValueError("Specify exactly one of 'repo_url' or 'project_name'")
+
+        if repo_url:
+            if not os.path.basename(repo_url):
+                raise ValueError(f"Invalid repository URL {repo_url}")
+            project_path = os.path.join(paths.INPUTS_DIR, os.path.basename(repo_url))
+        else:
+            project_path = os.path.join(paths.INPUTS_DIR, os.path.basename(project_name))
+            if not os.path.isdir(project_path):
+                raise ValueError(f"Project directory {project_path} does not exist")
+
+        job = AssessmentJob(
+            project_path,
+            repo_url=repo_url or None,
+            resume=bool(request.get("resume", False)),
+            run_id=request.get("run_id") or self.run_id,
+        )
+        with self._lock:
+            # Jobs on the same project would share its output directory and journal
+            for other in self._jobs.values():
+                if other.project_path == project_path and other.status in ACTIVE_STATUSES:
+                    raise JobConflictError(
+                        f"Project {os.path.basename(project_path)} is already "
+                        f"being assessed by job {other.job_id}"
+                    )
+            self._jobs[job.job_id] = job
+        self._queue.put(job)
+        logger.info(f"Queued job {job.job_id} for {os.path.basename(project_path)}")
+        return job
+
+    def get_job(self, job_id: str) -> Optional[AssessmentJob]:
+        """Get a job by ID, or None if it does not exist."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[AssessmentJob]:
+        """Get all jobs in submission order."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[AssessmentJob]:
+        """
+        Cancel a job.
+
+        A queued job is cancelled at once. A running job stops before its next
+        file or criterion, and its completed work stays in its checkpoint journal
+        so it can be resumed later.
+
+        Args:
+            job_id (str): The ID of the job.
+
+        Returns:
+            Optional[AssessmentJob]: The job, or None if it does not exist.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status == JOB_QUEUED:
+                job.status = JOB_CANCELLED
+                job.finished_at = time.time()
+            if job.status in ACTIVE_STATUSES:
+                job.progress.cancel()
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the queue depth, job counts and latency percentiles of the service.
+
+        Returns:
+            Dict[str, Any]: The service metrics.
+        """
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+            queue_waits = list(self._queue_waits)
+            run_times = list(self._run_times)
+        return {
+            "workers": self.num_workers,
+            "queue_depth": statuses.count(JOB_QUEUED),
+            "jobs": {
+                status: statuses.count(status)
+                for status in (
+                    JOB_QUEUED,
+                    JOB_RUNNING,
+                    JOB_SUCCEEDED,
+                    JOB_FAILED,
+                    JOB_CANCELLED,
+                )
+            },
+            "queue_wait": {
+                "p50": percentile(queue_waits, 50),
+                "p95": percentile(queue_waits, 95),
+            },
+            "run_time": {
+                "p50": percentile(run_times, 50),
+                "p95": percentile(run_times, 95),
+            },
+        }
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                if job.status != JOB_QUEUED:
+                    continue
+                job.status = JOB_RUNNING
+                job.started_at = time.time()
+                self._queue_waits.append(job.started_at - job.submitted_at)
+            self._run(job)
+
+    def _run(self, job: AssessmentJob) -> None:
+        try:
+            results = assess_source(
+                job.project_path,
+                job.repo_url,
+                config=self.config,
+                llm_name=self.llm_name,
+                prompt_template=self.prompt_template,
+                run_id=job.run_id,
+                resume=job.resume,
+                progress=job.progress,
+                near_duplicate_index=self.near_duplicate_index,
+            )
+            status, error = JOB_SUCCEEDED, None
+        except TimeBudgetExceededError as exc:
+            results, status, error = None, JOB_FAILED, str(exc)
+        except AssessmentCancelledError:
+            results, status, error = None, JOB_CANCELLED, None
+        except Exception as exc:
+            logger.exception(f"Job {job.job_id} failed")
+            results, status, error = None, JOB_FAILED, str(exc)
+
+        with self._lock:
+            job.results = results
+            job.status = status
+            job.error = error
+            job.finished_at = time.time()
+            self._run_times.append(job.finished_at - job.started_at)
+        logger.info(f"Job {job.job_id} {status}")
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API of the assessment service.
+
+    Routes:
+        POST /jobs: Submit an assessment.
+        GET /jobs: List the jobs.
+        GET /jobs/<job_id>: Get the status, progress and results of a job.
+        POST /jobs/<job_id>/cancel: Cancel a job.
+        GET /metrics: Get the queue depth, job counts and latencies.
+        GET /health: Check that the service is up.
+    """
+
+    service: AssessmentService
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def send_json(self, status: HTTPStatus, body: Any) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(body, dict):
+            raise ValueError("The request body must be a JSON object")
+        return body
+
+    def get_path_parts(self) -> Tuple[str, ...]:
+        return tuple(part for part in self.path.split("?")[0].split("/") if part)
+
+    def do_GET(self) -> None:
+        parts = self.get_path_parts()
+        if parts == ("health",):
+            self.send_json(HTTPStatus.OK, {"status": "ok"})
+        elif parts == ("metrics",):
+            self.send_json(HTTPStatus.OK, self.service.stats())
+        elif parts == ("jobs",):
+            jobs = [job.to_dict() for job in self.service.list_jobs()]
+            self.send_json(HTTPStatus.OK, {"jobs": jobs})
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self.service.get_job(parts[1])
+            if job is None:
+                self.send_json(HTTPStatus.NOT_FOUND, {"error": "Job not found"})
+            else:
+                self.send_json(HTTPStatus.OK, job.to_dict(include_results=True))
+        else:
+            self.send_json(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+
+    def do_POST(self) -> None:
+        parts = self.get_path_parts()
+        if parts == ("jobs",):
+            try:
+                job = self.service.submit(self.read_json())
+            except json.JSONDecodeError as exc:
+                self.send_json(HTTPStatus.BAD_REQUEST, {"error": str(exc)})
+            except JobConflictError as exc:
+                self.send_json(HTTPStatus.CONFLICT, {"error": str(exc)})
+            except ValueError as exc:
+                self.send_json(HTTPStatus.BAD_REQUEST, {"error": str(exc)})
+            else:
+                self.send_json(HTTPStatus.ACCEPTED, job.to_dict())
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel":
+            job = self.service.cancel(parts[1])
+            if job is None:
+                self.send_json(HTTPStatus.NOT_FOUND, {"error": "Job not found"})
+            else:
+                self.send_json(HTTPStatus.ACCEPTED, job.to_dict())
+        else:
+            self.send_json(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+
+
+def create_server(
+    service: AssessmentService, host: str = "127.0.0.1", port: int = 8080
+) -> ThreadingHTTPServer:
+    """
+    Create the HTTP server of an assessment service.
+
+    Args:
+        service (AssessmentService): The service that handles the requests.
+        host (str): The address to listen on.
+        port (int): The port to listen on, or 0 for any free port.
+
+    Returns:
+        ThreadingHTTPServer: The server, not yet serving.
+    """
+    handler = type(
+        "BoundServiceRequestHandler", (ServiceRequestHandler,), {"service": service}
+    )
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parse the command line arguments.
+
+    Args:
+        argv (Optional[List[str]]): The arguments to parse. Defaults to sys.argv.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Serve repository assessments over a local HTTP/JSON API."
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on.")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=2,
+        help="Number of assessments to run at the same time.",
+    )
+    parser.add_argument(
+        "--config",
+        default=paths.CONFIG_FPATH,
+        help="Path to the run configuration file. Its project settings are ignored.",
+    )
+    parser.add_argument(
+        "--llm",
+        default=None,
+        help="ID of the model to score with. Defaults to the first provider with an "
+        "API key set.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    config = read_json_file(args.config)
+    service = AssessmentService(
+        config, llm_name=args.llm or get_default_llm_name(), num_workers=args.workers
+    )
+    service.start()
+    server = create_server(service, host=args.host, port=args.port)
+    logger.info(f"Serving assessments on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+import time
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, List, Optional, TYPE_CHECKING
+from logger import get_logger
+from metrics import percentile
+from utils.progress import ProgressTracker
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import Runnable
+
+logger = get_logger(__name__)
+
+# Calls are only hedged once this many latencies are known
+MIN_HEDGE_SAMPLES = 20
+
+# Shortest delay before a call is hedged, in seconds
+MIN_HEDGE_DELAY = 0.5
+
+# Number of recent latencies the hedging delay is computed from
+LATENCY_WINDOW = 1000
+
+# Concurrent calls of a batch whose config sets no max_concurrency
+MAX_BATCH_CONCURRENCY = 8
+
+
+class CallTimeoutError(TimeoutError):
+    """Raised when an LLM call does not return before its deadline."""
+
+
+class LatencyTracker:
+    """
+    Thread-safe window of the latencies of recent successful calls.
+
+    Attributes:
+        window (int): The number of latencies kept.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        """Record the latency of a call, in seconds."""
+        with self._lock:
+            self._latencies.append(latency)
+
+    def get_percentile(self, q: float, min_samples: int = 1) -> Optional[float]:
+        """
+        Get a percentile of the recent latencies.
+
+        Args:
+            q (float): The percentile, between 0 and 100.
+            min_samples (int): The number of latencies needed for an estimate.
+
+        Returns:
+            Optional[float]: The percentile in seconds, or None if there are fewer
+            latencies than `min_samples`.
+        """
+        with self._lock:
+            latencies = list(self._latencies)
+        if len(latencies) < max(min_samples, 1):
+            return None
+        return percentile(latencies, q)
+
+
+def get_batch_workers(num_inputs: int, config: Optional[Dict[str, Any]]) -> int:
+    """
+    Get the number of threads that run the calls of a batch.
+
+    Args:
+        num_inputs (int): The number of inputs of the batch.
+        config (Optional[Dict[str, Any]]): The runnable config, whose
+            `max_concurrency` bounds the threads as in `Runnable.batch`.
+
+    Returns:
+        int: The number of threads.
+    """
+    limit = (config or {}).get("max_concurrency") or MAX_BATCH_CONCURRENCY
+    return max(min(num_inputs, limit), 1)
+
+
+def start_call(runnable: "Runnable", input: Any, config: Optional[Dict[str, Any]]) -> Future:
+    """
+    Invoke a runnable in a daemon thread.
+
+    A call that is abandoned after its deadline keeps running in the
+    background, but does not hold up a worker pool or the exit of the process.
+
+    Args:
+        runnable (Runnable): The runnable to invoke.
+        input (Any): The input of the runnable.
+        config (Optional[Dict[str, Any]]): The runnable config.
+
+    Returns:
+        Future: The future of the output of the runnable.
+    """
+    future: Future = Future()
+    future.set_running_or_notify_cancel()
+    context = contextvars.copy_context()
+
+    def run() -> None:
+        try:
+            future.set_result(context.run(runnable.invoke, input, config=config))
+        except BaseException as exc:
+            future.set_exception(exc)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+class CallPolicy:
+    """
+    Per-call deadlines and hedged requests for the LLM calls of an assessment.
+
+    One slow provider response would otherwise hold up the worker that waits
+    for it. A call that does not return within `timeout_seconds`, or before
+    the time budget of the assessment runs out, is abandoned. With hedging, a
+    call still running after the `hedge_percentile` of recent latencies is
+    sent again, to an alternate model if one is given, and the first valid
+    response wins.
+
+    Attributes:
+        timeout_seconds (Optional[float]): The deadline of each call, if any.
+        hedge (bool): Whether to hedge slow calls.
+        hedge_percentile (float): The latency percentile after which a call is hedged.
+        progress (Optional[ProgressTracker]): The progress of the assessment, whose
+            deadline also bounds every call.
+        latencies (LatencyTracker): The latencies of recent successful calls.
+    """
+
+    def __init__(
+        self,
+        timeout_seconds: Optional[float] = None,
+        hedge: bool = False,
+        hedge_percentile: float = 95,
+        progress: Optional[ProgressTracker] = None,
+    ):
+        self.timeout_seconds = timeout_seconds
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.progress = progress
+        self.latencies = LatencyTracker()
+        self._all_latencies: List[float] = []
+        self._counts = {"calls": 0, "errors": 0, "timeouts": 0, "hedged": 0, "hedge_wins": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] += 1
+
+    def _record_latency(self, latency: float) -> None:
+        self.latencies.record(latency)
+        with self._lock:
+            self._all_latencies.append(latency)
+
+    def get_timeout(self) -> Optional[float]:
+        """
+        Get the deadline of a call starting now.
+
+        Returns:
+            Optional[float]: The seconds the call may take, or None if unbounded.
+
+        Raises:
+            TimeBudgetExceededError: If the time budget of the assessment has run out.
+        """
+        timeout = self.timeout_seconds
+        if self.progress is not None:
+            self.progress.check_cancelled()
+            remaining = self.progress.get_remaining_seconds()
+            if remaining is not None:
+                timeout = remaining if timeout is None else min(timeout, remaining)
+        return timeout
+
+    def get_hedge_delay(self) -> Optional[float]:
+        """
+        Get how long to wait for a call before hedging it.
+
+        Returns:
+            Optional[float]: The delay in seconds, or None if calls are not hedged
+            yet, e.g. before enough latencies are known.
+        """
+        if not self.hedge:
+            return None
+        delay = self.latencies.get_percentile(self.hedge_percentile, MIN_HEDGE_SAMPLES)
+        return None if delay is None else max(delay, MIN_HEDGE_DELAY)
+
+    def invoke(
+        self,
+        runnable: "Runnable",
+        input: Any,
+        config: Optional[Dict[str, Any]] = None,
+        alternate: Optional["Runnable"] = None,
+    ) -> Any:
+        """
+        Invoke a runnable within the call deadline, hedging it if it is slow.
+
+        Args:
+            runnable (Runnable): The runnable to invoke.
+            input (Any): The input of the runnable.
+            config (Optional[Dict[str, Any]]): The runnable config, e.g. callbacks.
+            alternate (Optional[Runnable]): The runnable the hedged call is sent to,
+                e.g. the same prompt on another provider. `runnable` if not given.
+
+        Returns:
+            Any: The first valid output.
+
+        Raises:
+            CallTimeoutError: If no call returned before the deadline.
+            TimeBudgetExceededError: If the time budget of the assessment ran out.
+        """
+        timeout = self.get_timeout()
+        hedge_delay = self.get_hedge_delay()
+        self._count("calls")
+        start = time.monotonic()
+        if timeout is None and hedge_delay is None:
+            try:
+                output = runnable.invoke(input, config=config)
+            except Exception:
+                self._count("errors")
+                raise
+            self._record_latency(time.monotonic() - start)
+            return output
+
+        attempts = {start_call(runnable, input, config): start}
+        pending = set(attempts)
+        last_error: Optional[BaseException] = None
+        while pending:
+            now = time.monotonic()
+            waits = []
+            if timeout is not None:
+                waits.append(start + timeout - now)
+            if hedge_delay is not None and len(attempts) == 1:
+                waits.append(start + hedge_delay - now)
+            done, pending = wait(
+                pending,
+                timeout=max(min(waits), 0) if waits else None,
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                if future.exception() is None:
+                    self._record_latency(time.monotonic() - attempts[future])
+                    if len(attempts) > 1 and attempts[future] > start:
+                        self._count("hedge_wins")
+                    return future.result()
+                last_error = future.exception()
+
+            now = time.monotonic()
+            if timeout is not None and now >= start + timeout and pending:
+                self._count("timeouts")
+                if self.progress is not None:
+                    self.progress.check_cancelled()
+                raise CallTimeoutError(f"No response within {timeout:.1f} seconds")
+            if (
+                pending
+                and hedge_delay is not None
+                and len(attempts) == 1
+                and now >= start + hedge_delay
+            ):
+                # The original call keeps running, whichever returns first wins
+                self._count("hedged")
+                hedged = start_call(alternate or runnable, input, config)
+                attempts[hedged] = time.monotonic()
+                pending.add(hedged)
+
+        self._count("errors")
+        raise last_error
+
+    def batch(
+        self,
+        runnable: "Runnable",
+        inputs: List[Any],
+        config: Optional[Dict[str, Any]] = None,
+    ) -> List[Any]:
+        """
+        Invoke a runnable on several inputs concurrently, each within the call deadline.
+
+        Without a deadline or hedging, the inputs are sent with `runnable.batch`,
+        and every call of the batch is recorded with the latency of the batch.
+
+        Args:
+            runnable (Runnable): The runnable to invoke.
+            inputs (List[Any]): The inputs of the runnable.
+            config (Optional[Dict[str, Any]]): The runnable config.
+
+        Returns:
+            List[Any]: The outputs, in the order of the inputs.
+        """
+        if len(inputs) == 1:
+            return [self.invoke(runnable, inputs[0], config)]
+        if self.get_timeout() is None and not self.hedge:
+            start = time.monotonic()
+            with self._lock:
+                self._counts["calls"] += len(inputs)
+            try:
+                outputs = runnable.batch(inputs, config=config)
+            except Exception:
+                self._count("errors")
+                raise
+            latency = time.monotonic() - start
+            for _ in outputs:
+                self._record_latency(latency)
+            return outputs
+        with ThreadPoolExecutor(
+            max_workers=get_batch_workers(len(inputs), config)
+        ) as executor:
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run, self.invoke, runnable, input, config
+                )
+                for input in inputs
+            ]
+            return [future.result() for future in futures]
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Summarize the calls made with the policy.
+
+        Returns:
+            Dict[str, Any]: The number of calls, errors, timeouts, hedged calls and
+            hedges that returned first, and the latency percentiles of the
+            successful calls.
+        """
+        with self._lock:
+            latencies = list(self._all_latencies)
+            report: Dict[str, Any] = dict(self._counts)
+        report["latency_p50_s"] = round(percentile(latencies, 50), 6)
+        report["latency_p95_s"] = round(percentile(latencies, 95), 6)
+        report["latency_p99_s"] = round(percentile(latencies, 99), 6)
+        return report
@@ -0,0 +1,144 @@
+import os
+import json
+import threading
+from typing import Any, Dict, Optional
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+HEADER_RECORD = "header"
+FILE_RECORD = "file"
+CRITERION_RECORD = "criterion"
+
+
+class CheckpointJournal:
+    """
+    Append-only JSONL journal of completed file and criterion results.
+
+    Every result is appended as one line as soon as it is available, so an
+    assessment that crashes or is interrupted can be resumed without redoing
+    completed work. A partially written last line, e.g. from a crash during
+    a write, is ignored when the journal is loaded.
+
+    The first line records the namespace of the results, which identifies the
+    model and criteria they were scored with. A journal written under another
+    namespace is not resumed, as its results would not match the current run.
+
+    Attributes:
+        file_path (str): The path of the journal file.
+        namespace (str): The namespace of the results.
+        completed_files (Dict[str, Dict[str, Any]]): File scores by file path.
+            Skipped files have an empty result.
+        completed_criteria (Dict[str, Dict[str, Any]]): Criterion scores by criterion ID.
+    """
+
+    def __init__(self, file_path: str, resume: bool = False, namespace: str = ""):
+        """
+        Open a journal, loading the completed results when resuming.
+
+        Args:
+            file_path (str): The path of the journal file.
+            resume (bool): Whether to keep and load an existing journal. Otherwise
+                any existing journal is discarded.
+            namespace (str): The namespace of the results, e.g. as returned by
+                `get_result_namespace`. An existing journal with another namespace
+                is discarded.
+        """
+        self.file_path = file_path
+        self.namespace = namespace
+        self.completed_files: Dict[str, Dict[str, Any]] = {}
+        self.completed_criteria: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+        if resume and os.path.exists(file_path):
+            journal_namespace = self._read_namespace()
+            if journal_namespace == namespace:
+                self._load()
+                logger.info(
+                    f"Resuming from {file_path}: {len(self.completed_files)} files "
+                    f"and {len(self.completed_criteria)} criteria already scored"
+                )
+            else:
+                logger.warning(
+                    f"Not resuming from {file_path}, as its results were scored "
+                    f"under {journal_namespace} rather than {namespace}"
+                )
+                resume = False
+        self._file = open(file_path, "a" if resume else "w", encoding="utf-8")
+        if self._file.tell() == 0:
+            self._append(HEADER_RECORD, namespace, {})
+        elif not self._ends_with_newline():
+            # Terminate a line cut short by a crash so the next record starts cleanly
+            self._file.write("\n")
+
+    def _read_namespace(self) -> Optional[str]:
+        with open(self.file_path, "r", encoding="utf-8") as file:
+            try:
+                record = json.loads(file.readline())
+            except json.JSONDecodeError:
+                return None
+        if not isinstance(record, dict) or record.get("type") != HEADER_RECORD:
+            return None
+        return record.get("key")
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.file_path, "rb") as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) == b"\n"
+
+    def _load(self) -> None:
+        with open(self.file_path, "r", encoding="utf-8") as file:
+            for line_number, line in enumerate(file, start=1):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(
+                        f"Ignoring corrupt line {line_number} of {self.file_path}"
+                    )
+                    continue
+                if record.get("type") == FILE_RECORD:
+                    self.completed_files[record["key"]] = record["result"]
+                elif record.get("type") == CRITERION_RECORD:
+                    self.completed_criteria[record["key"]] = record["result"]
+
+    def _append(self, record_type: str, key: str, result: Dict[str, Any]) -> None:
+        line = json.dumps(
+            {"type": record_type, "key": key, "result": result}, ensure_ascii=False
+        )
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def record_file(self, file_path: str, result: Dict[str, Any]) -> None:
+        """
+        Record the scores of a file.
+
+        Args:
+            file_path (str): The path of the scored file.
+            result (Dict[str, Any]): The file scores, or an empty dictionary if the
+                file was skipped.
+        """
+        self._append(FILE_RECORD, file_path, result)
+        self.completed_files[file_path] = result
+
+    def record_criterion(self, criterion_id: str, result: Dict[str, Any]) -> None:
+        """
+        Record the score of a metadata criterion.
+
+        Args:
+            criterion_id (str): The ID of the criterion.
+            result (Dict[str, Any]): The criterion score.
+        """
+        self._append(CRITERION_RECORD, criterion_id, result)
+        self.completed_criteria[criterion_id] = result
+
+    def close(self) -> None:
+        """Close the journal file."""
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self) -> "CheckpointJournal":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
@@ -0,0 +1,242 @@
+import math
+import time
+import random
+import hashlib
+import threading
+from operator import itemgetter
+from typing import Any, Dict, List, Literal, Optional, Type, get_args, get_origin
+from pydantic import BaseModel, Field
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.runnables import Runnable, RunnableMap, RunnablePassthrough
+
+
+class FakeLLMError(RuntimeError):
+    """Raised by the fake language model to simulate a failed provider call."""
+
+
+class FakeLLMStats:
+    """
+    Thread-safe call and token counters shared by all copies of a fake model.
+
+    Attributes:
+        calls (int): The number of calls made to the model.
+        errors (int): The number of calls that raised a simulated error.
+        input_tokens (int): The approximate number of prompt tokens received.
+        output_tokens (int): The approximate number of completion tokens returned.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, input_tokens: int, output_tokens: int, error: bool) -> None:
+        """Record a single call."""
+        with self._lock:
+            self.calls += 1
+            self.errors += int(error)
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+
+    def reset(self) -> None:
+        """Reset all counters to zero."""
+        with self._lock:
+            self.calls = 0
+            self.errors = 0
+            self.input_tokens = 0
+            self.output_tokens = 0
+
+
+def approximate_token_count(text: str) -> int:
+    """Approximate the token count of a text as one token per four characters."""
+    return max(1, len(text) // 4)
+
+
+def build_fake_instance(
+    schema: Type[BaseModel], rng: random.Random, pass_rate: float
+) -> BaseModel:
+    """
+    Build a schema-valid instance of a Pydantic model with pseudo-random values.
+
+    Args:
+        schema (Type[BaseModel]): The model to instantiate.
+        rng (random.Random): The random generator to draw values from.
+        pass_rate (float): The probability that an integer score field is 1.
+
+    Returns:
+        BaseModel: An instance of the model.
+    """
+    values: Dict[str, Any] = {}
+    for name, field in schema.model_fields.items():
+        values[name] = fake_value(name, field.annotation, rng, pass_rate)
+    return schema(**values)
+
+
+def fake_value(name: str, annotation: Any, rng: random.Random, pass_rate: float) -> Any:
+    """Generate a value matching a field annotation."""
+    origin = get_origin(annotation)
+    if origin is not None:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if origin in (list, List):
+            return []
+        if origin in (dict, Dict):
+            return {}
+        if args:
+            return fake_value(name, args[0], rng, pass_rate)
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return build_fake_instance(annotation, rng, pass_rate)
+    if annotation is bool:
+        return rng.random() < pass_rate
+    if annotation is int:
+        return 1 if rng.random() < pass_rate else 0
+    if annotation is float:
+        return rng.random()
+    if annotation is str:
+        return f"Fake explanation for {name}."
+    return None
+
+
+class FakeScoringChatModel(BaseChatModel):
+    """
+    Offline, deterministic chat model for benchmarks and tests.
+
+    Responses are derived from a hash of the prompt and the seed, so the same
+    input always produces the same output, latency and simulated failures.
+    Structured output returns schema-valid instances of the requested model,
+    such as `CriterionScoring` or the per-extension `CodeQualityFileScoring`.
+
+    Attributes:
+        model_name (str): The name reported for this model.
+        latency_distribution (str): How the per-call latency is sampled.
+        latency_mean (float): The mean latency in seconds.
+        latency_stddev (float): The latency spread in seconds.
+        error_rate (float): The probability that a call raises `FakeLLMError`.
+        pass_rate (float): The probability that a criterion is scored 1.
+        seed (int): The seed mixed into every response.
+        stats (FakeLLMStats): Call and token counters shared across copies.
+    """
+
+    model_name: str = "fake-llm"
+    latency_distribution: Literal["constant", "uniform", "normal", "lognormal"] = (
+        "constant"
+    )
+    latency_mean: float = 0.0
+    latency_stddev: float = 0.0
+    error_rate: float = 0.0
+    pass_rate: float = 0.5
+    seed: int = 0
+    stats: FakeLLMStats = Field(default_factory=FakeLLMStats, exclude=True)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-scoring-chat-model"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        # Copies share their counters, separately created models do not
+        return {
+            "model_name": self.model_name,
+            "latency_distribution": self.latency_distribution,
+            "latency_mean": self.latency_mean,
+            "latency_stddev": self.latency_stddev,
+            "error_rate": self.error_rate,
+            "pass_rate": self.pass_rate,
+            "seed": self.seed,
+            "stats_id": id(self.stats),
+        }
+
+    def _get_rng(self, prompt: str) -> random.Random:
+        digest = hashlib.sha256(f"{self.seed}:{prompt}".encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _sample_latency(self, rng: random.Random) -> float:
+        if self.latency_mean <= 0:
+            return 0.0
+        if self.latency_distribution == "uniform":
+            latency = rng.uniform(
+                self.latency_mean - self.latency_stddev,
+                self.latency_mean + self.latency_stddev,
+            )
+        elif self.latency_distribution == "normal":
+            latency = rng.gauss(self.latency_mean, self.latency_stddev)
+        elif self.latency_distribution == "lognormal":
+            # Parameterise so the distribution has the requested mean and stddev
+            variance = self.latency_stddev**2
+            sigma2 = math.log(1 + variance / self.latency_mean**2)
+            mu = math.log(self.latency_mean) - sigma2 / 2
+            latency = rng.lognormvariate(mu, sigma2**0.5)
+        else:
+            latency = self.latency_mean
+        return max(0.0, latency)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[Any] = None,
+        response_schema: Optional[Type[BaseModel]] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        rng = self._get_rng(prompt)
+        time.sleep(self._sample_latency(rng))
+
+        input_tokens = approximate_token_count(prompt)
+        if rng.random() < self.error_rate:
+            self.stats.record(input_tokens, 0, error=True)
+            raise FakeLLMError("Simulated provider error")
+
+        if response_schema is not None:
+            content = build_fake_instance(
+                response_schema, rng, self.pass_rate
+            ).model_dump_json()
+        else:
+            content = "This is a fake response."
+
+        output_tokens = approximate_token_count(content)
+        self.stats.record(input_tokens, output_tokens, error=False)
+
+        message = AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+            response_metadata={"model_name": self.model_name},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def with_structured_output(
+        self, schema: Type[BaseModel], *, include_raw: bool = False, **kwargs: Any
+    ) -> Runnable:
+        """
+        Bind the model to a Pydantic schema so responses parse into its instances.
+
+        Args:
+            schema (Type[BaseModel]): The model responses should conform to.
+            include_raw (bool): If True, return a dict with the raw message
+                ("raw"), the parsed instance or None ("parsed") and the parsing
+                error or None ("parsing_error"), as the provider models do.
+
+        Returns:
+            Runnable: A runnable that returns instances of `schema`, or dicts if
+            `include_raw` is True.
+        """
+        bound = self.bind(response_schema=schema)
+        parser = PydanticOutputParser(pydantic_object=schema)
+        if not include_raw:
+            return bound | parser
+
+        parse = RunnablePassthrough.assign(
+            parsed=itemgetter("raw") | parser, parsing_error=lambda _: None
+        )
+        no_parse = RunnablePassthrough.assign(parsed=lambda _: None)
+        return RunnableMap(raw=bound) | parse.with_fallbacks(
+            [no_parse], exception_key="parsing_error"
+        )
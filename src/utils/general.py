@@ -1,13 +1,18 @@
 import os
 import json
 import yaml
+import threading
 from typing import Dict, List, Union, Any
 
 
+# Prefer the libyaml-backed loader when available, it parses several times faster
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
 def read_yaml_file(file_path: str) -> Dict[Any, Any]:
     """Read a YAML file and return its content."""
     with open(file_path, "r") as file:
-        return yaml.safe_load(file)
+        return yaml.load(file, Loader=YAML_LOADER)
 
 
 def write_yaml_file(file_path: str, data: Union[Dict, List]):
@@ -35,9 +40,23 @@ def read_json_file(file_path: str) -> Union[Dict, List]:
 
 
 def write_json_file(file_path: str, data: Union[Dict, List]):
-    """Write data to a JSON file."""
-    with open(file_path, "w", encoding="utf-8") as file:
-        json.dump(data, file, indent=4, ensure_ascii=False)
+    """Write data to a JSON file.
+
+    The data is written to a temporary file that then replaces the target, so
+    readers never see a partially written file, even if the process crashes.
+    """
+    # A unique name per writer, so concurrent writes of the same file do not clash
+    temp_file_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_file_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=4, ensure_ascii=False)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_file_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+        raise
 
 
 def get_dir_size_mb(directory):
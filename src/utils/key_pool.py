@@ -0,0 +1,337 @@
+import time
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional, Tuple, TYPE_CHECKING
+from logger import get_logger
+from utils.call_policy import get_batch_workers
+
+if TYPE_CHECKING:
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.runnables import Runnable
+
+logger = get_logger(__name__)
+
+# Length of the window requests and tokens are counted over, in seconds
+QUOTA_WINDOW_SECONDS = 60
+
+# How long a key is left out after its first quota error, in seconds
+QUARANTINE_SECONDS = 60
+
+# Longest quarantine of a key that keeps returning quota errors, in seconds
+MAX_QUARANTINE_SECONDS = 900
+
+
+class ApiKeysExhaustedError(RuntimeError):
+    """Raised when every API key of a pool is quarantined after quota errors."""
+
+
+def is_quota_error(exc: BaseException) -> bool:
+    """
+    Check whether an exception signals that the quota of an API key is exhausted.
+
+    Unlike server errors, these are specific to the key that made the call.
+
+    Args:
+        exc (BaseException): The exception raised by an LLM call.
+
+    Returns:
+        bool: True for HTTP 429 responses and provider rate-limit or quota errors.
+    """
+    status_code = getattr(exc, "status_code", None) or getattr(
+        getattr(exc, "response", None), "status_code", None
+    )
+    if status_code == 429:
+        return True
+    name = type(exc).__name__.lower()
+    message = str(exc).lower()
+    return (
+        "ratelimit" in name
+        or "resourceexhausted" in name
+        or "rate limit" in message
+        or "quota" in message
+    )
+
+
+def mask_api_key(api_key: str) -> str:
+    """Mask an API key down to its last four characters, for logs and reports."""
+    return f"...{api_key[-4:]}"
+
+
+class ApiKeyState:
+    """
+    Usage and quarantine of one API key.
+
+    Attributes:
+        name (str): The masked key.
+        window (Deque[Tuple[float, int]]): The start time and estimated tokens of
+            the calls of the last `QUOTA_WINDOW_SECONDS`.
+        in_flight (int): The number of calls currently running.
+        quarantined_until (float): The monotonic time the key is usable again.
+        strikes (int): The number of consecutive quarantines.
+    """
+
+    def __init__(self, api_key: str):
+        self.name = mask_api_key(api_key)
+        self.window: Deque[Tuple[float, int]] = deque()
+        self.in_flight = 0
+        self.quarantined_until = 0.0
+        self.strikes = 0
+        self.calls = 0
+        self.errors = 0
+        self.quarantines = 0
+        self.tokens = 0
+
+    def prune(self, now: float) -> None:
+        """Drop the calls that started before the quota window."""
+        while self.window and self.window[0][0] <= now - QUOTA_WINDOW_SECONDS:
+            self.window.popleft()
+
+    def get_headroom(self, rpm: float, tpm: float) -> float:
+        """
+        Get the share of the per-minute request and token quota left to the key.
+
+        Args:
+            rpm (float): The requests per minute allowed per key.
+            tpm (float): The tokens per minute allowed per key.
+
+        Returns:
+            float: The smaller of the shares of requests and tokens left, which is
+            negative once the key is over its quota.
+        """
+        requests = len(self.window)
+        tokens = sum(call_tokens for _, call_tokens in self.window)
+        return min(1 - requests / rpm, 1 - tokens / tpm)
+
+
+class KeyPool:
+    """
+    Quota-aware scheduler of the API keys of a model.
+
+    Each call goes to the key with the most headroom left in its per-minute
+    request and token quotas, so the calls spread over the keys and the
+    throughput of the pool grows with its number of keys. A key that returns
+    a quota error is quarantined, for twice as long after each consecutive
+    quota error.
+
+    Attributes:
+        name (str): The model the keys are used for.
+        rpm (float): The requests per minute allowed per key.
+        tpm (float): The tokens per minute allowed per key.
+        keys (List[ApiKeyState]): The state of each key, in the order given.
+    """
+
+    def __init__(self, name: str, api_keys: List[str], rpm: float, tpm: float):
+        if not api_keys:
+            raise ValueError(f"No API keys for {name}")
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self.keys = [ApiKeyState(api_key) for api_key in api_keys]
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> int:
+        """
+        Reserve a call on the key with the most headroom.
+
+        Ties go to the key with the fewest calls in flight.
+
+        Args:
+            tokens (int): The estimated tokens of the call.
+
+        Returns:
+            int: The index of the key.
+
+        Raises:
+            ApiKeysExhaustedError: If every key is quarantined.
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = []
+            for index, key in enumerate(self.keys):
+                if now < key.quarantined_until:
+                    continue
+                key.prune(now)
+                candidates.append(
+                    (key.get_headroom(self.rpm, self.tpm), -key.in_flight, -index)
+                )
+            if not candidates:
+                retry_in = min(key.quarantined_until for key in self.keys) - now
+                raise ApiKeysExhaustedError(
+                    f"All {len(self.keys)} API keys for {self.name} are quarantined "
+                    f"after quota errors, the first is usable in {retry_in:.0f} seconds"
+                )
+            index = -max(candidates)[2]
+            key = self.keys[index]
+            key.window.append((now, tokens))
+            key.in_flight += 1
+            key.calls += 1
+            key.tokens += tokens
+        return index
+
+    def release(self, index: int, error: Optional[BaseException] = None) -> None:
+        """
+        Record the end of a call, quarantining its key after a quota error.
+
+        Args:
+            index (int): The index of the key, as returned by `acquire`.
+            error (Optional[BaseException]): The exception raised by the call, if any.
+        """
+        with self._lock:
+            key = self.keys[index]
+            key.in_flight -= 1
+            if error is None:
+                key.strikes = 0
+                return
+            key.errors += 1
+            if not is_quota_error(error):
+                return
+            key.strikes += 1
+            key.quarantines += 1
+            seconds = min(
+                QUARANTINE_SECONDS * 2 ** (key.strikes - 1), MAX_QUARANTINE_SECONDS
+            )
+            key.quarantined_until = time.monotonic() + seconds
+        logger.warning(
+            f"Quarantining API key {key.name} for {self.name} for {seconds} seconds: "
+            f"{error}"
+        )
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Summarize the use of each key.
+
+        Returns:
+            Dict[str, Any]: The calls, errors, quarantines and estimated tokens of
+            each key, by masked key.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                key.name: {
+                    "calls": key.calls,
+                    "errors": key.errors,
+                    "quarantines": key.quarantines,
+                    "quarantined": now < key.quarantined_until,
+                    "estimated_tokens": key.tokens,
+                }
+                for key in self.keys
+            }
+
+
+def estimate_tokens(input: Any) -> int:
+    """Approximate the prompt tokens of an input as one token per four characters."""
+    return max(1, len(str(input)) // 4)
+
+
+class PooledRunnable:
+    """
+    Runnable that sends each call to the copy bound to the key picked by a pool.
+
+    Attributes:
+        pool (KeyPool): The pool that picks the key of each call.
+        runnables (List[Runnable]): The runnable of each key of the pool.
+    """
+
+    def __init__(self, pool: KeyPool, runnables: List["Runnable"]):
+        self.pool = pool
+        self.runnables = runnables
+
+    def invoke(
+        self, input: Any, config: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> Any:
+        """
+        Invoke the runnable of the key with the most headroom.
+
+        A call that fails with a quota error is retried on the next key picked
+        by the pool, until every key is quarantined.
+
+        Args:
+            input (Any): The input of the runnable.
+            config (Optional[Dict[str, Any]]): The runnable config, e.g. callbacks.
+
+        Returns:
+            Any: The output of the runnable.
+
+        Raises:
+            ApiKeysExhaustedError: If every key is quarantined.
+        """
+        tokens = estimate_tokens(input)
+        last_error: Optional[BaseException] = None
+        while True:
+            try:
+                index = self.pool.acquire(tokens)
+            except ApiKeysExhaustedError as exc:
+                raise exc from last_error
+            try:
+                output = self.runnables[index].invoke(input, config=config, **kwargs)
+            except Exception as exc:
+                self.pool.release(index, exc)
+                if not is_quota_error(exc):
+                    raise
+                last_error = exc
+                continue
+            self.pool.release(index)
+            return output
+
+    def batch(
+        self, inputs: List[Any], config: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> List[Any]:
+        """
+        Invoke the runnable on several inputs concurrently, picking a key for each.
+
+        Args:
+            inputs (List[Any]): The inputs of the runnable.
+            config (Optional[Dict[str, Any]]): The runnable config.
+
+        Returns:
+            List[Any]: The outputs, in the order of the inputs.
+        """
+        if len(inputs) == 1:
+            return [self.invoke(inputs[0], config, **kwargs)]
+        with ThreadPoolExecutor(
+            max_workers=get_batch_workers(len(inputs), config)
+        ) as executor:
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run, self.invoke, input, config, **kwargs
+                )
+                for input in inputs
+            ]
+            return [future.result() for future in futures]
+
+
+class PooledChatModel(PooledRunnable):
+    """
+    Chat model that spreads its calls over one client per API key.
+
+    It stands in for the chat model returned by `get_llm` when a provider has
+    several keys, and binds structured outputs on every client.
+
+    Attributes:
+        model_name (str): The model ID.
+    """
+
+    def __init__(self, model_name: str, pool: KeyPool, llms: List["BaseChatModel"]):
+        super().__init__(pool, llms)
+        self.model_name = model_name
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> PooledRunnable:
+        """
+        Bind every client to an output schema.
+
+        Args:
+            schema (Any): The schema responses should conform to.
+
+        Returns:
+            PooledRunnable: The structured-output runnables, sharing the key pool.
+        """
+        return PooledRunnable(
+            self.pool,
+            [llm.with_structured_output(schema, **kwargs) for llm in self.runnables],
+        )
+
+    def model_copy(self) -> "PooledChatModel":
+        """Copy the model, sharing the key pool."""
+        return PooledChatModel(self.model_name, self.pool, list(self.runnables))
@@ -1,9 +1,12 @@
 import os
+import threading
+from functools import lru_cache, partial
+from typing import Any, Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_groq import ChatGroq
+
+if TYPE_CHECKING:
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from utils.key_pool import KeyPool
 
 load_dotenv()
 
@@ -13,51 +16,377 @@ GPT_4_1_MINI = "gpt-4.1-mini"
 GEMINI_1_5_FLASH = "gemini-1.5-flash"
 GEMINI_1_5_PRO = "gemini-1.5-pro"
 LLAMA_3_1_8B_INSTANT = "llama-3.1-8b-instant"
+FAKE_LLM = "fake-llm"
+
+
+def get_api_keys(env_var: str) -> List[str]:
+    """
+    Get the API keys set for a provider.
+
+    Several keys can be listed, comma-separated, in the plural of the variable,
+    e.g. OPENAI_API_KEYS for OPENAI_API_KEY.
+
+    Args:
+        env_var (str): The environment variable of a single key.
+
+    Returns:
+        List[str]: The distinct keys, the one in `env_var` first.
+    """
+    keys = [os.environ.get(env_var, "")]
+    keys += os.environ.get(f"{env_var}S", "").split(",")
+    return list(dict.fromkeys(key.strip() for key in keys if key.strip()))
+
+
+def get_provider_api_keys(env_var: str) -> List[str]:
+    """
+    Get the API keys the clients of a provider are created with.
+
+    OpenAI models are sent to OpenRouter, with its keys, when any is set.
+
+    Args:
+        env_var (str): The environment variable of the provider's key.
+
+    Returns:
+        List[str]: The keys of the provider.
+    """
+    if env_var == "OPENAI_API_KEY":
+        return get_api_keys("OPEN_ROUTER_API_KEY") or get_api_keys(env_var)
+    return get_api_keys(env_var)
+
+
+def get_openai_params() -> Dict[str, str]:
+    """
+    Get the extra client parameters for OpenAI-compatible models.
+
+    Returns:
+        Dict[str, str]: OpenRouter credentials if an OpenRouter key is set, otherwise empty.
+    """
+    open_router_keys = get_api_keys("OPEN_ROUTER_API_KEY")
+    if open_router_keys:
+        return {
+            "openai_api_key": open_router_keys[0],
+            "openai_api_base": "https://openrouter.ai/api/v1",
+        }
+    return {}
+
+
+def create_openai_llm(
+    model: str, api_key: Optional[str] = None, **kwargs: Any
+) -> "BaseChatModel":
+    """Create an OpenAI chat model, importing the provider package on first use."""
+    from langchain_openai import ChatOpenAI
+
+    params = get_openai_params()
+    if api_key is not None:
+        params["openai_api_key"] = api_key
+    return ChatOpenAI(model=model, **params, **kwargs)
+
+
+def create_google_llm(
+    model: str, api_key: Optional[str] = None, **kwargs: Any
+) -> "BaseChatModel":
+    """Create a Google Gemini chat model, importing the provider package on first use."""
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    if api_key is not None:
+        kwargs["google_api_key"] = api_key
+    return ChatGoogleGenerativeAI(model=model, **kwargs)
+
+
+def create_groq_llm(
+    model: str, api_key: Optional[str] = None, **kwargs: Any
+) -> "BaseChatModel":
+    """Create a Groq chat model, importing the provider package on first use."""
+    from langchain_groq import ChatGroq
+
+    if api_key is not None:
+        kwargs["groq_api_key"] = api_key
+    return ChatGroq(model=model, **kwargs)
 
 
-params = {}
-if "OPEN_ROUTER_API_KEY" in os.environ:
-    params = {
-        "openai_api_key": os.environ["OPEN_ROUTER_API_KEY"],
-        "openai_api_base": "https://openrouter.ai/api/v1",
+def create_fake_llm(**kwargs: Any) -> "BaseChatModel":
+    """
+    Create the offline fake chat model used for benchmarks and tests.
+
+    Latency and failures can be configured through the FAKE_LLM_LATENCY_DISTRIBUTION,
+    FAKE_LLM_LATENCY_MEAN, FAKE_LLM_LATENCY_STDDEV, FAKE_LLM_ERROR_RATE and
+    FAKE_LLM_SEED environment variables (latencies in seconds).
+    """
+    from utils.fake_llm import FakeScoringChatModel
+
+    env_params = {
+        "latency_distribution": os.environ.get("FAKE_LLM_LATENCY_DISTRIBUTION"),
+        "latency_mean": os.environ.get("FAKE_LLM_LATENCY_MEAN"),
+        "latency_stddev": os.environ.get("FAKE_LLM_LATENCY_STDDEV"),
+        "error_rate": os.environ.get("FAKE_LLM_ERROR_RATE"),
+        "seed": os.environ.get("FAKE_LLM_SEED"),
     }
-else:
-    params = {}
-
-llms = {}
-
-if "OPENAI_API_KEY" in os.environ:
-    llms[GPT_4O_MINI] = ChatOpenAI(model="gpt-4o-mini", temperature=0, **params)
-    llms[GPT_4O] = ChatOpenAI(model="gpt-4o", temperature=0, top_p=0, **params)
-    llms[GPT_4_1_MINI] = ChatOpenAI(model="gpt-4.1-mini", temperature=0, **params)
-if "GOOGLE_API_KEY" in os.environ:
-    llms[GEMINI_1_5_FLASH] = ChatGoogleGenerativeAI(
-        model="gemini-1.5-flash", temperature=0, **params
-    )
-    llms[GEMINI_1_5_PRO] = ChatGoogleGenerativeAI(
-        model="gemini-1.5-pro", temperature=0, **params
-    )
+    params = {key: value for key, value in env_params.items() if value is not None}
+    return FakeScoringChatModel(**{**params, **kwargs})
 
-if "GROQ_API_KEY" in os.environ:
-    llms[LLAMA_3_1_8B_INSTANT] = ChatGroq(
-        model="llama-3.1-8b-instant", temperature=0, **params
-    )
+
+# Registry of model IDs to (required environment variable, client factory).
+# Clients are only constructed when a model is first requested, with an
+# `api_key` argument when the provider has several keys.
+llm_providers: Dict[str, Tuple[Optional[str], Callable[..., "BaseChatModel"]]] = {
+    GPT_4O_MINI: (
+        "OPENAI_API_KEY",
+        partial(create_openai_llm, "gpt-4o-mini", temperature=0),
+    ),
+    GPT_4O: (
+        "OPENAI_API_KEY",
+        partial(create_openai_llm, "gpt-4o", temperature=0, top_p=0),
+    ),
+    GPT_4_1_MINI: (
+        "OPENAI_API_KEY",
+        partial(create_openai_llm, "gpt-4.1-mini", temperature=0),
+    ),
+    GEMINI_1_5_FLASH: (
+        "GOOGLE_API_KEY",
+        partial(create_google_llm, "gemini-1.5-flash", temperature=0),
+    ),
+    GEMINI_1_5_PRO: (
+        "GOOGLE_API_KEY",
+        partial(create_google_llm, "gemini-1.5-pro", temperature=0),
+    ),
+    LLAMA_3_1_8B_INSTANT: (
+        "GROQ_API_KEY",
+        partial(create_groq_llm, "llama-3.1-8b-instant", temperature=0),
+    ),
+    # The fake model needs no API key and is only used when requested explicitly
+    FAKE_LLM: (None, create_fake_llm),
+}
+
+# Default model per provider, in order of preference
+default_llms = [
+    ("OPENAI_API_KEY", GPT_4O_MINI),
+    ("GOOGLE_API_KEY", GEMINI_1_5_FLASH),
+    ("GROQ_API_KEY", LLAMA_3_1_8B_INSTANT),
+]
+
+# Requests and tokens per minute assumed per key for models missing from the price table
+DEFAULT_KEY_RPM = 500
+DEFAULT_KEY_TPM = 200000
+
+llms: Dict[str, "BaseChatModel"] = {}
+llms_lock = threading.Lock()
+key_pools: Dict[str, "KeyPool"] = {}
+
+
+def is_llm_available(llm: str) -> bool:
+    """
+    Check whether a language model is registered and its API key is set.
+
+    Args:
+        llm (str): The identifier for the language model.
+
+    Returns:
+        bool: True if the model can be constructed, False otherwise.
+    """
+    if llm not in llm_providers:
+        return False
+    env_var, _ = llm_providers[llm]
+    return env_var is None or bool(get_api_keys(env_var))
+
+
+def get_available_llms() -> List[str]:
+    """
+    Get the identifiers of all language models that can be constructed.
+
+    Returns:
+        List[str]: The available model identifiers.
+    """
+    return [llm for llm in llm_providers if is_llm_available(llm)]
+
+
+def get_default_llm_name() -> str:
+    """
+    Pick the default language model based on which API key is set.
+
+    Returns:
+        str: The identifier of the default language model.
+
+    Raises:
+        ValueError: If no supported API key is found in the environment.
+    """
+    for env_var, llm in default_llms:
+        if get_api_keys(env_var):
+            return llm
+    raise ValueError("No API key found")
 
 
-def get_llm(llm: str) -> BaseChatModel:
+def get_llm(llm: str) -> "BaseChatModel":
     """
     Retrieves a language model instance based on the provided identifier.
 
+    The underlying client is constructed the first time the model is requested
+    and cached in the `llms` dictionary. If the provider has several API keys,
+    one client is created per key, and calls are spread over them by a
+    `KeyPool`.
+
     Args:
         llm (str): The identifier for the language model to retrieve.
-            Should be one of the keys in the `llms` dictionary.
+            Should be one of the keys in the `llm_providers` registry.
 
     Returns:
         BaseChatModel: A copy of the requested language model instance.
 
     Raises:
-        ValueError: If the provided identifier is not found in the `llms` dictionary.
+        ValueError: If the provided identifier is not registered or its API key is missing.
     """
     if llm not in llms:
-        raise ValueError(f"LLM not found for ID: {llm}")
+        if not is_llm_available(llm):
+            raise ValueError(f"LLM not found for ID: {llm}")
+        with llms_lock:
+            if llm not in llms:
+                env_var, factory = llm_providers[llm]
+                api_keys = get_provider_api_keys(env_var) if env_var else []
+                if len(api_keys) > 1:
+                    llms[llm] = create_pooled_llm(llm, factory, api_keys)
+                elif api_keys:
+                    llms[llm] = factory(api_key=api_keys[0])
+                else:
+                    llms[llm] = factory()
     return llms[llm].model_copy()
+
+
+def create_pooled_llm(
+    llm: str, factory: Callable[..., "BaseChatModel"], api_keys: List[str]
+) -> "BaseChatModel":
+    """
+    Create a chat model that spreads its calls over several API keys.
+
+    Args:
+        llm (str): The identifier of the language model.
+        factory (Callable[..., BaseChatModel]): Creates the client of one key.
+        api_keys (List[str]): The API keys of the provider.
+
+    Returns:
+        BaseChatModel: The pooled chat model.
+    """
+    from utils.key_pool import KeyPool, PooledChatModel
+
+    rates = get_model_price(llm) or {}
+    pool = KeyPool(
+        llm,
+        api_keys,
+        rpm=rates.get("rpm", DEFAULT_KEY_RPM),
+        tpm=rates.get("tpm", DEFAULT_KEY_TPM),
+    )
+    key_pools[llm] = pool
+    return PooledChatModel(llm, pool, [factory(api_key=key) for key in api_keys])
+
+
+def get_num_api_keys(llm: str) -> int:
+    """
+    Get the number of API keys the calls to a model are spread over.
+
+    Args:
+        llm (str): The identifier of the language model.
+
+    Returns:
+        int: The number of keys of the model's provider, at least 1.
+    """
+    env_var = llm_providers.get(llm, (None, None))[0]
+    return max(len(get_provider_api_keys(env_var)), 1) if env_var else 1
+
+
+def get_key_pool_report() -> Dict[str, Any]:
+    """
+    Summarize the use of the API keys of the pooled models.
+
+    Returns:
+        Dict[str, Any]: The report of each key pool, by model ID.
+    """
+    return {llm: pool.report() for llm, pool in key_pools.items()}
+
+
+def get_llm_name(llm: "BaseChatModel") -> str:
+    """
+    Retrieves the model name of a language model instance.
+
+    Args:
+        llm (BaseChatModel): The language model instance.
+
+    Returns:
+        str: The model name, or the class name if the model does not expose one.
+    """
+    return (
+        getattr(llm, "model_name", None)
+        or getattr(llm, "model", None)
+        or type(llm).__name__
+    )
+
+
+def get_llm_config_id(llm: "BaseChatModel") -> str:
+    """
+    Identify a language model instance by its name and parameters.
+
+    Two instances with the same ID behave the same, so runnables built on one
+    can be reused for the other.
+
+    Args:
+        llm (BaseChatModel): The language model instance.
+
+    Returns:
+        str: The model name and its identifying parameters, e.g. the temperature.
+    """
+    params = getattr(llm, "_identifying_params", None) or {}
+    return f"{get_llm_name(llm)}:{sorted(params.items())!r}"
+
+
+@lru_cache(maxsize=None)
+def get_model_pricing() -> Dict[str, Dict[str, float]]:
+    """
+    Get the price table of the supported models.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Input and output prices in USD per million
+        tokens, keyed by model ID.
+    """
+    from config import paths
+    from utils.general import read_yaml_file
+
+    return read_yaml_file(paths.MODEL_PRICING_FPATH)
+
+
+def get_model_price(model_name: str) -> Optional[Dict[str, float]]:
+    """
+    Get the price and rate limits of a model.
+
+    Provider-reported names such as "gpt-4o-mini-2024-07-18" are matched to the
+    longest model ID they start with.
+
+    Args:
+        model_name (str): The model ID or provider-reported model name.
+
+    Returns:
+        Optional[Dict[str, float]]: The entry of the model in the price table, or
+        None if the model is unknown.
+    """
+    pricing = get_model_pricing()
+    price = pricing.get(model_name)
+    if price is None:
+        candidates = [name for name in pricing if model_name.startswith(name)]
+        if not candidates:
+            return None
+        price = pricing[max(candidates, key=len)]
+    return price
+
+
+def get_llm_cost(model_name: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """
+    Estimate the cost of LLM usage in USD.
+
+    Args:
+        model_name (str): The model ID or provider-reported model name.
+        prompt_tokens (int): The number of prompt tokens.
+        completion_tokens (int): The number of completion tokens.
+
+    Returns:
+        float: The estimated cost, or 0.0 if the model has no known price.
+    """
+    price = get_model_price(model_name)
+    if price is None:
+        return 0.0
+    return (prompt_tokens * price["input"] + completion_tokens * price["output"]) / 1e6
@@ -0,0 +1,97 @@
+import time
+import threading
+from uuid import UUID
+from typing import Any, Dict, Tuple, TYPE_CHECKING
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+if TYPE_CHECKING:
+    from metrics import MetricsCollector
+
+
+def get_token_usage(response: LLMResult) -> Tuple[str, int, int]:
+    """
+    Extract the model name and prompt/completion token counts from an LLM response.
+
+    Usage metadata on the generated messages is preferred; providers that only
+    report usage in `llm_output` are handled as a fallback.
+
+    Args:
+        response (LLMResult): The result passed to `on_llm_end`.
+
+    Returns:
+        Tuple[str, int, int]: The model name, prompt tokens and completion tokens.
+    """
+    llm_output = response.llm_output or {}
+    model_name = llm_output.get("model_name", "")
+    prompt_tokens = 0
+    completion_tokens = 0
+
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            if message is None:
+                continue
+            usage = getattr(message, "usage_metadata", None) or {}
+            prompt_tokens += usage.get("input_tokens", 0)
+            completion_tokens += usage.get("output_tokens", 0)
+            model_name = model_name or message.response_metadata.get("model_name", "")
+
+    if not prompt_tokens and not completion_tokens:
+        token_usage = llm_output.get("token_usage") or llm_output.get("usage") or {}
+        prompt_tokens = token_usage.get("prompt_tokens", 0)
+        completion_tokens = token_usage.get("completion_tokens", 0)
+
+    return model_name or "unknown", prompt_tokens, completion_tokens
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback handler that reports LLM latency and token usage to a collector.
+
+    Attributes:
+        metrics (MetricsCollector): The collector to report to.
+    """
+
+    def __init__(self, metrics: "MetricsCollector"):
+        self.metrics = metrics
+        self._starts: Dict[UUID, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(
+        self, serialized: Dict[str, Any], messages: Any, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._start(serialized, run_id, kwargs)
+
+    def on_llm_start(
+        self, serialized: Dict[str, Any], prompts: Any, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._start(serialized, run_id, kwargs)
+
+    def _start(self, serialized: Dict[str, Any], run_id: UUID, kwargs: Dict) -> None:
+        invocation_params = kwargs.get("invocation_params") or {}
+        model_name = (
+            invocation_params.get("model_name")
+            or invocation_params.get("model")
+            or (serialized or {}).get("name", "")
+        )
+        with self._lock:
+            self._starts[run_id] = (time.perf_counter(), model_name)
+
+    def _finish(self, run_id: UUID) -> Tuple[float, str]:
+        with self._lock:
+            start, model_name = self._starts.pop(run_id, (time.perf_counter(), ""))
+        return time.perf_counter() - start, model_name
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        latency, started_model_name = self._finish(run_id)
+        model_name, prompt_tokens, completion_tokens = get_token_usage(response)
+        if model_name == "unknown" and started_model_name:
+            model_name = started_model_name
+        self.metrics.record_llm_usage(model_name, prompt_tokens, completion_tokens)
+        self.metrics.record_llm_latency(model_name, latency)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        latency, model_name = self._finish(run_id)
+        self.metrics.record_llm_usage(model_name or "unknown", 0, 0, error=True)
+        self.metrics.record_llm_latency(model_name or "unknown", latency)
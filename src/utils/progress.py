@@ -0,0 +1,111 @@
+import time
+import threading
+from typing import Any, Dict, Optional
+
+
+class AssessmentCancelledError(RuntimeError):
+    """Raised when an assessment stops because it was cancelled."""
+
+
+class TimeBudgetExceededError(AssessmentCancelledError):
+    """Raised when an assessment stops because its time budget ran out."""
+
+
+class ProgressTracker:
+    """
+    Thread-safe progress and cancellation flag of one assessment.
+
+    The scoring stages report how many of their items are done, and check the
+    flag between items so a cancelled assessment stops without starting new
+    LLM calls. Calls already in flight are allowed to finish. An assessment
+    with a deadline is cancelled once the deadline has passed.
+
+    Attributes:
+        stage (str): The name of the current stage.
+        completed (int): The number of items of the current stage that are done.
+        total (int): The number of items of the current stage.
+    """
+
+    def __init__(self):
+        self.stage = "queued"
+        self.completed = 0
+        self.total = 0
+        self._cancelled = threading.Event()
+        self._deadline: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def start_stage(self, stage: str, total: int, completed: int = 0) -> None:
+        """
+        Start a new stage.
+
+        Args:
+            stage (str): The name of the stage.
+            total (int): The number of items of the stage.
+            completed (int): The number of items that are already done, e.g.
+                restored from a checkpoint.
+        """
+        with self._lock:
+            self.stage = stage
+            self.total = total
+            self.completed = completed
+
+    def advance(self, count: int = 1) -> None:
+        """Mark items of the current stage as done."""
+        with self._lock:
+            self.completed += count
+
+    def cancel(self) -> None:
+        """Request the assessment to stop."""
+        self._cancelled.set()
+
+    def set_deadline(self, seconds: float) -> None:
+        """
+        Stop the assessment once a time budget from now has run out.
+
+        Args:
+            seconds (float): The time budget in seconds.
+        """
+        self._deadline = time.monotonic() + seconds
+
+    def get_remaining_seconds(self) -> Optional[float]:
+        """
+        Get the time left before the deadline.
+
+        Returns:
+            Optional[float]: The seconds left, or None if there is no deadline.
+        """
+        if self._deadline is None:
+            return None
+        return max(self._deadline - time.monotonic(), 0.0)
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the assessment was cancelled or ran out of time."""
+        return self._cancelled.is_set() or self.get_remaining_seconds() == 0.0
+
+    def check_cancelled(self) -> None:
+        """
+        Stop the assessment if it was cancelled.
+
+        Raises:
+            AssessmentCancelledError: If the assessment was cancelled.
+            TimeBudgetExceededError: If the deadline has passed.
+        """
+        if self._cancelled.is_set():
+            raise AssessmentCancelledError("The assessment was cancelled")
+        if self.get_remaining_seconds() == 0.0:
+            raise TimeBudgetExceededError("The assessment ran out of its time budget")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Get the progress as a JSON-serializable dictionary.
+
+        Returns:
+            Dict[str, Any]: The stage, completed and total item counts.
+        """
+        with self._lock:
+            return {
+                "stage": self.stage,
+                "completed": self.completed,
+                "total": self.total,
+            }
@@ -0,0 +1,212 @@
+import re
+from typing import Iterable, List, Optional, Tuple
+
+# Approximate number of characters per token of Markdown prose
+README_CHARS_PER_TOKEN = 4
+
+# Token budget of the README excerpt of criteria that name the sections they need
+SECTION_MAX_TOKENS = 3000
+
+# Token budget of the README of criteria that need all of it
+FULL_README_MAX_TOKENS = 8000
+
+# Maximum number of left-out headings listed after an excerpt
+MAX_OMITTED_HEADINGS = 50
+
+# Minimum number of characters of text the introduction of a README spans
+INTRO_MIN_CHARS = 200
+
+ATX_HEADING = re.compile(r"^ {0,3}(#{1,6})\s+(.*?)\s*#*\s*$")
+SETEXT_UNDERLINE = re.compile(r"^ {0,3}(=+|-+)\s*$")
+CODE_FENCE = re.compile(r"^ {0,3}(```|~~~)")
+
+
+class ReadmeSection:
+    """
+    A section of a Markdown document, from its heading to the next heading.
+
+    Attributes:
+        title (str): The heading text.
+        level (int): The heading level, 1 for "#".
+        start (int): The line number of the heading, counted from 0.
+        end (int): The line number after the last line of the section.
+        subtree_end (int): The line number after the last line of its subsections.
+    """
+
+    __slots__ = ("title", "level", "start", "end", "subtree_end")
+
+    def __init__(self, title: str, level: int, start: int):
+        self.title = title
+        self.level = level
+        self.start = start
+        self.end = start
+        self.subtree_end = start
+
+
+def parse_sections(lines: List[str]) -> List[ReadmeSection]:
+    """
+    Find the ATX ("## Usage") and setext (underlined) headings of a Markdown document.
+
+    Headings inside fenced code blocks are ignored.
+
+    Args:
+        lines (List[str]): The lines of the document.
+
+    Returns:
+        List[ReadmeSection]: The sections in document order.
+    """
+    sections: List[ReadmeSection] = []
+    in_code = False
+    for i, line in enumerate(lines):
+        if CODE_FENCE.match(line):
+            in_code = not in_code
+            continue
+        if in_code:
+            continue
+        match = ATX_HEADING.match(line)
+        if match:
+            sections.append(ReadmeSection(match.group(2), len(match.group(1)), i))
+            continue
+        underline = SETEXT_UNDERLINE.match(line)
+        previous = lines[i - 1].strip() if i > 0 else ""
+        if (
+            underline
+            and previous
+            and not ATX_HEADING.match(lines[i - 1])
+            and not previous.startswith(("-", "*", "+", ">", "|"))
+            and not (sections and sections[-1].start == i - 1)
+        ):
+            level = 1 if underline.group(1).startswith("=") else 2
+            sections.append(ReadmeSection(previous, level, i - 1))
+
+    for index, section in enumerate(sections):
+        section.end = sections[index + 1].start if index + 1 < len(sections) else len(lines)
+        section.subtree_end = len(lines)
+        for following in sections[index + 1 :]:
+            if following.level <= section.level:
+                section.subtree_end = following.start
+                break
+    return sections
+
+
+class ReadmeIndex:
+    """
+    An index of the sections of a README, built once per repository.
+
+    Each metadata criterion can then be sent only the README sections it needs,
+    such as the installation sections for the installation criteria, so the
+    prompt size follows what the criterion needs rather than the README length.
+
+    Attributes:
+        lines (List[str]): The lines of the README.
+        sections (List[ReadmeSection]): The sections of the README.
+    """
+
+    def __init__(self, content: str):
+        self.lines = content.splitlines()
+        self.sections = parse_sections(self.lines)
+
+    def get_intro_end(self) -> int:
+        """
+        Get the line number where the introduction (title and summary) ends.
+
+        The introduction ends at the first heading after the title that is preceded
+        by at least `INTRO_MIN_CHARS` characters of text, so a summary under its
+        own heading right below the title is part of it.
+
+        Returns:
+            int: The line number after the last line of the introduction.
+        """
+        num_chars = 0
+        text_start = 0
+        for index, section in enumerate(self.sections):
+            num_chars += sum(
+                len(line.strip()) for line in self.lines[text_start : section.start]
+            )
+            if index > 0 and num_chars >= INTRO_MIN_CHARS:
+                return section.start
+            text_start = section.start + 1
+        return len(self.lines)
+
+    def get_content(self, section_keywords: Optional[Iterable[str]] = None) -> str:
+        """
+        Get the parts of the README relevant to a criterion, within a token budget.
+
+        The introduction, i.e. everything before the second heading, is always
+        included, followed by the sections whose heading contains one of the
+        keywords, with their subsections. The headings of the sections that are
+        left out are listed at the end.
+
+        Args:
+            section_keywords (Optional[Iterable[str]]): Case-insensitive keywords of the
+                section headings the criterion needs. If None, or if no heading
+                matches, the whole README is returned within the full budget.
+
+        Returns:
+            str: The README excerpt.
+        """
+        if section_keywords is None:
+            return self.render([(0, len(self.lines))], FULL_README_MAX_TOKENS)
+
+        keywords = [keyword.lower() for keyword in section_keywords]
+        matched = [
+            section
+            for section in self.sections
+            if any(keyword in section.title.lower() for keyword in keywords)
+        ]
+        if keywords and not matched:
+            return self.render([(0, len(self.lines))], FULL_README_MAX_TOKENS)
+
+        ranges = [(0, self.get_intro_end())]
+        ranges += [(section.start, section.subtree_end) for section in matched]
+        return self.render(ranges, SECTION_MAX_TOKENS)
+
+    def render(self, ranges: List[Tuple[int, int]], max_tokens: int) -> str:
+        """
+        Render line ranges of the README in document order within a token budget.
+
+        Args:
+            ranges (List[Tuple[int, int]]): The line ranges to include, possibly
+                overlapping.
+            max_tokens (int): The approximate token budget.
+
+        Returns:
+            str: The included lines, cut off at the budget, followed by the headings
+            of the sections that were left out.
+        """
+        merged: List[List[int]] = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+
+        max_chars = max_tokens * README_CHARS_PER_TOKEN
+        parts: List[str] = []
+        included: List[Tuple[int, int]] = []
+        num_chars = 0
+        for start, end in merged:
+            text = "\n".join(self.lines[start:end]).strip("\n")
+            if num_chars + len(text) > max_chars:
+                cut = "\n".join(self.lines[start:end])[: max_chars - num_chars]
+                # Cut on a line boundary and mark that the section continues
+                cut_end = start + cut.count("\n")
+                parts.append("\n".join(self.lines[start:cut_end]) + "\n[...]")
+                included.append((start, cut_end))
+                break
+            parts.append(text)
+            included.append((start, end))
+            num_chars += len(text) + 2
+
+        omitted = [
+            "#" * section.level + " " + section.title
+            for section in self.sections
+            if not any(start <= section.start < end for start, end in included)
+        ]
+        if len(omitted) > MAX_OMITTED_HEADINGS:
+            omitted = omitted[:MAX_OMITTED_HEADINGS] + [
+                f"and {len(omitted) - MAX_OMITTED_HEADINGS} more"
+            ]
+        if omitted:
+            parts.append("[Other README sections, not shown: " + "; ".join(omitted) + "]")
+        return "\n\n".join(parts)
@@ -1,10 +1,12 @@
 import os
+import sys
 import subprocess
 import zipfile
 import shutil
 import requests
+from collections import Counter
 from fnmatch import fnmatch
-from typing import Optional, List
+from typing import Any, Callable, Iterator, Optional, List, Tuple
 from logger import get_logger
 
 logger = get_logger(__name__)
@@ -259,56 +261,283 @@ def get_readme_content(repo_path: str) -> Optional[str]:
     return None
 
 
-def get_repo_tree(repo_path: str, ignore_patterns: Optional[List[str]] = None) -> str:
+# Approximate number of characters per token of a rendered tree
+TREE_CHARS_PER_TOKEN = 3
+
+# Default token budget of the directory tree in metadata prompts
+MAX_TREE_TOKENS = 4000
+
+# Directories with at least this many files, mostly of one type, are summarized
+COLLAPSE_MIN_FILES = 20
+COLLAPSE_MIN_SHARE = 0.9
+
+# Directories of source files are listed, within the fan-out limit, not summarized
+SOURCE_EXTENSIONS = (".py", ".ipynb")
+
+# Depth and fan-out limits tried in turn until the tree fits the token budget
+TREE_LIMITS = [(None, 50), (6, 25), (4, 15), (3, 10), (2, 6), (1, 4)]
+
+
+class DirectorySummary:
+    """
+    A scanned directory with the aggregate statistics used to render it.
+
+    Attributes:
+        name (str): The directory name.
+        dirs (List[DirectorySummary]): The subdirectories.
+        files (List[Tuple[str, int]]): The names and sizes of the files.
+        file_count (int): The number of files in the directory and its subdirectories.
+        total_size (int): The total size in bytes of those files.
+        extensions (Counter): The number of those files per extension.
     """
-    Generate a tree-like string representation of the repository structure.
+
+    __slots__ = ("name", "dirs", "files", "file_count", "total_size", "extensions")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.dirs: List["DirectorySummary"] = []
+        self.files: List[Tuple[str, int]] = []
+        self.file_count = 0
+        self.total_size = 0
+        self.extensions: Counter = Counter()
+
+
+def scan_directory(
+    dir_path: str, should_ignore: Callable[[str], bool]
+) -> DirectorySummary:
+    """
+    Scan a directory tree once, collecting file sizes and per-directory totals.
 
     Args:
-        repo_path (str): Path to the repository root
-        ignore_patterns (list, optional): List of patterns to ignore (e.g., ['.git', '__pycache__'])
+        dir_path (str): The directory to scan.
+        should_ignore (Callable[[str], bool]): Whether to skip an entry, given its name.
 
     Returns:
-        str: String representation of the repository tree structure
+        DirectorySummary: The summary of the directory.
     """
-    if ignore_patterns is None:
-        ignore_patterns = [".git", "__pycache__", ".pytest_cache", "*.pyc", ".DS_Store"]
+    summary = DirectorySummary(os.path.basename(dir_path))
+    try:
+        entries = list(os.scandir(dir_path))
+    except OSError as e:
+        logger.warning(f"Cannot list directory {dir_path}: {e}")
+        return summary
+
+    for entry in entries:
+        if should_ignore(entry.name):
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            child = scan_directory(entry.path, should_ignore)
+            summary.dirs.append(child)
+            summary.file_count += child.file_count
+            summary.total_size += child.total_size
+            summary.extensions.update(child.extensions)
+        else:
+            try:
+                size = entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                size = 0
+            summary.files.append((entry.name, size))
+            summary.file_count += 1
+            summary.total_size += size
+            summary.extensions[os.path.splitext(entry.name)[-1].lower()] += 1
+    return summary
+
+
+def format_size(num_bytes: int) -> str:
+    """Format a size in bytes for humans, e.g. 3.1 GB."""
+    size = float(num_bytes)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def describe_files(
+    file_count: int, extensions: Counter, total_size: int, qualifier: str = ""
+) -> str:
+    """Describe a group of files by count, main extension and size."""
+    if file_count == 0:
+        return f"no {qualifier}files"
+    extension, count = extensions.most_common(1)[0]
+    if extension and count >= COLLAPSE_MIN_SHARE * file_count:
+        qualifier += f"{extension} "
+    kind = "file" if file_count == 1 else "files"
+    return f"{file_count:,} {qualifier}{kind}, {format_size(total_size)}"
+
+
+def is_homogeneous(summary: DirectorySummary) -> bool:
+    """Whether a directory holds many non-source files of one type, e.g. a dataset."""
+    if summary.file_count < COLLAPSE_MIN_FILES:
+        return False
+    extension, count = summary.extensions.most_common(1)[0]
+    return (
+        extension not in SOURCE_EXTENSIONS
+        and count >= COLLAPSE_MIN_SHARE * summary.file_count
+    )
 
-    def should_ignore(path):
-        name = os.path.basename(path)
-        return any(fnmatch(name, pattern) for pattern in ignore_patterns)
 
-    def generate_tree(dir_path: str, prefix: str = "") -> str:
-        if not os.path.exists(dir_path):
-            return "Directory not found"
+def iter_tree_lines(
+    root: DirectorySummary, max_depth: Optional[int], max_entries: int
+) -> Iterator[str]:
+    """
+    Render a scanned directory tree line by line.
+
+    Directories of many files of one type are shown as a single summary line,
+    e.g. "data/ — 12,480 .csv files, 3.1 GB". Directories below `max_depth` are
+    summarized the same way, and at most `max_entries` entries of a directory
+    are listed, subdirectories first, followed by a summary of the others.
+
+    Args:
+        root (DirectorySummary): The scanned root directory.
+        max_depth (Optional[int]): The deepest level whose entries are listed, or
+            None for no limit.
+        max_entries (int): The maximum number of entries listed per directory.
+
+    Returns:
+        Iterator[str]: The lines of the tree, starting with the root name.
+    """
+    yield root.name
+    # Each frame holds the remaining entries of a directory being rendered
+    stack = [(iter(select_entries(root, max_entries)), "", 1)]
+    while stack:
+        entries, prefix, depth = stack[-1]
+        item = next(entries, None)
+        if item is None:
+            stack.pop()
+            continue
+        entry, is_last = item
+        connector = "└── " if is_last else "├── "
+        if isinstance(entry, str):
+            yield prefix + connector + entry
+            continue
+        expand = (max_depth is None or depth < max_depth) and not is_homogeneous(entry)
+        if expand or entry.file_count == 0 and not entry.dirs:
+            yield prefix + connector + entry.name
+            if expand:
+                extension = "    " if is_last else "│   "
+                stack.append(
+                    (iter(select_entries(entry, max_entries)), prefix + extension, depth + 1)
+                )
+        else:
+            description = describe_files(
+                entry.file_count, entry.extensions, entry.total_size
+            )
+            yield f"{prefix}{connector}{entry.name}/ — {description}"
+
 
-        output = []
-        entries = os.listdir(dir_path)
-        entries.sort()
+def select_entries(
+    summary: DirectorySummary, max_entries: int
+) -> List[Tuple[Any, bool]]:
+    """
+    Choose the entries of a directory to list.
 
-        # Filter out ignored patterns
-        entries = [e for e in entries if not should_ignore(os.path.join(dir_path, e))]
+    Args:
+        summary (DirectorySummary): The directory.
+        max_entries (int): The maximum number of entries to list.
 
-        for i, entry in enumerate(entries):
-            path = os.path.join(dir_path, entry)
-            is_last = i == len(entries) - 1
+    Returns:
+        List[Tuple[Any, bool]]: The listed entries in name order, each a
+        DirectorySummary or a line of text, with whether it is the last one.
+    """
+    dirs = sorted(summary.dirs, key=lambda d: d.name)
+    files = sorted(summary.files)
+    if len(dirs) + len(files) <= max_entries:
+        shown_dirs, shown_files = dirs, files
+    else:
+        # Keep one slot for the summary of the entries that are left out
+        shown_dirs = dirs[: max_entries - 1]
+        shown_files = files[: max(0, max_entries - 1 - len(shown_dirs))]
+
+    listed: List[Any] = sorted(
+        [(d.name, d) for d in shown_dirs] + [(name, name) for name, _ in shown_files],
+        key=lambda pair: pair[0],
+    )
+    listed = [entry for _, entry in listed]
+
+    hidden_dirs = dirs[len(shown_dirs) :]
+    hidden_files = files[len(shown_files) :]
+    if hidden_dirs or hidden_files:
+        extensions = Counter(os.path.splitext(name)[-1].lower() for name, _ in hidden_files)
+        file_count = len(hidden_files)
+        total_size = sum(size for _, size in hidden_files)
+        for hidden_dir in hidden_dirs:
+            extensions.update(hidden_dir.extensions)
+            file_count += hidden_dir.file_count
+            total_size += hidden_dir.total_size
+        description = describe_files(file_count, extensions, total_size, "more ")
+        if hidden_dirs:
+            description = f"{len(hidden_dirs):,} more directories with {description}"
+        listed.append(f"… {description}")
+
+    return [(entry, i == len(listed) - 1) for i, entry in enumerate(listed)]
+
+
+def render_tree_within_budget(root: DirectorySummary, max_tokens: Optional[int]) -> str:
+    """
+    Render a scanned tree, tightening the depth and fan-out limits until it fits.
 
-            # Create the appropriate prefix for the current item
-            current_prefix = "└── " if is_last else "├── "
+    Each attempt renders the tree in a single pass and stops as soon as it goes
+    over the budget. If even the tightest limits do not fit, the tree is cut off.
 
-            # Add the current entry to the output
-            output.append(prefix + current_prefix + entry)
+    Args:
+        root (DirectorySummary): The scanned root directory.
+        max_tokens (Optional[int]): The approximate token budget, or None to list
+            every entry at every depth.
 
-            # If it's a directory, recursively process its contents
-            if os.path.isdir(path):
-                # Extend prefix for nested items
-                extension = "    " if is_last else "│   "
-                output.append(generate_tree(path, prefix + extension))
+    Returns:
+        str: The rendered tree.
+    """
+    if max_tokens is None:
+        return "\n".join(iter_tree_lines(root, None, sys.maxsize))
+
+    max_chars = max_tokens * TREE_CHARS_PER_TOKEN
+    for max_depth, max_entries in TREE_LIMITS:
+        lines, num_chars = [], 0
+        for line in iter_tree_lines(root, max_depth, max_entries):
+            num_chars += len(line) + 1
+            if num_chars > max_chars:
+                break
+            lines.append(line)
+        else:
+            return "\n".join(lines)
+
+    logger.warning(f"Directory tree of {root.name} cut off at {max_tokens} tokens")
+    return "\n".join(lines + ["… (tree truncated)"])
+
+
+def get_repo_tree(
+    repo_path: str,
+    ignore_patterns: Optional[List[str]] = None,
+    max_tokens: Optional[int] = MAX_TREE_TOKENS,
+) -> str:
+    """
+    Generate a tree-like string representation of the repository structure.
+
+    Large directories of files of one type, such as datasets, are summarized
+    on one line, and the depth and number of entries per directory are limited
+    so the tree fits in `max_tokens` tokens.
+
+    Args:
+        repo_path (str): Path to the repository root
+        ignore_patterns (list, optional): List of patterns to ignore (e.g., ['.git', '__pycache__'])
+        max_tokens (int, optional): Approximate token budget of the tree, or None for no limit
+
+    Returns:
+        str: String representation of the repository tree structure
+    """
+    if ignore_patterns is None:
+        ignore_patterns = [".git", "__pycache__", ".pytest_cache", "*.pyc", ".DS_Store"]
+
+    def should_ignore(name: str) -> bool:
+        return any(fnmatch(name, pattern) for pattern in ignore_patterns)
 
-        return "\n".join(filter(None, output))
+    if not os.path.isdir(repo_path):
+        return f"{os.path.basename(repo_path)}\nDirectory not found"
 
     try:
-        tree_structure = generate_tree(repo_path)
-        return f"{os.path.basename(repo_path)}\n{tree_structure}"
+        root = scan_directory(repo_path, should_ignore)
+        return render_tree_within_budget(root, max_tokens)
     except Exception as e:
         logger.error(f"Error generating repository tree: {str(e)}")
         return ""
@@ -0,0 +1,190 @@
+import os
+from urllib.parse import quote
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
+from logger import get_logger
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = get_logger(__name__)
+
+FILE_SCORES_TABLE = "file_scores"
+CRITERION_SCORES_TABLE = "criterion_scores"
+PARTITION_COLUMNS = ("run_id", "repo")
+
+
+def get_file_score_rows(file_scores: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """
+    Flatten file scores into columns with one row per file and criterion.
+
+    Args:
+        file_scores (List[Dict[str, Any]]): The file scores, as in `file_scores.json`.
+
+    Returns:
+        Dict[str, List[Any]]: The file_path, extension, criterion_id, score and
+        explanation columns.
+    """
+    columns: Dict[str, List[Any]] = {
+        "file_path": [],
+        "extension": [],
+        "criterion_id": [],
+        "score": [],
+        "explanation": [],
+    }
+    for file_score in file_scores:
+        file_path = file_score.get("file_path", "")
+        extension = os.path.splitext(file_path)[-1].lower()
+        for criterion_id, score in file_score.get("scores", {}).items():
+            columns["file_path"].append(file_path)
+            columns["extension"].append(extension)
+            columns["criterion_id"].append(criterion_id)
+            columns["score"].append(int(score["score"]))
+            columns["explanation"].append(score.get("explanation", ""))
+    return columns
+
+
+def get_criterion_score_rows(results: Dict[str, Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """
+    Flatten assessment results into columns with one row per criterion.
+
+    Args:
+        results (Dict[str, Dict[str, Any]]): The assessment results keyed by criterion ID.
+
+    Returns:
+        Dict[str, List[Any]]: The criterion_id, score and explanation columns.
+    """
+    columns: Dict[str, List[Any]] = {"criterion_id": [], "score": [], "explanation": []}
+    for criterion_id, result in results.items():
+        columns["criterion_id"].append(criterion_id)
+        columns["score"].append(int(result["score"]))
+        columns["explanation"].append(result.get("explanation", ""))
+    return columns
+
+
+def get_partition_dir(store_dir: str, table: str, run_id: str, repo: str) -> str:
+    """Get the directory of one run and repository partition of a table."""
+    return os.path.join(
+        store_dir, table, f"run_id={quote(run_id, safe='')}", f"repo={quote(repo, safe='')}"
+    )
+
+
+def write_table(
+    store_dir: str, table: str, run_id: str, repo: str, columns: Dict[str, List[Any]]
+) -> str:
+    """
+    Write the rows of one run and repository to a table partition.
+
+    An existing partition is replaced, so re-running or resuming an assessment
+    with the same run ID does not duplicate rows.
+
+    Args:
+        store_dir (str): The root directory of the results store.
+        table (str): The table name.
+        run_id (str): The run identifier.
+        repo (str): The repository name.
+        columns (Dict[str, List[Any]]): The column values.
+
+    Returns:
+        str: The path of the written Parquet file.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema(
+        [(name, pa.int8() if name == "score" else pa.string()) for name in columns]
+    )
+    partition_dir = get_partition_dir(store_dir, table, run_id, repo)
+    os.makedirs(partition_dir, exist_ok=True)
+    file_path = os.path.join(partition_dir, "part-0.parquet")
+    # Dot-prefixed files are ignored by readers until the write is complete
+    temp_path = os.path.join(partition_dir, f".part-0.{os.getpid()}.tmp")
+    pq.write_table(pa.table(columns, schema=schema), temp_path, compression="zstd")
+    os.replace(temp_path, file_path)
+    return file_path
+
+
+def write_results(
+    store_dir: str,
+    run_id: str,
+    repo: str,
+    results: Dict[str, Dict[str, Any]],
+    file_scores: List[Dict[str, Any]],
+) -> None:
+    """
+    Append the criterion and file scores of one assessment to the results store.
+
+    The store holds a `criterion_scores` and a `file_scores` Parquet table, each
+    partitioned by `run_id` and `repo` in Hive layout
+    (`<table>/run_id=<run_id>/repo=<repo>/part-0.parquet`).
+
+    Args:
+        store_dir (str): The root directory of the results store.
+        run_id (str): The run identifier.
+        repo (str): The repository name.
+        results (Dict[str, Dict[str, Any]]): The assessment results keyed by criterion ID.
+        file_scores (List[Dict[str, Any]]): The file scores.
+    """
+    write_table(
+        store_dir, CRITERION_SCORES_TABLE, run_id, repo, get_criterion_score_rows(results)
+    )
+    write_table(
+        store_dir, FILE_SCORES_TABLE, run_id, repo, get_file_score_rows(file_scores)
+    )
+    logger.info(f"Wrote scores of {repo} to the results store at {store_dir}")
+
+
+def query_results(
+    store_dir: str,
+    table: str = CRITERION_SCORES_TABLE,
+    run_ids: Optional[Iterable[str]] = None,
+    repos: Optional[Iterable[str]] = None,
+    criterion_ids: Optional[Iterable[str]] = None,
+    columns: Optional[List[str]] = None,
+) -> "pd.DataFrame":
+    """
+    Load scores from the results store into a DataFrame.
+
+    Filters on the partition columns only read the matching partitions, so
+    querying a few runs or repositories out of thousands stays fast.
+
+    Args:
+        store_dir (str): The root directory of the results store.
+        table (str): `criterion_scores` or `file_scores`.
+        run_ids (Optional[Iterable[str]]): The runs to load. All runs if not given.
+        repos (Optional[Iterable[str]]): The repositories to load. All if not given.
+        criterion_ids (Optional[Iterable[str]]): The criteria to load. All if not given.
+        columns (Optional[List[str]]): The columns to load. All if not given.
+
+    Returns:
+        pd.DataFrame: The matching rows, with `run_id` and `repo` columns. Empty if
+        the table does not exist yet.
+    """
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    table_dir = os.path.join(store_dir, table)
+    if not os.path.isdir(table_dir):
+        return pd.DataFrame(columns=columns or list(PARTITION_COLUMNS))
+
+    dataset = ds.dataset(
+        table_dir,
+        format="parquet",
+        partitioning=ds.partitioning(
+            pa.schema([(name, pa.string()) for name in PARTITION_COLUMNS]),
+            flavor="hive",
+        ),
+    )
+    filters = [
+        ds.field(name).isin(list(values))
+        for name, values in (
+            ("run_id", run_ids),
+            ("repo", repos),
+            ("criterion_id", criterion_ids),
+        )
+        if values is not None
+    ]
+    expression = None
+    for condition in filters:
+        expression = condition if expression is None else expression & condition
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
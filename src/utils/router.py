@@ -0,0 +1,454 @@
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, TYPE_CHECKING
+from logger import get_logger
+from metrics import MetricsCollector, percentile
+from utils.llm import get_llm, get_llm_cost, is_llm_available
+from utils.progress import AssessmentCancelledError
+from utils.key_pool import is_quota_error
+from utils.call_policy import CallTimeoutError
+
+if TYPE_CHECKING:
+    from utils.call_policy import CallPolicy
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.runnables import Runnable
+
+logger = get_logger(__name__)
+
+FAST_ROUTE = "fast"
+STRONG_ROUTE = "strong"
+
+DEFAULT_ROUTING_CONFIG: Dict[str, Any] = {
+    "routes": {
+        FAST_ROUTE: {
+            "models": ["gpt-4o-mini", "llama-3.1-8b-instant", "gemini-1.5-flash"],
+            "max_concurrency": 8,
+            "escalate_to": STRONG_ROUTE,
+        },
+        STRONG_ROUTE: {
+            "models": ["gpt-4o", "gemini-1.5-pro", "gpt-4.1-mini"],
+            "max_concurrency": 2,
+        },
+    },
+    "model_max_concurrency": {},
+    "max_fast_file_tokens": 4000,
+    "strong_file_extensions": [],
+    "strong_criteria": [],
+    "cooldown_seconds": 30,
+}
+
+
+class AllModelsFailedError(RuntimeError):
+    """Raised when no model of a route (or its escalation route) returned a response."""
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """
+    Check whether an exception signals that a provider is rate limiting or overloaded.
+
+    Args:
+        exc (BaseException): The exception raised by an LLM call.
+
+    Returns:
+        bool: True for HTTP 429/5xx responses and provider rate-limit errors.
+    """
+    status_code = getattr(exc, "status_code", None) or getattr(
+        getattr(exc, "response", None), "status_code", None
+    )
+    if isinstance(status_code, int) and status_code >= 500:
+        return True
+    return is_quota_error(exc)
+
+
+class Route:
+    """
+    A named group of interchangeable models, tried in order of preference.
+
+    Attributes:
+        name (str): The name of the route, e.g. "fast" or "strong".
+        models (List[str]): Model IDs in fallback order.
+        max_concurrency (int): Maximum number of in-flight calls on this route.
+        escalate_to (Optional[str]): Route to retry on when every model fails.
+        metrics (MetricsCollector): Latency and token usage of calls on this route.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        models: List[str],
+        max_concurrency: int,
+        escalate_to: Optional[str] = None,
+    ):
+        self.name = name
+        self.models = models
+        self.max_concurrency = max_concurrency
+        self.escalate_to = escalate_to
+        self.metrics = MetricsCollector(name)
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.escalations = 0
+        self._lock = threading.Lock()
+
+    def record_call(self, latency: float, error: bool) -> None:
+        """Record the latency and outcome of a call made on this route."""
+        with self._lock:
+            self.latencies.append(latency)
+            self.errors += int(error)
+
+
+class ModelRouter:
+    """
+    Routes scoring calls to a fast or strong model based on cost and difficulty.
+
+    Small files and cheap criteria go to the fast route and large files or
+    configured criteria to the strong route. Each route caps its in-flight calls,
+    each model can cap its own concurrency, and a model that is saturated, rate
+    limited or failing is skipped in favour of the next provider on the route.
+
+    Attributes:
+        routes (Dict[str, Route]): The configured routes by name.
+        max_fast_file_tokens (int): Files above this token count use the strong route.
+        strong_file_extensions (List[str]): Extensions always scored on the strong route.
+        strong_criteria (List[str]): Metadata criteria always scored on the strong route.
+        cooldown_seconds (float): How long a rate-limited model is skipped for.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        config = {**DEFAULT_ROUTING_CONFIG, **(config or {})}
+        self.routes: Dict[str, Route] = {}
+        for name, route_config in config["routes"].items():
+            models = [m for m in route_config["models"] if is_llm_available(m)]
+            if not models:
+                logger.warning(f"No available models for route '{name}', skipping it")
+                continue
+            self.routes[name] = Route(
+                name,
+                models=models,
+                max_concurrency=route_config.get("max_concurrency", 4),
+                escalate_to=route_config.get("escalate_to"),
+            )
+        if not self.routes:
+            raise ValueError("No routes have an available model")
+
+        self.max_fast_file_tokens = config["max_fast_file_tokens"]
+        self.strong_file_extensions = config["strong_file_extensions"]
+        self.strong_criteria = config["strong_criteria"]
+        self.cooldown_seconds = config["cooldown_seconds"]
+
+        self._model_semaphores = {
+            model: threading.BoundedSemaphore(limit)
+            for model, limit in config["model_max_concurrency"].items()
+        }
+        self._cooldown_until: Dict[str, float] = {}
+        self._llms: Dict[str, "BaseChatModel"] = {}
+        self._runnables: Dict[tuple, "Runnable"] = {}
+        self._lock = threading.Lock()
+
+    def _resolve(self, route_name: str) -> str:
+        """Fall back to any configured route if the requested one has no models."""
+        if route_name in self.routes:
+            return route_name
+        return next(iter(self.routes))
+
+    def get_config_id(self) -> str:
+        """
+        Identify the models and thresholds files are routed with.
+
+        Returns:
+            str: The route models, file token threshold and strong extensions.
+        """
+        routes = ";".join(
+            f"{name}={','.join(route.models)}" for name, route in sorted(self.routes.items())
+        )
+        extensions = ",".join(sorted(self.strong_file_extensions))
+        return f"routing:{routes}:{self.max_fast_file_tokens}:{extensions}"
+
+    def route_file(self, file_tokens: int, file_extension: str) -> str:
+        """
+        Choose the route for scoring a file.
+
+        Args:
+            file_tokens (int): The number of tokens in the file.
+            file_extension (str): The file extension.
+
+        Returns:
+            str: The name of the route.
+        """
+        if (
+            file_tokens > self.max_fast_file_tokens
+            or file_extension in self.strong_file_extensions
+        ):
+            return self._resolve(STRONG_ROUTE)
+        return self._resolve(FAST_ROUTE)
+
+    def route_criterion(self, criterion_id: str) -> str:
+        """
+        Choose the route for scoring a metadata criterion.
+
+        Args:
+            criterion_id (str): The ID of the criterion.
+
+        Returns:
+            str: The name of the route.
+        """
+        if criterion_id in self.strong_criteria:
+            return self._resolve(STRONG_ROUTE)
+        return self._resolve(FAST_ROUTE)
+
+    def _get_runnable(
+        self,
+        model: str,
+        cache_key: str,
+        build_runnable: Callable[["BaseChatModel"], "Runnable"],
+    ) -> "Runnable":
+        key = (model, cache_key)
+        runnable = self._runnables.get(key)
+        if runnable is None:
+            with self._lock:
+                if model not in self._llms:
+                    self._llms[model] = get_llm(model)
+                runnable = self._runnables.get(key)
+                if runnable is None:
+                    runnable = build_runnable(self._llms[model])
+                    self._runnables[key] = runnable
+        return runnable
+
+    def _get_alternate(
+        self,
+        route: Route,
+        model: str,
+        cache_key: str,
+        build_runnable: Callable[["BaseChatModel"], "Runnable"],
+    ) -> Optional["Runnable"]:
+        """Get the runnable of the next model of a route that is not cooling down."""
+        index = route.models.index(model)
+        for alternate in route.models[index + 1 :] + route.models[:index]:
+            if time.monotonic() >= self._cooldown_until.get(alternate, 0):
+                return self._get_runnable(alternate, cache_key, build_runnable)
+        return None
+
+    def _acquire_model(self, model: str, blocking: bool) -> bool:
+        if time.monotonic() < self._cooldown_until.get(model, 0) and not blocking:
+            return False
+        semaphore = self._model_semaphores.get(model)
+        if semaphore is None:
+            return True
+        return semaphore.acquire(blocking=blocking)
+
+    def _release_model(self, model: str) -> None:
+        semaphore = self._model_semaphores.get(model)
+        if semaphore is not None:
+            semaphore.release()
+
+    def invoke(
+        self,
+        route_name: str,
+        input: Any,
+        build_runnable: Callable[["BaseChatModel"], "Runnable"],
+        cache_key: str = "",
+        config: Optional[Dict[str, Any]] = None,
+        call_policy: Optional["CallPolicy"] = None,
+    ) -> Any:
+        """
+        Invoke a runnable on the best available model of a route.
+
+        Models are tried in order. One that is cooling down after a rate limit,
+        or already at its concurrency limit, is skipped while another model has
+        capacity. If every model fails, the call is escalated to the route's
+        `escalate_to` route.
+
+        Args:
+            route_name (str): The route to send the call to.
+            input (Any): The input passed to the runnable.
+            build_runnable (Callable): Builds the runnable from a model, e.g. by
+                binding a structured output schema.
+            cache_key (str): Identifies the runnable built by `build_runnable`, so it
+                is only built once per model.
+            config (Optional[Dict[str, Any]]): The runnable config, e.g. callbacks.
+            call_policy (Optional[CallPolicy]): The deadline and hedging of each call.
+                A call is hedged on the next model of the route. A model whose
+                call times out is treated as failed.
+
+        Returns:
+            Any: The output of the runnable.
+
+        Raises:
+            AllModelsFailedError: If no model on the route or its escalation routes succeeded.
+            CallTimeoutError: If every model tried timed out.
+        """
+        visited = set()
+        route: Optional[Route] = self.routes[self._resolve(route_name)]
+        last_error: Optional[BaseException] = None
+        timed_out = True
+
+        while route is not None and route.name not in visited:
+            visited.add(route.name)
+            try:
+                return self._invoke_route(
+                    route, input, build_runnable, cache_key, config, call_policy
+                )
+            except (AllModelsFailedError, CallTimeoutError) as exc:
+                last_error = exc
+                timed_out = timed_out and isinstance(exc, CallTimeoutError)
+            next_route = self.routes.get(route.escalate_to or "")
+            if next_route is not None and next_route.name not in visited:
+                logger.warning(
+                    f"Escalating call from route '{route.name}' to '{next_route.name}'"
+                )
+                with route._lock:
+                    route.escalations += 1
+            route = next_route
+
+        if timed_out:
+            raise CallTimeoutError(str(last_error))
+        raise AllModelsFailedError(str(last_error))
+
+    def batch(
+        self,
+        route_name: str,
+        inputs: List[Any],
+        build_runnable: Callable[["BaseChatModel"], "Runnable"],
+        cache_key: str = "",
+        config: Optional[Dict[str, Any]] = None,
+        call_policy: Optional["CallPolicy"] = None,
+    ) -> List[Any]:
+        """
+        Invoke a runnable on several inputs concurrently, routing each call separately.
+
+        Concurrency is bounded by the route's `max_concurrency`, and every input
+        can fall back or escalate independently.
+
+        Args:
+            route_name (str): The route to send the calls to.
+            inputs (List[Any]): The inputs passed to the runnable.
+            build_runnable (Callable): Builds the runnable from a model.
+            cache_key (str): Identifies the runnable built by `build_runnable`.
+            config (Optional[Dict[str, Any]]): The runnable config, e.g. callbacks.
+            call_policy (Optional[CallPolicy]): The deadline and hedging of each call.
+
+        Returns:
+            List[Any]: The outputs, in the order of the inputs.
+
+        Raises:
+            AllModelsFailedError: If any input could not be processed by any model.
+        """
+        if len(inputs) == 1:
+            return [
+                self.invoke(
+                    route_name, inputs[0], build_runnable, cache_key, config, call_policy
+                )
+            ]
+        route = self.routes[self._resolve(route_name)]
+        with ThreadPoolExecutor(
+            max_workers=min(len(inputs), route.max_concurrency)
+        ) as executor:
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run,
+                    self.invoke,
+                    route_name,
+                    input,
+                    build_runnable,
+                    cache_key,
+                    config,
+                    call_policy,
+                )
+                for input in inputs
+            ]
+            return [future.result() for future in futures]
+
+    def _invoke_route(
+        self,
+        route: Route,
+        input: Any,
+        build_runnable: Callable[["BaseChatModel"], "Runnable"],
+        cache_key: str,
+        config: Optional[Dict[str, Any]],
+        call_policy: Optional["CallPolicy"] = None,
+    ) -> Any:
+        config = dict(config or {})
+        config["callbacks"] = list(config.get("callbacks") or []) + [
+            route.metrics.callback_handler
+        ]
+
+        tried = set()
+        last_error: Optional[BaseException] = None
+        timed_out = True
+        with route.semaphore:
+            # The first pass skips saturated models, the second waits for them
+            for blocking in (False, True):
+                for model in route.models:
+                    if model in tried or not self._acquire_model(model, blocking):
+                        continue
+                    tried.add(model)
+                    start = time.perf_counter()
+                    try:
+                        runnable = self._get_runnable(model, cache_key, build_runnable)
+                        if call_policy is None:
+                            result = runnable.invoke(input, config=config)
+                        else:
+                            alternate = self._get_alternate(
+                                route, model, cache_key, build_runnable
+                            )
+                            result = call_policy.invoke(runnable, input, config, alternate)
+                        route.record_call(time.perf_counter() - start, error=False)
+                        return result
+                    except AssessmentCancelledError:
+                        raise
+                    except Exception as exc:
+                        route.record_call(time.perf_counter() - start, error=True)
+                        last_error = exc
+                        timed_out = timed_out and isinstance(exc, CallTimeoutError)
+                        if is_rate_limit_error(exc):
+                            self._cooldown_until[model] = (
+                                time.monotonic() + self.cooldown_seconds
+                            )
+                        logger.warning(
+                            f"Model {model} failed on route '{route.name}': {exc}"
+                        )
+                    finally:
+                        self._release_model(model)
+
+        message = f"All models failed on route '{route.name}': {last_error}"
+        if timed_out and last_error is not None:
+            # Left to the caller, which skips calls that time out
+            raise CallTimeoutError(message)
+        raise AllModelsFailedError(message)
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Summarize the latency, token usage and cost of each route.
+
+        Returns:
+            Dict[str, Any]: Per-route call counts, latency percentiles, tokens and
+            estimated cost in USD.
+        """
+        report = {}
+        for name, route in self.routes.items():
+            summary = route.metrics.summary()
+            by_model = summary["llm"]["by_model"]
+            cost = sum(
+                get_llm_cost(
+                    model_name,
+                    usage.get("prompt_tokens", 0),
+                    usage.get("completion_tokens", 0),
+                )
+                for model_name, usage in by_model.items()
+            )
+            report[name] = {
+                "models": route.models,
+                "calls": len(route.latencies),
+                "errors": route.errors,
+                "escalations": route.escalations,
+                "latency_p50_s": round(percentile(route.latencies, 50), 6),
+                "latency_p95_s": round(percentile(route.latencies, 95), 6),
+                "latency_p99_s": round(percentile(route.latencies, 99), 6),
+                "prompt_tokens": summary["llm"]["prompt_tokens"],
+                "completion_tokens": summary["llm"]["completion_tokens"],
+                "cost_usd": round(cost, 6),
+                "by_model": by_model,
+            }
+        return report
@@ -0,0 +1,118 @@
+import os
+import json
+import random
+import pytest
+from typing import List
+
+# Repository sizes to benchmark, e.g. BENCHMARK_REPO_SIZES=10,1000,50000
+BENCHMARK_REPO_SIZES = [
+    int(size) for size in os.environ.get("BENCHMARK_REPO_SIZES", "10").split(",")
+]
+
+PYTHON_TEMPLATE = '''import logging
+import random
+
+logger = logging.getLogger(__name__)
+
+
+def load_data_{index}(path: str) -> list:
+    """Load the rows of a data file."""
+    try:
+        with open(path) as f:
+            return f.readlines()
+    except OSError as exc:
+        logger.error(exc)
+        return []
+
+
+class Model{index}:
+    """A toy model."""
+
+    def __init__(self, seed: int = {index}):
+        random.seed(seed)
+        self.weights = [random.random() for _ in range(10)]
+
+    def predict(self, x: float) -> float:
+        return sum(w * x for w in self.weights)
+'''
+
+NOTEBOOK_TEMPLATE = {
+    "cells": [
+        {
+            "cell_type": "markdown",
+            "metadata": {},
+            "source": ["# Experiment {index}\n", "Explore the data."],
+        },
+        {
+            "cell_type": "code",
+            "execution_count": None,
+            "metadata": {},
+            "outputs": [],
+            "source": ["import pandas as pd\n", "df = pd.DataFrame({'a': [1, 2, 3]})"],
+        },
+    ],
+    "metadata": {},
+    "nbformat": 4,
+    "nbformat_minor": 5,
+}
+
+
+def write_synthetic_file(path: str, index: int) -> None:
+    """Write a small file whose content depends on its extension"""
+    ext = os.path.splitext(path)[-1]
+    with open(path, "w") as f:
+        if ext == ".py":
+            f.write(PYTHON_TEMPLATE.format(index=index))
+        elif ext == ".ipynb":
+            notebook = json.loads(
+                json.dumps(NOTEBOOK_TEMPLATE).replace("{index}", str(index))
+            )
+            json.dump(notebook, f)
+        elif ext == ".json":
+            json.dump({"name": f"config-{index}", "learning_rate": 0.01}, f)
+        elif ext == ".yaml":
+            f.write(f"name: config-{index}\nepochs: 10\n")
+        else:
+            f.write(f"# Document {index}\n\nSome notes about component {index}.\n")
+
+
+def make_synthetic_repo(root: str, num_files: int, seed: int = 0) -> str:
+    """
+    Create a synthetic repository with a realistic mix of tracked files.
+
+    Args:
+        root (str): The directory to create the repository in.
+        num_files (int): The number of tracked files to create.
+        seed (int): The seed for the file layout.
+
+    Returns:
+        str: The path to the repository.
+    """
+    rng = random.Random(seed)
+    extensions: List[str] = [".py"] * 6 + [".ipynb", ".md", ".yaml", ".json"]
+    folders = ["src", "src/models", "src/data", "notebooks", "tests", "configs", "docs"]
+
+    with open(os.path.join(root, "README.md"), "w") as f:
+        f.write("# Synthetic Repository\n\n## Installation\n\npip install .\n")
+    with open(os.path.join(root, "LICENSE"), "w") as f:
+        f.write("MIT License\n")
+    with open(os.path.join(root, "requirements.txt"), "w") as f:
+        f.write("pandas\n")
+
+    for index in range(num_files - 2):
+        # Spread files over nested sub-packages of at most 100 files each
+        folder = os.path.join(
+            root, rng.choice(folders), f"package_{index // 100}"
+        )
+        os.makedirs(folder, exist_ok=True)
+        ext = rng.choice(extensions)
+        write_synthetic_file(os.path.join(folder, f"file_{index}{ext}"), index)
+
+    return root
+
+
+@pytest.fixture(scope="module", params=BENCHMARK_REPO_SIZES, ids=lambda n: f"{n}_files")
+def synthetic_repo(request, tmp_path_factory) -> str:
+    """Create a synthetic repository once per benchmarked size"""
+    repo_dir = tmp_path_factory.mktemp(f"synthetic_repo_{request.param}")
+    return make_synthetic_repo(str(repo_dir), request.param)
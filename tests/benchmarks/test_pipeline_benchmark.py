@@ -0,0 +1,95 @@
+import os
+import resource
+import pytest
+from typing import Any, Dict
+
+pytest.importorskip("pytest_benchmark")
+
+pytestmark = pytest.mark.pipeline_benchmark
+
+import main
+from config import paths
+from generators import get_aggregation_logic
+from utils.llm import FAKE_LLM, get_llm, llms
+from utils.general import read_yaml_file
+from utils.fake_llm import FakeScoringChatModel
+from directory_scorer.content_based_scorer import score_directory_based_on_files
+
+
+def get_peak_rss_mb() -> float:
+    """Get the peak resident set size of the benchmark process in megabytes"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def record_run_info(benchmark, llm: FakeScoringChatModel, rounds: int) -> None:
+    """Attach per-run call and memory figures to the benchmark results"""
+    stats = llm.stats
+    extra_info: Dict[str, Any] = benchmark.extra_info
+    extra_info["llm_calls"] = stats.calls // rounds
+    extra_info["llm_errors"] = stats.errors // rounds
+    extra_info["input_tokens"] = stats.input_tokens // rounds
+    extra_info["output_tokens"] = stats.output_tokens // rounds
+    extra_info["peak_rss_mb"] = round(get_peak_rss_mb(), 1)
+
+
+def get_rounds(repo_path: str) -> int:
+    """Repeat small benchmarks for stable timings, run large ones once"""
+    num_files = sum(len(files) for _, _, files in os.walk(repo_path))
+    return 3 if num_files <= 100 else 1
+
+
+def test_score_directory_based_on_files(
+    benchmark, synthetic_repo: str
+) -> None:
+    """Benchmark file-content scoring of a synthetic repository"""
+    llm = FakeScoringChatModel(error_rate=0.01)
+    aggregation_logic = get_aggregation_logic()
+    rounds = get_rounds(synthetic_repo)
+
+    dir_score, file_scores = benchmark.pedantic(
+        score_directory_based_on_files,
+        args=(synthetic_repo,),
+        kwargs={
+            "llm": llm,
+            "aggregation_logic": aggregation_logic,
+            "max_workers": 8,
+        },
+        rounds=rounds,
+        iterations=1,
+    )
+
+    record_run_info(benchmark, llm, rounds)
+    assert dir_score
+    assert file_scores
+
+
+def test_main_flow(
+    benchmark, synthetic_repo: str, tmp_path, monkeypatch
+) -> None:
+    """Benchmark the full assessment of a synthetic repository with the fake LLM"""
+    inputs_dir = os.path.dirname(synthetic_repo)
+    monkeypatch.setattr(paths, "INPUTS_DIR", inputs_dir)
+    monkeypatch.setattr(paths, "OUTPUTS_DIR", str(tmp_path))
+
+    prompt_template = read_yaml_file(paths.PROMPTS_FPATH)["scoring_v0"]
+    get_llm(FAKE_LLM)
+    llm = llms[FAKE_LLM]
+    llm.stats.reset()
+    rounds = get_rounds(synthetic_repo)
+
+    results = benchmark.pedantic(
+        main.assess_project,
+        args=(synthetic_repo,),
+        kwargs={
+            "llm_name": FAKE_LLM,
+            "prompt_template": prompt_template,
+            "max_workers": 8,
+        },
+        rounds=rounds,
+        iterations=1,
+    )
+
+    record_run_info(benchmark, llm, rounds)
+    output_dir = os.path.join(str(tmp_path), os.path.basename(synthetic_repo))
+    assert os.path.exists(os.path.join(output_dir, "report.md"))
+    assert results
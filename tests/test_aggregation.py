@@ -0,0 +1,62 @@
+from src.directory_scorer.aggregation import StreamingAggregator
+from src.directory_scorer.content_based_scorer import combine_scores
+
+
+def file_score(file_path: str, **scores: int) -> dict:
+    return {
+        "file_path": file_path,
+        "scores": {
+            criterion: {"score": score, "explanation": f"{criterion} in {file_path}"}
+            for criterion, score in scores.items()
+        },
+    }
+
+
+def test_aggregator_decides_satisfied_or_and_failed_and() -> None:
+    """Test that OR criteria are decided on success and AND criteria on failure"""
+    aggregator = StreamingAggregator({"any": "OR", "all": "AND"})
+    aggregator.add(file_score("a.py", any=0, all=1))
+    assert aggregator.get_decided_criteria() == frozenset()
+
+    aggregator.add(file_score("b.py", any=1, all=1))
+    assert aggregator.get_decided_criteria() == {"any"}
+
+    aggregator.add(file_score("c.py", any=0, all=0))
+    assert aggregator.get_decided_criteria() == {"any", "all"}
+
+
+def test_combine_scores() -> None:
+    """Test OR and AND aggregation, including truncated failure explanations"""
+    file_scores = [file_score(f"f{i}.py", any=int(i == 2), all=int(i < 1)) for i in range(6)]
+    combined = combine_scores(file_scores, {"any": "OR", "all": "AND"})
+
+    assert combined["any"] == {
+        "score": 1,
+        "explanation": "This criterion is satisfied in the project by file 'f2.py'. any in f2.py",
+    }
+    assert combined["all"]["score"] == 0
+    assert combined["all"]["explanation"] == (
+        "This criterion is not consistently satisfied. Issues include: "
+        "f1.py: all in f1.py; f2.py: all in f2.py; f3.py: all in f3.py and 2 more issues."
+    )
+
+    combined = combine_scores([file_score("a.py", any=0, all=1)], {"all": "AND"})
+    assert combined["any"]["explanation"] == "Not satisfied by any files in the project."
+    assert combined["all"]["score"] == 1
+
+
+def test_merge_state_matches_adding_files() -> None:
+    """Test that merging the aggregate of some files equals adding them one by one"""
+    logic = {"any": "OR", "all": "AND"}
+    file_scores = [file_score(f"f{i}.py", any=int(i == 4), all=int(i % 2)) for i in range(6)]
+
+    part = StreamingAggregator(logic)
+    for score in file_scores[3:]:
+        part.add(score)
+    merged = StreamingAggregator(logic)
+    for score in file_scores[:3]:
+        merged.add(score)
+    merged.merge_state(part.get_state())
+
+    assert merged.result() == combine_scores(file_scores, logic)
+    assert merged.get_decided_criteria() == {"any", "all"}
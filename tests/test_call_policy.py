@@ -0,0 +1,82 @@
+import time
+
+import pytest
+
+from src.utils.call_policy import (
+    MAX_BATCH_CONCURRENCY,
+    CallPolicy,
+    CallTimeoutError,
+    get_batch_workers,
+)
+from src.utils.fake_llm import FakeScoringChatModel
+from src.utils.progress import ProgressTracker, TimeBudgetExceededError
+
+
+def test_call_times_out() -> None:
+    """Test that a call slower than its deadline is abandoned"""
+    policy = CallPolicy(timeout_seconds=0.05)
+    slow = FakeScoringChatModel(model_name="slow", latency_mean=1.0)
+
+    start = time.monotonic()
+    with pytest.raises(CallTimeoutError):
+        policy.invoke(slow, "Score this.")
+    assert time.monotonic() - start < 0.5
+    assert policy.report()["timeouts"] == 1
+
+
+def test_slow_calls_are_hedged_on_the_alternate() -> None:
+    """Test that a call slower than the p95 latency is raced against the alternate"""
+    policy = CallPolicy(hedge=True, hedge_percentile=95)
+    fast = FakeScoringChatModel(model_name="fast", latency_mean=0.0)
+    for _ in range(20):
+        policy.invoke(fast, "Score this.")
+    assert policy.get_hedge_delay() == 0.5
+
+    slow = FakeScoringChatModel(model_name="slow", latency_mean=5.0)
+    start = time.monotonic()
+    assert policy.invoke(slow, "Score this.", alternate=fast).content
+    assert time.monotonic() - start < 2.0
+
+    report = policy.report()
+    assert report["calls"] == 21
+    assert report["hedged"] == 1 and report["hedge_wins"] == 1
+    assert report["latency_p50_s"] <= report["latency_p95_s"] <= report["latency_p99_s"]
+
+
+def test_time_budget_bounds_calls() -> None:
+    """Test that calls stop at the deadline of the assessment"""
+    progress = ProgressTracker()
+    progress.set_deadline(0.1)
+    policy = CallPolicy(progress=progress)
+    slow = FakeScoringChatModel(model_name="slow", latency_mean=1.0)
+
+    with pytest.raises(TimeBudgetExceededError):
+        policy.invoke(slow, "Score this.")
+    assert progress.cancelled
+    with pytest.raises(TimeBudgetExceededError):
+        progress.check_cancelled()
+
+
+def test_batch_without_deadline_uses_runnable_batch(monkeypatch) -> None:
+    """Test that batches are sent as one runnable batch when calls are unbounded"""
+    policy = CallPolicy()
+    llm = FakeScoringChatModel(model_name="fast")
+    batches = []
+    batch = FakeScoringChatModel.batch
+
+    def record_batch(self, inputs, **kwargs):
+        batches.append(inputs)
+        return batch(self, inputs, **kwargs)
+
+    monkeypatch.setattr(FakeScoringChatModel, "batch", record_batch)
+
+    assert len(policy.batch(llm, ["a", "b", "c"])) == 3
+    assert batches == [["a", "b", "c"]]
+    assert policy.report()["calls"] == 3
+
+
+def test_batch_workers_are_bounded() -> None:
+    """Test that batches run on at most max_concurrency threads"""
+    assert get_batch_workers(100, None) == MAX_BATCH_CONCURRENCY
+    assert get_batch_workers(100, {"max_concurrency": 2}) == 2
+    assert get_batch_workers(3, {"callbacks": []}) == 3
@@ -0,0 +1,56 @@
+from src.utils.checkpoint import CheckpointJournal
+from src.utils.general import read_json_file, write_json_file
+
+
+def test_journal_resume_ignores_truncated_line(tmp_path) -> None:
+    """Test that a resumed journal reloads results and survives a torn write"""
+    journal_path = tmp_path / "checkpoint.jsonl"
+    with CheckpointJournal(str(journal_path)) as journal:
+        journal.record_file("a.py", {"scores": {}, "file_path": "a.py"})
+        journal.record_file("empty.py", {})
+        journal.record_criterion("license_presence", {"score": 1, "explanation": ""})
+    with open(journal_path, "a") as file:
+        file.write('{"type": "file", "key": "b.py", "res')
+
+    with CheckpointJournal(str(journal_path), resume=True) as journal:
+        assert set(journal.completed_files) == {"a.py", "empty.py"}
+        assert journal.completed_criteria["license_presence"]["score"] == 1
+        journal.record_file("c.py", {})
+
+    with CheckpointJournal(str(journal_path), resume=True) as journal:
+        assert set(journal.completed_files) == {"a.py", "empty.py", "c.py"}
+
+    with CheckpointJournal(str(journal_path)) as journal:
+        assert journal.completed_files == {}
+
+
+def test_journal_of_other_namespace_is_not_resumed(tmp_path) -> None:
+    """Test that results scored with another model or criteria are discarded"""
+    journal_path = tmp_path / "checkpoint.jsonl"
+    with CheckpointJournal(str(journal_path), namespace="model-a:1234") as journal:
+        journal.record_file("a.py", {})
+
+    with CheckpointJournal(
+        str(journal_path), resume=True, namespace="model-a:1234"
+    ) as journal:
+        assert set(journal.completed_files) == {"a.py"}
+
+    with CheckpointJournal(
+        str(journal_path), resume=True, namespace="model-b:1234"
+    ) as journal:
+        assert journal.completed_files == {}
+        journal.record_file("b.py", {})
+
+    with CheckpointJournal(
+        str(journal_path), resume=True, namespace="model-b:1234"
+    ) as journal:
+        assert set(journal.completed_files) == {"b.py"}
+
+
+def test_write_json_file_is_atomic(tmp_path) -> None:
+    """Test that JSON files are replaced in one step without leftovers"""
+    file_path = tmp_path / "assessment.json"
+    write_json_file(str(file_path), {"a": 1})
+    write_json_file(str(file_path), {"a": 2})
+    assert read_json_file(str(file_path)) == {"a": 2}
+    assert [path.name for path in tmp_path.iterdir()] == ["assessment.json"]
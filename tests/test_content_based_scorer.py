@@ -0,0 +1,89 @@
+from src.directory_scorer.aggregation import StreamingAggregator
+from src.directory_scorer.content_based_scorer import (
+    PreparedFile,
+    get_failed_criteria,
+    get_structured_llm,
+    reduce_chunk_scores,
+    reuse_file_score,
+)
+from src.utils.fake_llm import FakeScoringChatModel
+
+
+def chunk(score: int, explanation: str) -> dict:
+    return {"scores": {"criterion": {"score": score, "explanation": explanation}}}
+
+
+def test_reduce_chunk_scores_or() -> None:
+    """Test that an OR criterion is satisfied if any chunk satisfies it"""
+    chunks = [chunk(0, "missing"), chunk(1, "found"), chunk(0, "missing")]
+    reduced = reduce_chunk_scores(chunks, {"criterion": "OR"})
+    assert reduced["scores"]["criterion"] == {
+        "score": 1,
+        "explanation": "Part 2/3: found",
+    }
+
+    reduced = reduce_chunk_scores([chunk(0, "a"), chunk(0, "b")], {})
+    assert reduced["scores"]["criterion"]["score"] == 0
+
+
+def test_reduce_chunk_scores_and() -> None:
+    """Test that an AND criterion fails if any chunk fails it"""
+    chunks = [chunk(1, "ok"), chunk(0, "bad"), chunk(1, "ok")]
+    reduced = reduce_chunk_scores(chunks, {"criterion": "AND"})
+    assert reduced["scores"]["criterion"] == {
+        "score": 0,
+        "explanation": "Part 2/3: bad",
+    }
+
+    reduced = reduce_chunk_scores([chunk(1, "ok"), chunk(1, "ok")], {"criterion": "AND"})
+    assert reduced["scores"]["criterion"]["score"] == 1
+
+
+def test_get_failed_criteria_only_reports_failed_and_criteria() -> None:
+    """Test that only decided AND criteria count as failed stop criteria"""
+    aggregator = StreamingAggregator({"typed": "AND", "documented": "OR"})
+    stop_criteria = frozenset({"typed", "documented"})
+    aggregator.add(
+        {
+            "file_path": "main.py",
+            "scores": {
+                "typed": {"score": 1, "explanation": "Typed."},
+                "documented": {"score": 1, "explanation": "Documented."},
+            },
+        }
+    )
+    assert get_failed_criteria(aggregator, stop_criteria) == frozenset()
+    aggregator.add(
+        {"file_path": "util.py", "scores": {"typed": {"score": 0, "explanation": "No."}}}
+    )
+    assert get_failed_criteria(aggregator, stop_criteria) == {"typed"}
+    assert get_failed_criteria(aggregator, frozenset()) == frozenset()
+
+
+def test_structured_llm_is_cached_per_model_config() -> None:
+    """Test that only copies of a model share its structured-output runnables"""
+    llm = FakeScoringChatModel(model_name="cached")
+    runnable = get_structured_llm(llm, ".py")
+
+    assert get_structured_llm(llm.model_copy(), ".py") is runnable
+    other = FakeScoringChatModel(model_name="cached")
+    assert get_structured_llm(other, ".py") is not runnable
+    assert (
+        get_structured_llm(
+            FakeScoringChatModel(model_name="cached", error_rate=0.5), ".py"
+        )
+        is not runnable
+    )
+
+
+def test_reused_scores_leave_out_excluded_criteria() -> None:
+    """Test that scores reused from a near-duplicate keep only the scored criteria"""
+    prepared = PreparedFile("copy.py", ".py")
+    prepared.decided_scores = {"elite": {"score": 0, "explanation": "pre-check"}}
+    source_score = {"scores": {"essential": {"score": 1}, "elite": {"score": 1}}}
+
+    score = reuse_file_score(
+        prepared, "source.py", 0.95, source_score, frozenset({"elite"})
+    )
+    assert score["scores"] == {"essential": {"score": 1}}
+    assert score["near_duplicate_of"] == "source.py"
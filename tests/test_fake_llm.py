@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+
+from src.utils.fake_llm import FakeScoringChatModel
+
+
+class Scoring(BaseModel):
+    score: int
+    explanation: str
+
+
+def test_structured_output_includes_raw() -> None:
+    """Test that include_raw returns the raw message next to the parsed instance"""
+    llm = FakeScoringChatModel()
+    parsed = llm.with_structured_output(Scoring).invoke("Score this.")
+    response = llm.with_structured_output(Scoring, include_raw=True).invoke("Score this.")
+
+    assert set(response) == {"raw", "parsed", "parsing_error"}
+    assert response["parsed"] == parsed
+    assert response["parsing_error"] is None
+    assert response["raw"].usage_metadata["output_tokens"] > 0
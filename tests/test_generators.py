@@ -0,0 +1,19 @@
+import pytest
+
+from src.generators import get_criteria_by_type, get_tier_criteria
+
+
+def test_get_tier_criteria_includes_lower_tiers() -> None:
+    """Test that each tier adds its criteria to those of the tiers below it"""
+    criteria_by_type = get_criteria_by_type()
+    essential = get_tier_criteria("Essential")
+    professional = get_tier_criteria("Professional")
+    elite = get_tier_criteria("Elite")
+
+    assert set(essential) == set(criteria_by_type["Essential"])
+    assert set(essential) <= set(professional) <= set(elite)
+    assert len(professional) == len(set(professional))
+    assert set(criteria_by_type["Professional"]) <= set(professional)
+
+    with pytest.raises(ValueError):
+        get_tier_criteria("Expert")
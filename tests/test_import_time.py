@@ -0,0 +1,72 @@
+import os
+import subprocess
+import sys
+import time
+import pytest
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+# Modules that must only be imported once an LLM call or file load actually happens
+HEAVY_MODULES = [
+    "langchain_openai",
+    "langchain_google_genai",
+    "langchain_groq",
+    "langchain_community",
+    "pypdf",
+    "tiktoken",
+]
+
+MAX_STARTUP_SECONDS = 1.0
+
+
+def run_in_src(code: str) -> subprocess.CompletedProcess:
+    """Run a Python snippet from the src directory with no API keys set"""
+    env = {
+        key: value
+        for key, value in os.environ.items()
+        if not key.endswith("_API_KEY")
+    }
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=SRC_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def test_main_import_is_lazy() -> None:
+    """Test that importing main loads no provider clients, loaders or tokenizers"""
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import main\n"
+        "print(time.perf_counter() - start)\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    elapsed, loaded = run_in_src(code).stdout.splitlines()
+
+    assert loaded == ""
+    assert float(elapsed) < MAX_STARTUP_SECONDS
+
+
+@pytest.mark.parametrize("module", ["utils.llm", "directory_scorer.content_based_scorer"])
+def test_module_import_is_lazy(module: str) -> None:
+    """Test that the LLM registry and file scorer defer their heavy imports"""
+    code = (
+        "import sys\n"
+        f"import {module}\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    assert run_in_src(code).stdout.strip() == ""
+
+
+def test_help_starts_fast() -> None:
+    """Test that the CLI help is printed well under a second without API keys"""
+    start = time.perf_counter()
+    result = run_in_src("import main; main.main(['--help'])")
+    elapsed = time.perf_counter() - start
+
+    assert "usage" in result.stdout
+    assert elapsed < MAX_STARTUP_SECONDS
@@ -0,0 +1,114 @@
+import pytest
+
+from src.planner import get_model_rates
+from src.utils import llm as llm_module
+from src.utils.fake_llm import FakeLLMError, FakeScoringChatModel
+from src.utils.key_pool import ApiKeysExhaustedError, KeyPool, PooledChatModel
+from src.utils.llm import get_api_keys
+from src.utils.router import is_rate_limit_error
+
+
+class QuotaExhaustedModel:
+    """Client whose key has run out of quota"""
+
+    model_name = "exhausted"
+
+    def invoke(self, input, config=None, **kwargs):
+        raise RuntimeError("You exceeded your current quota")
+
+
+@pytest.fixture
+def api_key_env(monkeypatch):
+    for env_var in ["OPEN_ROUTER_API_KEY", "OPEN_ROUTER_API_KEYS", "OPENAI_API_KEY"]:
+        monkeypatch.delenv(env_var, raising=False)
+    monkeypatch.setenv("OPENAI_API_KEYS", "sk-aaaa, sk-bbbb,,sk-cccc,sk-aaaa")
+    return monkeypatch
+
+
+def test_get_api_keys(api_key_env) -> None:
+    """Test that pooled keys are read from the plural variable, without duplicates"""
+    assert get_api_keys("OPENAI_API_KEY") == ["sk-aaaa", "sk-bbbb", "sk-cccc"]
+
+    api_key_env.setenv("OPENAI_API_KEY", "sk-cccc")
+    assert get_api_keys("OPENAI_API_KEY") == ["sk-cccc", "sk-aaaa", "sk-bbbb"]
+
+
+def test_calls_spread_over_keys() -> None:
+    """Test that each call goes to the key with the most headroom"""
+    clients = [FakeScoringChatModel(model_name="fake") for _ in range(3)]
+    pool = KeyPool("fake", ["key-1", "key-2", "key-3"], rpm=100, tpm=100000)
+    llm = PooledChatModel("fake", pool, clients)
+
+    responses = llm.batch([f"Prompt {i}" for i in range(6)])
+    assert len(responses) == 6
+    assert [client.stats.calls for client in clients] == [2, 2, 2]
+
+    report = pool.report()
+    assert list(report) == ["...ey-1", "...ey-2", "...ey-3"]
+    assert all(key["calls"] == 2 and key["errors"] == 0 for key in report.values())
+
+
+def test_quota_errors_quarantine_keys() -> None:
+    """Test that calls failing on a quota error move to the next key until none is left"""
+    client = FakeScoringChatModel(model_name="fake")
+    pool = KeyPool("fake", ["key-1", "key-2"], rpm=100, tpm=100000)
+    llm = PooledChatModel("fake", pool, [QuotaExhaustedModel(), client])
+
+    for _ in range(3):
+        assert llm.invoke("Prompt").content
+    assert client.stats.calls == 3
+
+    report = pool.report()
+    assert report["...ey-1"]["quarantined"] and report["...ey-1"]["quarantines"] == 1
+    assert report["...ey-1"]["calls"] == 1
+    assert report["...ey-2"]["calls"] == 3
+
+    llm.runnables[1] = QuotaExhaustedModel()
+    with pytest.raises(ApiKeysExhaustedError) as exc_info:
+        llm.invoke("Prompt")
+    assert "quota" in str(exc_info.value.__cause__)
+    assert is_rate_limit_error(exc_info.value)
+    assert pool.report()["...ey-2"]["quarantined"]
+
+
+def test_other_errors_are_not_retried() -> None:
+    """Test that errors unrelated to quotas fail the call without a quarantine"""
+    pool = KeyPool("fake", ["key-1", "key-2"], rpm=100, tpm=100000)
+    clients = [
+        FakeScoringChatModel(model_name="fake", error_rate=1.0),
+        FakeScoringChatModel(model_name="fake"),
+    ]
+    llm = PooledChatModel("fake", pool, clients)
+
+    with pytest.raises(FakeLLMError):
+        llm.invoke("Prompt")
+    report = pool.report()
+    assert report["...ey-1"]["errors"] == 1 and not report["...ey-1"]["quarantined"]
+    assert report["...ey-2"]["calls"] == 0
+
+
+def test_single_key_in_plural_variable(api_key_env) -> None:
+    """Test that a single key listed in the plural variable is passed to the client"""
+    api_key_env.setenv("OPENAI_API_KEYS", "sk-only")
+    llm_module.llms.pop("gpt-4o-mini", None)
+    created = []
+
+    def factory(**kwargs):
+        created.append(kwargs)
+        return FakeScoringChatModel(model_name="gpt-4o-mini")
+
+    api_key_env.setitem(
+        llm_module.llm_providers, "gpt-4o-mini", ("OPENAI_API_KEY", factory)
+    )
+    try:
+        assert llm_module.get_llm("gpt-4o-mini").model_name == "gpt-4o-mini"
+    finally:
+        llm_module.llms.pop("gpt-4o-mini", None)
+    assert created == [{"api_key": "sk-only"}]
+
+
+def test_planned_rate_limits_scale_with_keys(api_key_env) -> None:
+    """Test that the planner multiplies the per-key rate limits by the number of keys"""
+    rates = get_model_rates("gpt-4o-mini")
+    assert rates["rpm"] == 3 * 500
+    assert rates["tpm"] == 3 * 200000
@@ -0,0 +1,94 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from src.metrics import MetricsCollector, percentile, trace
+
+
+def test_percentile() -> None:
+    """Test nearest-rank percentiles"""
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 95) == 95.0
+    assert percentile(values, 100) == 100.0
+    assert percentile([], 95) == 0.0
+
+
+def test_spans_nest_and_record_errors() -> None:
+    """Test that spans nest under the open span and record failures"""
+    metrics = MetricsCollector("repo")
+    with metrics.span("outer") as outer:
+        with metrics.span("inner", file_path="a.py") as inner:
+            metrics.record_llm_usage("gpt-4o-mini", 100, 20)
+        with pytest.raises(ValueError):
+            with metrics.span("failing"):
+                raise ValueError("boom")
+
+    spans = {span.name: span for span in metrics.spans}
+    assert spans["inner"].parent_id == outer.span_id
+    assert inner.attributes == {
+        "file_path": "a.py",
+        "prompt_tokens": 100,
+        "completion_tokens": 20,
+    }
+    assert spans["failing"].error == "ValueError: boom"
+
+    summary = metrics.summary()
+    assert summary["stages"]["failing"]["errors"] == 1
+    assert summary["llm"]["prompt_tokens"] == 100
+    assert summary["llm"]["by_model"]["gpt-4o-mini"]["completion_tokens"] == 20
+
+
+def test_trace_without_collector() -> None:
+    """Test that tracing is a no-op when no collector is given"""
+    with trace(None, "score_file") as span:
+        assert span is None
+
+
+def test_write_and_otlp_export_format(tmp_path) -> None:
+    """Test the metrics.json output and the OTLP/JSON payload"""
+    metrics = MetricsCollector("repo")
+    with metrics.span("score_file", tokens=12):
+        pass
+
+    file_path = tmp_path / "metrics.json"
+    metrics.write(str(file_path))
+    written = json.loads(file_path.read_text())
+    assert written["stages"]["score_file"]["count"] == 1
+    assert written["spans"][0]["attributes"] == {"tokens": 12}
+
+    otlp_span = metrics.to_otlp()["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert otlp_span["traceId"] == metrics.trace_id
+    assert otlp_span["attributes"] == [{"key": "tokens", "value": {"intValue": "12"}}]
+
+
+def test_export_otlp_posts_spans() -> None:
+    """Test that spans are posted to the collector's traces endpoint"""
+    received = []
+
+    class CollectorHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received.append((self.path, json.loads(body)))
+            self.send_response(200 if self.path == "/v1/traces" else 404)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), CollectorHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        metrics = MetricsCollector("repo")
+        with metrics.span("score_file"):
+            pass
+        endpoint = f"http://127.0.0.1:{server.server_port}"
+        assert metrics.export_otlp(endpoint)
+        assert not metrics.export_otlp(f"{endpoint}/other/v1/traces")
+    finally:
+        server.shutdown()
+
+    assert received[0][0] == "/v1/traces"
+    assert received[0][1] == metrics.to_otlp()
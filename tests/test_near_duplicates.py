@@ -0,0 +1,36 @@
+from src.directory_scorer.near_duplicates import (
+    NearDuplicateIndex,
+    compute_minhash,
+    get_lsh_bands,
+)
+
+TEMPLATE = "\n".join(
+    f"def step_{i}(data):\n    \"\"\"Run step {i} of the pipeline.\"\"\"\n    return data * {i}\n"
+    for i in range(40)
+)
+
+
+def test_get_lsh_bands_stays_below_threshold() -> None:
+    """Test that the LSH split catches candidates from just below the threshold"""
+    assert get_lsh_bands(0.9, 128) == (8, 16)
+    assert get_lsh_bands(0.8, 128) == (16, 8)
+
+
+def test_near_duplicate_index_finds_edited_copies() -> None:
+    """Test that reformatted and lightly edited copies match, unrelated files do not"""
+    index = NearDuplicateIndex(threshold=0.9)
+    score = {"scores": {"docstrings": {"score": 1, "explanation": "Documented."}}}
+    index.add("template/pipeline.py", ".py", compute_minhash(TEMPLATE), score)
+
+    fork = TEMPLATE.replace("    ", "  ").replace("step_39", "final_step")
+    match = index.query(".py", compute_minhash(fork))
+    assert match is not None
+    file_path, similarity, matched_score = match
+    assert file_path == "template/pipeline.py"
+    assert 0.9 <= similarity < 1.0
+    assert matched_score == score
+
+    assert index.query(".ipynb", compute_minhash(fork)) is None
+    unrelated = "\n".join(f"class Model{i}:\n    pass\n" for i in range(40))
+    assert index.query(".py", compute_minhash(unrelated)) is None
+    assert compute_minhash("  \n ") is None
@@ -0,0 +1,49 @@
+import pytest
+
+from src.planner import (
+    BudgetExceededError,
+    build_plan,
+    check_budget,
+    get_model_rates,
+    simulate_stage,
+)
+
+RATES = {"rpm": 60, "tpm": 1000000, "seconds_per_call": 1.0, "output_tokens_per_second": 10}
+
+
+def call(stage: str, input_tokens: int, output_tokens: int) -> dict:
+    return {"stage": stage, "input_tokens": input_tokens, "output_tokens": output_tokens}
+
+
+def test_simulate_stage_uses_workers_and_rate_limits() -> None:
+    """Test that calls run in parallel on the workers, but no faster than the rate limit"""
+    calls = [call("file_scoring", 100, 20) for _ in range(4)]
+    # Each call takes 1 + 20 / 10 = 3 seconds
+    assert simulate_stage(calls, max_workers=1, rates=RATES) == 12.0
+    assert simulate_stage(calls, max_workers=2, rates=RATES) == 6.0
+    # 4 calls at 60 requests per minute take at least 4 seconds
+    assert simulate_stage(calls, max_workers=4, rates=RATES) == 4.0
+    assert simulate_stage([], max_workers=4, rates=RATES) == 0.0
+
+
+def test_build_plan_and_check_budget() -> None:
+    """Test that the plan adds up stages and prices tokens with the model's rates"""
+    calls = [call("criteria_scoring", 1000, 80)] * 2 + [call("file_scoring", 5000, 400)]
+    plan = build_plan(calls, "gpt-4o-mini", max_workers=2)
+
+    assert plan["stages"]["criteria_scoring"]["calls"] == 2
+    assert plan["stages"]["file_scoring"]["input_tokens"] == 5000
+    total = plan["total"]
+    assert total["calls"] == 3
+    assert total["input_tokens"] == 7000 and total["output_tokens"] == 560
+    rates = get_model_rates("gpt-4o-mini")
+    assert total["cost_usd"] == pytest.approx(
+        (7000 * rates["input"] + 560 * rates["output"]) / 1e6
+    )
+    assert get_model_rates("unknown-model")["rpm"] > 0
+
+    check_budget(plan, max_cost_usd=1.0, max_minutes=60)
+    with pytest.raises(BudgetExceededError):
+        check_budget(plan, max_cost_usd=0.0001)
+    with pytest.raises(BudgetExceededError):
+        check_budget(plan, max_minutes=0.0)
@@ -0,0 +1,33 @@
+from src.directory_scorer.prechecks import run_prechecks
+from src.generators import get_instructions
+
+
+def test_prechecks_decide_obvious_criteria() -> None:
+    """Test that criteria are decided locally when their pattern is absent"""
+    scores = run_prechecks("x = 1\nprint(x)\n", ".py")
+    assert scores["logging_basic"]["score"] == 0
+    assert scores["uses_docstrings"]["score"] == 1
+    assert scores["class_size"]["score"] == 1
+
+    scores = run_prechecks("import logging\n\nclass A:\n    pass\n", ".py")
+    assert "logging_basic" not in scores
+    assert "class_size" not in scores
+    assert scores["function_length"]["score"] == 1
+
+
+def test_instructions_filtered_by_extension() -> None:
+    """Test that only instructions for the file's criteria are included"""
+    all_instructions = get_instructions(content_based_only=True)
+    yaml_instructions = get_instructions(
+        content_based_only=True, input_file_extension=".yaml"
+    )
+    assert "seed_setting" in all_instructions
+    assert "seed_setting" not in yaml_instructions
+    assert set(yaml_instructions) < set(all_instructions)
+
+    py_instructions = get_instructions(
+        content_based_only=True,
+        input_file_extension=".py",
+        excluded_criteria={"seed_setting"},
+    )
+    assert "seed_setting" not in py_instructions
@@ -0,0 +1,18 @@
+import os
+from src.directory_scorer.preprocessing import FilePreparer
+
+
+def test_file_preparer_prepares_files_in_processes(tmp_path) -> None:
+    """Test that files are prepared in other processes within the lookahead window"""
+    file_paths = []
+    for i in range(6):
+        file_path = tmp_path / f"file_{i}.txt"
+        file_path.write_text("x" * i)
+        file_paths.append(str(file_path))
+
+    with FilePreparer(
+        os.path.getsize, [(path, {}) for path in file_paths], max_workers=2, lookahead=1
+    ) as preparer:
+        assert preparer.get(file_paths[0]) == 0
+        assert preparer._next_index == 2
+        assert [preparer.get(path) for path in file_paths[1:]] == [1, 2, 3, 4, 5]
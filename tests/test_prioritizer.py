@@ -0,0 +1,33 @@
+import os
+from src.directory_scorer.prioritizer import prioritize_files
+from src.directory_scorer.tree import TreeNode
+
+
+def test_prioritize_files(tmp_path) -> None:
+    """Test that source files come first, largest first, and tests and configs last"""
+    files = {
+        "config.yaml": 10,
+        "tests/test_model.py": 500,
+        "README.md": 100,
+        "scripts/run.py": 50,
+        "src/small.py": 10,
+        "src/large.py": 1000,
+        "analysis.ipynb": 200,
+    }
+    nodes = []
+    for relative_path, size in files.items():
+        path = tmp_path / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("x" * size)
+        nodes.append(TreeNode(path.name, str(path), is_dir=False))
+
+    ordered = prioritize_files(nodes, str(tmp_path))
+    assert [os.path.relpath(node.full_path, tmp_path) for node in ordered] == [
+        os.path.join("src", "large.py"),
+        "analysis.ipynb",
+        os.path.join("src", "small.py"),
+        os.path.join("scripts", "run.py"),
+        "README.md",
+        os.path.join("tests", "test_model.py"),
+        "config.yaml",
+    ]
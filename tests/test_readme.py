@@ -0,0 +1,51 @@
+from src.utils.readme import ReadmeIndex
+
+README = """# My Project
+
+## Overview
+
+A toolkit that trains and evaluates text classifiers on custom datasets, with
+reproducible experiments and reports. It wraps common models behind one CLI.
+
+## Installation
+
+```bash
+# Not a heading
+pip install my-project
+```
+
+### From source
+
+Clone the repository and run `uv sync`.
+
+Usage
+-----
+
+Run `python main.py`.
+
+## License
+
+MIT
+"""
+
+
+def test_readme_index_selects_sections() -> None:
+    """Test that criteria get the introduction and their sections with subsections"""
+    index = ReadmeIndex(README)
+    assert [(s.title, s.level) for s in index.sections] == [
+        ("My Project", 1),
+        ("Overview", 2),
+        ("Installation", 2),
+        ("From source", 3),
+        ("Usage", 2),
+        ("License", 2),
+    ]
+
+    content = index.get_content(["install"])
+    assert "A toolkit that trains" in content
+    assert "uv sync" in content
+    assert "python main.py" not in content
+    assert content.endswith("[Other README sections, not shown: ## Usage; ## License]")
+
+    assert index.get_content(["no such heading"]) == README.strip("\n")
+    assert "MIT" not in index.get_content([])
@@ -0,0 +1,27 @@
+from src.utils.repository import get_repo_tree
+
+
+def test_repo_tree_collapses_data_and_fits_budget(tmp_path) -> None:
+    """Test that datasets are summarized and large trees are trimmed to the budget"""
+    repo = tmp_path / "project"
+    (repo / "data" / "raw").mkdir(parents=True)
+    for i in range(30):
+        (repo / "data" / "raw" / f"{i}.csv").write_text("a,b\n")
+    (repo / "src").mkdir()
+    for i in range(100):
+        (repo / "src" / f"module_{i:03}.py").write_text("x = 1\n")
+    (repo / "README.md").write_text("# Project")
+
+    tree = get_repo_tree(str(repo))
+    lines = tree.splitlines()
+    assert lines[0] == "project"
+    assert "├── data/ — 30 .csv files, 120 B" in lines
+    assert "    ├── module_000.py" in lines
+    assert lines[-1] == "    └── … 51 more .py files, 306 B"
+
+    small_tree = get_repo_tree(str(repo), max_tokens=30)
+    assert len(small_tree) <= 30 * 3
+    assert "data/ — 30 .csv files, 120 B" in small_tree
+
+    full_tree = get_repo_tree(str(repo), max_tokens=None)
+    assert "module_099.py" in full_tree
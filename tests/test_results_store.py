@@ -0,0 +1,45 @@
+from src.utils.results_store import (
+    FILE_SCORES_TABLE,
+    query_results,
+    write_results,
+)
+
+
+def make_results(score: int) -> dict:
+    return {"license_presence": {"score": score, "explanation": "LICENSE"}}
+
+
+def make_file_scores(score: int) -> list:
+    return [
+        {
+            "file_path": "repo/src/model.py",
+            "scores": {
+                "type_hints": {"score": score, "explanation": "hints"},
+                "uses_docstrings": {"score": 1, "explanation": "docs"},
+            },
+        },
+        {"file_path": "repo/README.md", "scores": {}},
+    ]
+
+
+def test_results_store_round_trip(tmp_path) -> None:
+    """Test that scores are partitioned by run and repo and filtered on query"""
+    store_dir = str(tmp_path)
+    write_results(store_dir, "run-1", "repo-a", make_results(1), make_file_scores(1))
+    write_results(store_dir, "run-1", "repo b", make_results(0), make_file_scores(0))
+    write_results(store_dir, "run-2", "repo-a", make_results(0), make_file_scores(0))
+    # Rewriting a partition replaces it instead of duplicating rows
+    write_results(store_dir, "run-2", "repo-a", make_results(1), make_file_scores(1))
+
+    criteria = query_results(store_dir)
+    assert len(criteria) == 3
+    assert set(criteria["repo"]) == {"repo-a", "repo b"}
+
+    file_scores = query_results(
+        store_dir, FILE_SCORES_TABLE, repos=["repo-a"], criterion_ids=["type_hints"]
+    )
+    assert sorted(file_scores["run_id"]) == ["run-1", "run-2"]
+    assert file_scores["score"].tolist() == [1, 1]
+    assert set(file_scores["extension"]) == {".py"}
+
+    assert query_results(str(tmp_path / "missing")).empty
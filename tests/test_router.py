@@ -0,0 +1,100 @@
+import pytest
+from src.utils import router as router_module
+from src.utils.fake_llm import FakeScoringChatModel
+from src.utils.router import AllModelsFailedError, ModelRouter, is_rate_limit_error
+
+# The router raises and catches the timeouts of the modules it imports itself
+from utils.call_policy import CallPolicy, CallTimeoutError
+
+ROUTING_CONFIG = {
+    "routes": {
+        "fast": {
+            "models": ["fast-broken", "fast-ok"],
+            "max_concurrency": 2,
+            "escalate_to": "strong",
+        },
+        "strong": {"models": ["strong-ok"], "max_concurrency": 1},
+    },
+    "max_fast_file_tokens": 100,
+    "strong_criteria": ["hard_criterion"],
+}
+
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    models = {
+        "fast-broken": FakeScoringChatModel(model_name="fast-broken", error_rate=1.0),
+        "fast-ok": FakeScoringChatModel(model_name="fast-ok"),
+        "strong-ok": FakeScoringChatModel(model_name="strong-ok"),
+    }
+    monkeypatch.setattr(router_module, "is_llm_available", lambda llm: llm in models)
+    monkeypatch.setattr(router_module, "get_llm", lambda llm: models[llm])
+    return models
+
+
+def test_routes_by_file_size_and_criterion(fake_models) -> None:
+    """Test that large files and configured criteria use the strong route"""
+    router = ModelRouter(ROUTING_CONFIG)
+    assert router.route_file(50, ".py") == "fast"
+    assert router.route_file(500, ".py") == "strong"
+    assert router.route_criterion("hard_criterion") == "strong"
+    assert router.route_criterion("other") == "fast"
+
+
+def test_falls_back_to_next_model(fake_models) -> None:
+    """Test that a failing model is skipped for the next model on the route"""
+    router = ModelRouter(ROUTING_CONFIG)
+    response = router.invoke("fast", "prompt", lambda model: model, cache_key="raw")
+
+    assert response.response_metadata["model_name"] == "fast-ok"
+    report = router.report()
+    assert report["fast"]["calls"] == 2
+    assert report["fast"]["errors"] == 1
+    assert report["fast"]["escalations"] == 0
+    assert report["strong"]["calls"] == 0
+
+
+def test_escalates_when_all_models_fail(fake_models) -> None:
+    """Test escalation to the strong route and failure when no route succeeds"""
+    fake_models["fast-ok"].error_rate = 1.0
+    router = ModelRouter(ROUTING_CONFIG)
+    response = router.invoke("fast", "prompt", lambda model: model)
+    assert response.response_metadata["model_name"] == "strong-ok"
+    assert router.report()["fast"]["escalations"] == 1
+
+    fake_models["strong-ok"].error_rate = 1.0
+    with pytest.raises(AllModelsFailedError):
+        router.invoke("fast", "another prompt", lambda model: model)
+
+
+def test_call_timeouts_through_router(fake_models) -> None:
+    """Test that calls timing out on every model surface as timeouts, not failures"""
+    for model in fake_models.values():
+        model.error_rate = 0.0
+        model.latency_mean = 1.0
+    router = ModelRouter(ROUTING_CONFIG)
+    policy = CallPolicy(timeout_seconds=0.05)
+
+    with pytest.raises(CallTimeoutError):
+        router.invoke("fast", "prompt", lambda model: model, call_policy=policy)
+    assert policy.report()["timeouts"] == 3
+    assert router.report()["fast"]["escalations"] == 1
+
+    fake_models["strong-ok"].latency_mean = 0.0
+    response = router.invoke("fast", "prompt", lambda model: model, call_policy=policy)
+    assert response.response_metadata["model_name"] == "strong-ok"
+
+    fake_models["strong-ok"].error_rate = 1.0
+    with pytest.raises(AllModelsFailedError):
+        router.invoke("fast", "prompt", lambda model: model, call_policy=policy)
+
+
+def test_is_rate_limit_error() -> None:
+    """Test detection of provider rate-limit errors"""
+
+    class RateLimitError(Exception):
+        status_code = 429
+
+    assert is_rate_limit_error(RateLimitError("slow down"))
+    assert is_rate_limit_error(Exception("You exceeded your current quota"))
+    assert not is_rate_limit_error(ValueError("invalid schema"))
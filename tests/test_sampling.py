@@ -0,0 +1,76 @@
+from src.directory_scorer.tree import TreeNode
+from src.directory_scorer.sampling import (
+    allocate_sample,
+    annotate_sampled_scores,
+    stratified_sample,
+    wilson_interval,
+)
+
+
+def make_files(root: str, directory: str, extension: str, count: int) -> list:
+    return [
+        TreeNode(f"file_{i}{extension}", f"{root}/{directory}/file_{i}{extension}", False)
+        for i in range(count)
+    ]
+
+
+def test_allocate_sample_is_proportional_with_one_per_stratum() -> None:
+    """Test that every stratum is represented and the rest is split by size"""
+    allocation = allocate_sample({"src": 91, "tests": 8, "docs": 1}, 20)
+    assert allocation == {"src": 17, "tests": 2, "docs": 1}
+    assert sum(allocate_sample({"a": 5, "b": 5, "c": 5}, 7).values()) == 7
+    assert allocate_sample({"a": 9, "b": 3, "c": 1}, 2) == {"a": 1, "b": 1, "c": 0}
+
+
+def test_stratified_sample_is_reproducible_and_keeps_order() -> None:
+    """Test that the sample covers every stratum, in scoring order, on every run"""
+    files = (
+        make_files("/repo", "src", ".py", 60)
+        + make_files("/repo", "notebooks", ".ipynb", 10)
+        + make_files("/repo", "src", ".md", 2)
+    )
+    sample = stratified_sample(files, 12, "/repo")
+    assert len(sample) == 12
+    assert sample == [node for node in files if node in sample]
+    assert {node.name.split(".")[-1] for node in sample} == {"py", "ipynb", "md"}
+    assert sample == stratified_sample(files, 12, "/repo")
+    assert stratified_sample(files, 100, "/repo") == files
+
+
+def test_wilson_interval() -> None:
+    """Test that the bounds contain the sample proportion and stay within [0, 1]"""
+    low, high = wilson_interval(45, 50)
+    assert low < 0.9 < high
+    assert round(low, 3) == 0.786 and round(high, 3) == 0.957
+    assert wilson_interval(0, 10)[0] == 0.0
+    assert wilson_interval(10, 10)[1] == 1.0
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+
+
+def test_annotate_sampled_scores() -> None:
+    """Test that AND criteria get bounds and only unmet OR criteria are marked sampled"""
+    file_scores = [
+        {
+            "scores": {
+                "typed": {"score": int(i < 8), "explanation": "Typed."},
+                "tested": {"score": 0, "explanation": "No tests."},
+            }
+        }
+        for i in range(10)
+    ]
+    file_scores[0]["scores"]["documented"] = {"score": 1, "explanation": "Docs."}
+    directory_scores = {
+        "typed": {"score": 0, "explanation": "Not typed."},
+        "tested": {"score": 0, "explanation": "Not tested."},
+        "documented": {"score": 1, "explanation": "Documented."},
+    }
+    logic = {"typed": "AND", "tested": "OR", "documented": "OR"}
+    annotate_sampled_scores(directory_scores, file_scores, logic, num_files=500)
+
+    typed = directory_scores["typed"]
+    assert typed["sampled"] and typed["sample_size"] == 10
+    assert typed["pass_rate"] == 0.8
+    assert typed["pass_rate_bounds"][0] < 0.8 < typed["pass_rate_bounds"][1]
+    assert "sample of 10 of 500 files" in typed["explanation"]
+    assert directory_scores["tested"]["sampled"]
+    assert "sampled" not in directory_scores["documented"]
@@ -0,0 +1,96 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+import pytest
+from src import service as service_module
+from src.service import AssessmentService, create_server
+
+CONFIG = {"max_workers": 1, "results_store": False}
+
+
+def fake_assess_source(project_path, repo_url, progress=None, **kwargs):
+    """Score three fake files, stopping when the job is cancelled"""
+    progress.start_stage("file_scoring", 3)
+    for _ in range(3):
+        progress.check_cancelled()
+        time.sleep(0.05)
+        progress.advance()
+    return {"license_presence": {"score": 1, "explanation": repo_url}}
+
+
+def wait_for_status(service, job_id, statuses, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = service.get_job(job_id)
+        if job.status in statuses:
+            return job
+        time.sleep(0.01)
+    raise TimeoutError(f"Job {job_id} did not reach {statuses}")
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(service_module, "assess_source", fake_assess_source)
+    service = AssessmentService(CONFIG, llm_name="fake-llm", num_workers=1)
+    service.start()
+    yield service
+    service.stop()
+
+
+def test_service_runs_and_cancels_jobs(service) -> None:
+    """Test that jobs run in order, report progress and can be cancelled"""
+    first = service.submit({"repo_url": "https://github.com/org/first"})
+    second = service.submit({"repo_url": "https://github.com/org/second"})
+    with pytest.raises(ValueError, match="already being assessed"):
+        service.submit({"repo_url": "https://github.com/org/second"})
+
+    service.cancel(second.job_id)
+    assert second.status == "cancelled"
+
+    job = wait_for_status(service, first.job_id, {"succeeded"})
+    assert job.results["license_presence"]["score"] == 1
+    assert job.progress.to_dict() == {"stage": "file_scoring", "completed": 3, "total": 3}
+
+    third = service.submit({"repo_url": "https://github.com/org/third"})
+    wait_for_status(service, third.job_id, {"running"})
+    service.cancel(third.job_id)
+    assert wait_for_status(service, third.job_id, {"cancelled"}).results is None
+
+    stats = service.stats()
+    assert stats["queue_depth"] == 0
+    assert stats["jobs"]["succeeded"] == 1
+    assert stats["jobs"]["cancelled"] == 2
+
+
+def test_service_http_api(service) -> None:
+    """Test job submission, status and errors over the HTTP API"""
+    server = create_server(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    def request(method, path, body=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        req = urllib.request.Request(base_url + path, data=data, method=method)
+        try:
+            with urllib.request.urlopen(req) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as error:
+            return error.code, json.loads(error.read())
+
+    try:
+        status, job = request("POST", "/jobs", {"repo_url": "https://github.com/org/api"})
+        assert status == 202
+        wait_for_status(service, job["job_id"], {"succeeded"})
+
+        status, job = request("GET", f"/jobs/{job['job_id']}")
+        assert status == 200
+        assert job["results"]["license_presence"]["score"] == 1
+
+        assert request("POST", "/jobs", {})[0] == 400
+        assert request("GET", "/jobs/missing")[0] == 404
+        assert request("GET", "/metrics")[1]["jobs"]["succeeded"] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,63 @@
+from src.directory_scorer.splitter import (
+    pack_segments,
+    split_notebook,
+    split_python_source,
+)
+
+SOURCE = '''"""Module docstring."""
+import os
+import sys
+
+
+# Helper comment
+@decorator
+def first(x):
+    return x
+
+
+class Second:
+    def method(self):
+        return 1
+'''
+
+
+def word_count(text: str) -> int:
+    return len(text.split())
+
+
+def test_split_python_source_on_definitions() -> None:
+    """Test that Python source is split on top-level definitions"""
+    segments = split_python_source(SOURCE)
+    assert "".join(segments) == SOURCE
+    assert any(s.startswith("# Helper comment\n@decorator\ndef first") for s in segments)
+    assert any(s.startswith("class Second:") and "return 1" in s for s in segments)
+
+
+def test_split_python_source_without_valid_syntax() -> None:
+    """Test that unparsable source falls back to blank-line paragraphs"""
+    source = "def broken(:\n    pass\n\nx = 1\n"
+    assert split_python_source(source) == ["def broken(:\n    pass\n\n", "x = 1\n"]
+
+
+def test_split_notebook_on_markdown_cells() -> None:
+    """Test that notebooks are grouped from one markdown cell to the next"""
+    notebook = {
+        "cells": [
+            {"cell_type": "code", "source": ["import os"]},
+            {"cell_type": "markdown", "source": "# Load data"},
+            {"cell_type": "code", "source": "data = load()"},
+        ]
+    }
+    segments = split_notebook(notebook)
+    assert len(segments) == 2
+    assert "# %% [markdown]\n# Load data" in segments[1]
+    assert "data = load()" in segments[1]
+
+
+def test_pack_segments_respects_budget() -> None:
+    """Test that segments are packed greedily and oversized ones are split"""
+    segments = ["a b\n", "c d\n", "e f g h i j\nk l m n\n"]
+    chunks = pack_segments(segments, max_tokens=5, length_function=word_count)
+    assert "".join(chunk for chunk, _ in chunks) == "".join(segments)
+    assert all(tokens <= 5 for _, tokens in chunks)
+    assert chunks[0] == ("a b\nc d\n", 4)
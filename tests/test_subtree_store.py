@@ -0,0 +1,102 @@
+from src.directory_scorer.content_based_scorer import score_directory_based_on_files
+from src.directory_scorer.tree import (
+    build_tree,
+    compute_content_hashes,
+    post_order_generator,
+)
+from src.directory_scorer.subtree_store import SubtreeResultStore, get_result_namespace
+from src.utils.fake_llm import FakeScoringChatModel
+
+LOGIC = {"documented": "OR"}
+
+
+def make_repo(root, main_source: str) -> None:
+    (root / "vendor" / "lib").mkdir(parents=True)
+    (root / "vendor" / "lib" / "util.py").write_text("def util():\n    pass\n")
+    (root / "vendor" / "setup.py").write_text("setup()\n")
+    (root / "main.py").write_text(main_source)
+
+
+def score(file_path: str, documented: int) -> dict:
+    return {
+        "file_path": file_path,
+        "scores": {"documented": {"score": documented, "explanation": "Fine."}},
+    }
+
+
+def get_tree(root):
+    tree = build_tree(str(root), tracked_extensions=[".py"])
+    compute_content_hashes(tree, max_workers=2)
+    return tree
+
+
+def test_identical_subtrees_are_restored_across_repositories(tmp_path) -> None:
+    """Test that a fork reuses the results of a shared directory but not of changed files"""
+    store = SubtreeResultStore(str(tmp_path / "store"), namespace="fake")
+    original = tmp_path / "original"
+    make_repo(original, "print('original')\n")
+    tree = get_tree(original)
+    file_scores = {
+        str(original / "vendor" / "lib" / "util.py"): score("util.py", 1),
+        str(original / "vendor" / "setup.py"): {},
+        str(original / "main.py"): score("main.py", 0),
+    }
+    # vendor/lib/util.py, vendor/lib, vendor/setup.py, vendor, main.py and the root
+    assert store.save(tree, file_scores, LOGIC) == 6
+
+    fork = tmp_path / "fork"
+    make_repo(fork, "print('fork')\n")
+    store = SubtreeResultStore(str(tmp_path / "store"), namespace="fake")
+    restored = store.restore(get_tree(fork))
+
+    assert len(restored) == 1
+    assert restored[0].file_scores == {
+        str(fork / "vendor" / "lib" / "util.py"): score(
+            str(fork / "vendor" / "lib" / "util.py"), 1
+        ),
+        str(fork / "vendor" / "setup.py"): {},
+    }
+    assert restored[0].aggregate["documented"]["satisfied_explanation"].startswith(
+        "This criterion is satisfied in the project by file 'util.py'."
+    )
+    assert SubtreeResultStore(str(tmp_path / "store"), namespace="other").restore(
+        get_tree(fork)
+    ) == []
+
+
+def test_result_namespace_depends_on_excluded_criteria() -> None:
+    """Test that scores of a target tier are not reused by runs scoring more criteria"""
+    namespace = get_result_namespace("model")
+    assert get_result_namespace("model", excluded_criteria=frozenset()) == namespace
+    tier_namespace = get_result_namespace("model", excluded_criteria=frozenset({"elite"}))
+    assert tier_namespace != namespace
+
+
+def test_sampled_run_only_reuses_sampled_files(tmp_path) -> None:
+    """Test that restored results outside the sample do not count towards estimates"""
+    repo = tmp_path / "repo"
+    for package in ["app", "lib"]:
+        (repo / package).mkdir(parents=True)
+        for index in range(3):
+            (repo / package / f"module_{index}.py").write_text(
+                f"def {package}_{index}():\n    return {index}\n"
+            )
+    tree = get_tree(repo)
+    file_scores = {
+        node.full_path: score(node.full_path, 1)
+        for node in post_order_generator(tree)
+        if not node.is_dir
+    }
+    store = SubtreeResultStore(str(tmp_path / "store"), namespace="fake")
+    store.save(tree, file_scores, {"documented": "AND"})
+
+    directory_scores, all_scores = score_directory_based_on_files(
+        str(repo),
+        FakeScoringChatModel(model_name="fake"),
+        {"documented": "AND"},
+        tracked_extensions=[".py"],
+        result_store=SubtreeResultStore(str(tmp_path / "store"), namespace="fake"),
+        sample_size=2,
+    )
+    assert len(all_scores) == 2
+    assert directory_scores["documented"]["sample_size"] == 2
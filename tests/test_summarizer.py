@@ -0,0 +1,75 @@
+from src.utils.fake_llm import FakeScoringChatModel
+from src.directory_scorer import summarizer
+from src.directory_scorer.tree import build_tree, post_order_generator
+from src.directory_scorer.summarizer import (
+    SummaryCache,
+    get_repo_digest,
+    summarize_tree,
+)
+
+
+def make_repo(root) -> None:
+    (root / "pkg").mkdir(parents=True)
+    (root / "main.py").write_text("print('hello')\n")
+    (root / "pkg" / "model.py").write_text("class Model:\n    pass\n")
+    (root / "pkg" / "notes.md").write_text("# Notes\n")
+
+
+def test_summarize_tree_summarizes_bottom_up_and_reuses_unchanged_subtrees(
+    tmp_path,
+) -> None:
+    """Test that every node is summarized once and unchanged subtrees come from the cache"""
+    repo = tmp_path / "repo"
+    make_repo(repo)
+    llm = FakeScoringChatModel()
+    cache = SummaryCache(str(tmp_path / "cache"), namespace="fake")
+
+    root = build_tree(str(repo), tracked_extensions=[".py", ".md"])
+    report = summarize_tree(root, llm, cache=cache, max_workers=2)
+    assert report == {"summarized": 5, "cached": 0, "failed": 0}
+    assert llm.stats.calls == 5
+    assert all(node.summary for node in post_order_generator(root))
+
+    digest = get_repo_digest(root)
+    assert digest.splitlines()[0].startswith("- repo/: ")
+    assert "  - repo/pkg/: " in digest
+    assert "    - repo/pkg/model.py: " in digest
+
+    # Only the changed file and its ancestors are summarized again
+    (repo / "main.py").write_text("print('hello world')\n")
+    llm.stats.reset()
+    root = build_tree(str(repo), tracked_extensions=[".py", ".md"])
+    report = summarize_tree(root, llm, cache=cache, max_workers=2)
+    assert report == {"summarized": 2, "cached": 3, "failed": 0}
+    assert llm.stats.calls == 2
+    assert all(node.summary for node in post_order_generator(root))
+
+
+def test_directory_with_failed_children_is_not_cached(tmp_path, monkeypatch) -> None:
+    """Test that a directory summarized without a child's summary is not cached"""
+    repo = tmp_path / "repo"
+    make_repo(repo)
+    cache = SummaryCache(str(tmp_path / "cache"), namespace="fake")
+    summarize_node = summarizer.summarize_node
+
+    def failing_summarize_node(node, *args, **kwargs):
+        if node.name == "notes.md":
+            raise RuntimeError("Provider error")
+        return summarize_node(node, *args, **kwargs)
+
+    monkeypatch.setattr(summarizer, "summarize_node", failing_summarize_node)
+    root = build_tree(str(repo), tracked_extensions=[".py", ".md"])
+    report = summarize_tree(root, FakeScoringChatModel(), cache=cache, max_workers=2)
+    assert report == {"summarized": 4, "cached": 0, "failed": 1}
+
+    nodes = {node.name: node for node in post_order_generator(root)}
+    assert cache.get(nodes["model.py"].content_hash)
+    assert cache.get(nodes["pkg"].content_hash) is None
+    assert cache.get(nodes["repo"].content_hash) is None
+
+    # The directories above the failed file are summarized again
+    monkeypatch.setattr(summarizer, "summarize_node", summarize_node)
+    root = build_tree(str(repo), tracked_extensions=[".py", ".md"])
+    report = summarize_tree(root, FakeScoringChatModel(), cache=cache, max_workers=2)
+    assert report == {"summarized": 3, "cached": 2, "failed": 0}
+    assert all(node.summary for node in post_order_generator(root))